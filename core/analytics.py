@@ -0,0 +1,171 @@
+"""
+Optional in-memory engine for date-range top-user leaderboards.
+
+Keeps every transaction as NumPy columns sorted by transaction_date, so a
+range is two binary searches and the per-user sums one bincount, however
+many different windows are asked for. Needs NumPy (pip install numpy) and
+is switched on with settings.ANALYTICS_ENGINE_ENABLED.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .models import Transaction
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without NumPy
+    np = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_microseconds(moment):
+    """Aware datetime -> int microseconds since the Unix epoch."""
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def to_cents(amount):
+    return int(Decimal(amount).scaleb(2))
+
+
+class TransactionSnapshot:
+    """
+    Columns of transactions sorted by date: ``dates`` (int64 microseconds
+    since the epoch), ``users`` (int64 user ids) and ``cents`` (amounts in
+    cents, stored as float64 for bincount; exact for sums below 2**53).
+    """
+
+    def __init__(self, dates, users, cents):
+        self.dates = dates
+        self.users = users
+        self.cents = cents.astype(np.float64, copy=False)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def extend(self, dates, users, cents):
+        """New snapshot with the rows added."""
+        order = np.argsort(dates, kind='stable')
+        dates, users, cents = dates[order], users[order], cents[order]
+        dates = np.concatenate([self.dates, dates])
+        users = np.concatenate([self.users, users])
+        cents = np.concatenate([self.cents, cents])
+        if len(self) and len(dates) > len(self) and dates[len(self)] < self.dates[-1]:
+            # Back-dated rows: a stable sort merges the two sorted runs
+            order = np.argsort(dates, kind='stable')
+            dates, users, cents = dates[order], users[order], cents[order]
+        return TransactionSnapshot(dates, users, cents)
+
+    def top_users(self, start_us, end_us, limit):
+        """[(user_id, total_cents)] of the ``limit`` biggest spenders in [start_us, end_us]."""
+        if limit <= 0 or start_us > end_us:
+            return []
+        lo = np.searchsorted(self.dates, start_us, side='left')
+        hi = np.searchsorted(self.dates, end_us, side='right')
+        if lo >= hi:
+            return []
+
+        users = self.users[lo:hi]
+        totals = np.rint(np.bincount(users, weights=self.cents[lo:hi])).astype(np.int64)
+        candidates = np.flatnonzero(totals)
+        if len(candidates) < limit:
+            # Users whose purchases in range add up to 0 still rank
+            candidates = np.flatnonzero(np.bincount(users, minlength=len(totals)))
+        candidate_totals = totals[candidates]
+
+        if len(candidates) > limit:
+            # Keep everything tied with the limit-th total, then order exactly
+            threshold = -np.partition(-candidate_totals, limit - 1)[limit - 1]
+            keep = candidate_totals >= threshold
+            candidates, candidate_totals = candidates[keep], candidate_totals[keep]
+        order = np.lexsort((candidates, -candidate_totals))[:limit]
+        return [(int(candidates[i]), int(candidate_totals[i])) for i in order]
+
+
+class TopUsersEngine:
+    """
+    Process-wide snapshot of Transaction, refreshed before each lookup with
+    the rows whose id is above the last one loaded. Updates and deletes
+    (see core.signals) and settings.ANALYTICS_ENGINE_MAX_AGE force a full
+    reload, which also picks up changes made by other processes.
+
+    Concurrent purchases commit out of id order, so the ids skipped below
+    the last one loaded (within settings.ANALYTICS_ENGINE_ID_WINDOW of it)
+    are looked up again on every refresh until their rows appear.
+    """
+
+    # Skipped ids looked up per query
+    MISSING_IDS_PER_QUERY = 500
+
+    def __init__(self, chunk_size=50000):
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_id = 0
+        self._missing = set()
+        self._built_at = 0.0
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def top_user_totals(self, start, end, limit):
+        """Same result as core.rollups.raw_top_user_totals()."""
+        if np is None:
+            raise ImproperlyConfigured("ANALYTICS_ENGINE_ENABLED requires NumPy (pip install numpy).")
+        snapshot = self.refresh()
+        return [
+            (user_id, Decimal(cents).scaleb(-2))
+            for user_id, cents in snapshot.top_users(to_microseconds(start), to_microseconds(end), limit)
+        ]
+
+    def refresh(self):
+        with self._lock:
+            max_age = getattr(settings, 'ANALYTICS_ENGINE_MAX_AGE', 300)
+            if self._snapshot is None or time.monotonic() - self._built_at > max_age:
+                self._snapshot = TransactionSnapshot(*(np.empty(0, dtype=np.int64) for _ in range(3)))
+                self._last_id = 0
+                self._missing = set()
+                self._built_at = time.monotonic()
+
+            rows = Transaction.objects.values_list('id', 'transaction_date', 'user_id', 'transaction_amount')
+            chunks = []
+            missing = sorted(self._missing)
+            for start in range(0, len(missing), self.MISSING_IDS_PER_QUERY):
+                found = list(rows.filter(id__in=missing[start:start + self.MISSING_IDS_PER_QUERY]))
+                if found:
+                    chunks.append(self._columns(found))
+                    self._missing.difference_update(row[0] for row in found)
+
+            window = getattr(settings, 'ANALYTICS_ENGINE_ID_WINDOW', 10000)
+            while True:
+                new = list(rows.filter(id__gt=self._last_id).order_by('id')[:self.chunk_size])
+                if not new:
+                    break
+                chunks.append(self._columns(new))
+                previous = self._last_id
+                for row in new:
+                    # Ids not committed yet (or rolled back) may still show up
+                    self._missing.update(range(max(previous + 1, row[0] - window), row[0]))
+                    previous = row[0]
+                self._last_id = previous
+            self._missing = {row_id for row_id in self._missing if row_id > self._last_id - window}
+
+            if chunks:
+                self._snapshot = self._snapshot.extend(*(np.concatenate(column) for column in zip(*chunks)))
+            return self._snapshot
+
+    @staticmethod
+    def _columns(rows):
+        """(dates, users, cents) arrays of (id, transaction_date, user_id, transaction_amount) rows."""
+        return (
+            np.fromiter((to_microseconds(row[1]) for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((to_cents(row[3]) for row in rows), dtype=np.float64, count=len(rows)),
+        )
+
+
+top_users_engine = TopUsersEngine()
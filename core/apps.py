@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate, pre_migrate
+        from . import signals  # noqa: F401
+        from .fulltext import restore
+        from .partitions import refuse_partitioned_migrate
+        post_migrate.connect(restore, sender=self)
+        pre_migrate.connect(refuse_partitioned_migrate, sender=self)
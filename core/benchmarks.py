@@ -0,0 +1,105 @@
+"""Shared helpers for the benchmark_* management commands."""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process (or its finished children) in MB."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+class Timer:
+    """Context manager measuring wall-clock seconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.start
+
+
+def measurement(name, seconds, rows, **extra):
+    return {
+        'name': name,
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'rows_per_second': round(rows / seconds, 1) if seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+        **extra,
+    }
+
+
+def write_report(path, benchmark, results, **metadata):
+    """Write a JSON report with enough context to compare runs over time."""
+    report = {
+        'benchmark': benchmark,
+        'started_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        **metadata,
+        'results': results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def default_report_path(benchmark):
+    return os.path.join('benchmarks', f"{benchmark}-{timezone.now():%Y%m%d-%H%M%S}.json")
+
+
+def confirm_database(name):
+    """
+    Refuse to run a benchmark that commits rows unless ``name`` (its
+    --database option) names the configured database, so it only ever runs
+    against a database picked on purpose.
+    """
+    configured = str(connection.settings_dict['NAME'])
+    if name != configured:
+        raise CommandError(
+            "This benchmark commits rows to the database and deletes them afterwards. Run it against a "
+            f"scratch database and confirm with --database {configured}."
+        )
+
+
+def create_rows(model, objects, batch_size=5000, **match):
+    """
+    bulk_create ``objects`` and return their ids in order. MySQL does not
+    return ids from bulk inserts: they are read back as the rows matching
+    ``match`` above the previous highest id.
+    """
+    objects = list(objects)
+    last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+    model.objects.bulk_create(objects, batch_size=batch_size)
+    if objects and objects[0].pk is None:
+        return list(model.objects.filter(id__gt=last_id, **match).order_by('id').values_list('id', flat=True))
+    return [obj.pk for obj in objects]
+
+
+def delete_rows(model, column, ids, chunk_size=1000):
+    """Delete the rows of ``model`` whose ``column`` is one of ``ids``, without loading them."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
@@ -0,0 +1,220 @@
+"""
+Writers used by load_initial_data to insert rows in bulk.
+
+BulkWriter batches rows through the ORM's bulk_create. NativeWriter stages
+rows in a CSV file and hands the whole file to the database's native bulk
+path at the end of the load (LOAD DATA LOCAL INFILE on MySQL, a single
+executemany transaction elsewhere).
+"""
+import csv
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from django.db import connection, transaction
+from django.db.models import Max
+
+
+class BulkWriter:
+    """
+    Buffers rows for one model and writes them with batched bulk_create.
+
+    Primary keys are assigned up front (continuing from the current maximum),
+    so callers can reference a row's id before it reaches the database and
+    no read-back query is needed to build the name->id maps.
+    """
+
+    def __init__(self, model, batch_size, parents=()):
+        self.model = model
+        self.batch_size = batch_size
+        self.parents = parents  # writers whose rows must be flushed first (FK targets)
+        self.pending = []
+        self.rows = 0
+        self.elapsed = 0.0
+        self.restart()
+
+    def restart(self):
+        """Continue ids from the table's current maximum, past rows other connections inserted."""
+        self.next_id = (self.model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def add(self, **fields):
+        obj = self.model(id=self.next_id, **fields)
+        self.next_id += 1
+        self.pending.append(obj)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return obj.id
+
+    def flush(self):
+        for parent in self.parents:
+            parent.flush()
+        if not self.pending:
+            return
+
+        start = time.perf_counter()
+        self.model.objects.bulk_create(self.pending, batch_size=self.batch_size)
+        self.elapsed += time.perf_counter() - start
+        self.rows += len(self.pending)
+        self.pending = []
+
+    def finish(self):
+        """Write everything still buffered; called once at the end of the load."""
+        self.flush()
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+@contextmanager
+def tables_locked(models):
+    """
+    Run the block in one database transaction that keeps other connections
+    from writing to the models' tables until it commits, so ids assigned
+    after BulkWriter.restart() cannot be taken meanwhile. On MySQL the block
+    may only use the locked tables.
+    """
+    quote = connection.ops.quote_name
+    # LOCK TABLES commits the transaction it runs in, so it is only taken
+    # when the block starts the transaction itself.
+    lock_tables = connection.vendor == 'mysql' and not connection.in_atomic_block
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if lock_tables:
+                    # With autocommit off, as InnoDB requires; released by UNLOCK TABLES after the commit
+                    cursor.execute('LOCK TABLES ' + ', '.join(f"{quote(model._meta.db_table)} WRITE" for model in models))
+                elif connection.vendor == 'sqlite':
+                    # Any write statement takes SQLite's database-wide write lock
+                    table, column = quote(models[0]._meta.db_table), quote(models[0]._meta.pk.column)
+                    cursor.execute(f"UPDATE {table} SET {column} = {column} WHERE 0")
+            yield
+    finally:
+        if lock_tables:
+            with connection.cursor() as cursor:
+                cursor.execute('UNLOCK TABLES')
+
+
+class NativeWriter(BulkWriter):
+    """
+    Drop-in replacement for BulkWriter that writes rows to a staging CSV
+    file instead of the database. Values are converted with the same
+    get_db_prep_save() the ORM uses, so the stored rows are identical to the
+    bulk_create path. finish() ingests the file with the model's secondary
+    indexes dropped (except those leading with a foreign key), then rebuilds
+    them.
+    """
+
+    def __init__(self, model, batch_size, parents=(), staging_dir=None):
+        super().__init__(model, batch_size, parents)
+        self.fields = model._meta.concrete_fields
+        self.staging = tempfile.NamedTemporaryFile(
+            'w', newline='', encoding='utf-8', suffix='.csv', dir=staging_dir, delete=False,
+        )
+        self.writer = csv.writer(self.staging)
+        self.staged = 0
+
+    def add(self, **fields):
+        row_id = self.next_id
+        self.next_id += 1
+        fields[self.model._meta.pk.attname] = row_id
+        self.pending.append([
+            field.get_db_prep_save(
+                fields[field.attname] if field.attname in fields else field.get_default(),
+                connection,
+            )
+            for field in self.fields
+        ])
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return row_id
+
+    def flush(self):
+        # Rows only reach the database in finish(), after every parent table
+        # has been written, so parents are not flushed here.
+        if not self.pending:
+            return
+
+        start = time.perf_counter()
+        # LOAD DATA reads an unquoted NULL as SQL NULL
+        self.writer.writerows(
+            ['NULL' if value is None else value for value in row] for row in self.pending
+        )
+        self.elapsed += time.perf_counter() - start
+        self.staged += len(self.pending)
+        self.pending = []
+
+    def finish(self):
+        for parent in self.parents:
+            parent.finish()
+        self.flush()
+        self.staging.close()
+
+        start = time.perf_counter()
+        try:
+            if self.staged:
+                with self.secondary_indexes_dropped():
+                    if connection.vendor == 'mysql':
+                        self.load_data_infile()
+                    else:
+                        self.load_executemany()
+        finally:
+            os.remove(self.staging.name)
+        self.elapsed += time.perf_counter() - start
+        self.rows += self.staged
+        self.staged = 0
+
+    @contextmanager
+    def secondary_indexes_dropped(self):
+        """Drop the model's Meta.indexes for the load and rebuild them afterwards."""
+        # Only used to render the SQL; entering it as a context manager would
+        # fail inside the caller's transaction on SQLite.
+        editor = connection.schema_editor()
+        editor.deferred_sql = []
+        # An index leading with a foreign key column may be the one InnoDB
+        # uses for the constraint, and MySQL refuses to drop it (error 1553).
+        indexes = [
+            index for index in self.model._meta.indexes
+            if not (index.fields and self.model._meta.get_field(index.fields[0].lstrip('-')).many_to_one)
+        ]
+        with connection.cursor() as cursor:
+            for index in indexes:
+                cursor.execute(str(index.remove_sql(self.model, editor)))
+            try:
+                yield
+            finally:
+                for index in indexes:
+                    cursor.execute(str(index.create_sql(self.model, editor)))
+
+    def load_data_infile(self):
+        """Requires local_infile to be enabled on both the client and the MySQL server."""
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            cursor.execute("SET SESSION foreign_key_checks = 0, SESSION unique_checks = 0")
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote(self.model._meta.db_table)} "
+                    "CHARACTER SET utf8mb4 "
+                    "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                    "LINES TERMINATED BY '\\r\\n' "
+                    f"({columns})",
+                    [self.staging.name],
+                )
+            finally:
+                cursor.execute("SET SESSION foreign_key_checks = 1, SESSION unique_checks = 1")
+
+    def load_executemany(self):
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        placeholders = ', '.join(['%s'] * len(self.fields))
+        sql = f"INSERT INTO {quote(self.model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+
+        with open(self.staging.name, newline='', encoding='utf-8') as f, transaction.atomic():
+            rows = ([None if value == 'NULL' else value for value in row] for row in csv.reader(f))
+            with connection.cursor() as cursor:
+                while True:
+                    batch = [row for _, row in zip(range(self.batch_size), rows)]
+                    if not batch:
+                        break
+                    cursor.executemany(sql, batch)
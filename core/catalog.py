@@ -0,0 +1,42 @@
+"""
+Catalog attributes packed into mask names such as
+"Second Smile (black) (10 per pack)": brand, color and pack size, plus the
+price per mask. Plain Python, so the ETL transform workers can use it too.
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+MASK_NAME_RE = re.compile(
+    r'^\s*(?P<brand>.*?)\s*\((?P<color>[^()]*)\)\s*\((?P<pack_size>\d+)\s*per\s*pack\)\s*$',
+    re.IGNORECASE,
+)
+UNIT_PRICE_QUANTUM = Decimal('0.0001')
+
+
+def parse_mask_name(name):
+    """
+    Returns (brand, color, pack_size). Names not in the
+    "Brand (color) (N per pack)" form give (name, '', None).
+    """
+    match = MASK_NAME_RE.match(name or '')
+    if match is None or not int(match.group('pack_size')):
+        return (name or '').strip(), '', None
+    return match.group('brand'), match.group('color').strip().lower(), int(match.group('pack_size'))
+
+
+def unit_price(price, pack_size):
+    """Price per mask, to 4 places; the whole price when the pack size is unknown."""
+    price = Decimal(str(price))
+    return (price / (pack_size or 1)).quantize(UNIT_PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+
+
+def mask_attributes(name, price):
+    """Returns (brand, color, pack_size, unit_price) for a mask."""
+    brand, color, pack_size = parse_mask_name(name)
+    return brand, color, pack_size, unit_price(price, pack_size)
+
+
+def mask_fields(name, price):
+    """Mask.save()'s derived fields as keyword arguments, for rows written with bulk_create."""
+    brand, color, pack_size, price_per_mask = mask_attributes(name, price)
+    return {'brand': brand, 'color': color, 'pack_size': pack_size, 'unit_price': price_per_mask}
@@ -0,0 +1,207 @@
+"""
+Extract/transform stage of the load_initial_data ETL.
+
+Everything here is plain Python with no Django imports, so the transform
+functions can run in worker processes started with the 'spawn' method
+(they never touch settings or the inherited database connection).
+"""
+import hashlib
+import json
+import re
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from itertools import islice
+from .catalog import mask_attributes
+from .schedule import day_of_week_index, opening_span
+
+DAY_ORDER = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+_SEPARATORS = re.compile(r'[\s,]*')
+_OPENING_HOURS_SEGMENT = re.compile(r'(.+?)\s+(\d{2}:\d{2})\s*-\s*(\d{2}:\d{2})')
+
+
+def iter_json_array(filepath, chunk_size=64 * 1024):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    The file is read in chunks and each element is decoded as soon as it is
+    complete, so memory use is bounded by the largest element rather than the
+    file size. Floats are decoded as Decimal to keep prices exact.
+    """
+    decoder = json.JSONDecoder(parse_float=Decimal)
+    with open(filepath, encoding='utf-8-sig') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{filepath}: expected a top-level JSON array.")
+        pos = 1
+        eof = False
+
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if complete:
+                yield item
+                pos = end
+                continue
+
+            # Element runs past the buffer: read more (growing geometrically
+            # for oversized elements) and decode it again from its start.
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def parse_opening_hours(opening_hours_str):
+    """Parse complex strings like 'Mon - Fri 08:00 - 17:00 / Sat, Sun 08:00 - 12:00'"""
+    segments = [seg.strip() for seg in opening_hours_str.split('/')]
+
+    results = []
+    for segment in segments:
+        match = _OPENING_HOURS_SEGMENT.match(segment)
+        if not match:
+            continue
+
+        days_str = match.group(1).strip()
+        open_time = datetime.strptime(match.group(2), '%H:%M').time()
+        close_time = datetime.strptime(match.group(3), '%H:%M').time()
+
+        days = expand_days(days_str)
+
+        for day in days:
+            results.append({
+                'day_of_week': day,
+                'open_time': open_time,
+                'close_time': close_time,
+            })
+
+    return results
+
+
+def expand_days(days_str):
+    if '-' in days_str:
+        start_day, end_day = [d.strip() for d in days_str.split('-')]
+        start_index = DAY_ORDER.index(start_day)
+        end_index = DAY_ORDER.index(end_day)
+        if start_index <= end_index:
+            return DAY_ORDER[start_index:end_index + 1]
+        else:
+            return DAY_ORDER[start_index:] + DAY_ORDER[:end_index + 1]
+    else:
+        return [d.strip() for d in days_str.split(',')]
+
+
+def fingerprint(*parts):
+    """Stable 128-bit hex hash of the given values, used by the --sync mode."""
+    payload = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def transform_pharmacy(pharmacy_data):
+    """
+    Returns (name, cash_balance, masks, opening_hours) where masks is a list
+    of (name, price, brand, color, pack_size, unit_price) and opening_hours
+    a list of (day, open_time, close_time, start_minute, end_minute).
+    """
+    opening_hours = []
+    if pharmacy_data['openingHours']:
+        for entry in parse_opening_hours(pharmacy_data['openingHours']):
+            day_index = day_of_week_index(entry['day_of_week'])
+            start_minute, end_minute = (
+                (None, None) if day_index is None
+                else opening_span(day_index, entry['open_time'], entry['close_time'])
+            )
+            opening_hours.append(
+                (entry['day_of_week'], entry['open_time'], entry['close_time'], start_minute, end_minute)
+            )
+
+    masks = []
+    for mask in pharmacy_data['masks']:
+        price = to_decimal(mask['price'])
+        masks.append((mask['name'], price, *mask_attributes(mask['name'], price)))
+
+    return (
+        pharmacy_data['name'],
+        to_decimal(pharmacy_data['cashBalance']),
+        masks,
+        opening_hours,
+    )
+
+
+def transform_user(user_data, tz):
+    """
+    Returns (name, cash_balance, purchases) where purchases is a list of
+    (pharmacy_name, mask_name, amount, transaction_date). The date is an
+    aware datetime in ``tz``, or None when the source has no date.
+    """
+    purchases = []
+    for transaction_data in user_data.get('purchaseHistories', []):
+        transaction_date = transaction_data.get('transactionDate')
+        if transaction_date:
+            transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d %H:%M:%S').replace(tzinfo=tz)
+        else:
+            transaction_date = None
+
+        purchases.append((
+            transaction_data['pharmacyName'],
+            transaction_data['maskName'],
+            to_decimal(transaction_data['transactionAmount']),
+            transaction_date,
+        ))
+
+    return user_data['name'], to_decimal(user_data['cashBalance']), purchases
+
+
+def chunked(iterable, size):
+    """Yield lists of up to ``size`` consecutive items."""
+    iterator = iter(iterable)
+    return iter(lambda: list(islice(iterator, size)), [])
+
+
+def _transform_chunk(transform, chunk, **kwargs):
+    return [transform(record, **kwargs) for record in chunk]
+
+
+def transform_records(records, transform, workers=1, chunk_size=1000, **kwargs):
+    """
+    Apply ``transform`` to every record and yield the results in input order.
+
+    With more than one worker the records are split into chunks that are
+    transformed in a process pool. At most ``2 * workers`` chunks are in
+    flight, so a streaming input is never read far ahead of the consumer.
+    """
+    chunks = chunked(records, chunk_size)
+    transform_chunk = partial(_transform_chunk, transform, **kwargs)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from transform_chunk(chunk)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(transform_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,94 @@
+"""
+Catalog facets (brand, color, pack size) for the mask list endpoints.
+"""
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+
+FACETS = ('brand', 'color', 'pack_size')
+# Most values returned per facet, most frequent first
+FACET_VALUE_LIMIT = 100
+
+
+class MaskFacetMixin:
+    """
+    Filters a mask list view by ?brand=, ?color= and ?pack_size= (each a
+    comma-separated list of accepted values) and, with ?facets=brand,color,
+    adds the number of matching masks per value of the named facets.
+
+    A facet's counts apply every filter except its own, so selecting one
+    color still shows how many masks every other color would give. Counts
+    are GROUP BY queries answered from the (brand, color, pack_size),
+    (color, pack_size) and (pack_size) indexes.
+
+    The counts go next to the page's results; an unpaginated list becomes
+    {"results": [...], "facets": {...}}. They cannot be combined with
+    ?stream=1.
+    """
+    facets_query_param = 'facets'
+
+    def get_facet_filters(self):
+        """{facet: [accepted values]} of the facet filters in the query string."""
+        if not hasattr(self, '_facet_filters'):
+            params = self.request.query_params
+            filters = {}
+            for facet in FACETS:
+                if facet not in params:
+                    continue
+                values = list(dict.fromkeys(value.strip() for value in params[facet].split(',') if value.strip()))
+                if facet == 'color':
+                    values = [value.lower() for value in values]
+                elif facet == 'pack_size':
+                    try:
+                        values = [int(value) for value in values]
+                    except ValueError:
+                        raise ValidationError("pack_size must be a comma-separated list of integers.")
+                if not values:
+                    raise ValidationError(f"{facet} must name at least one value.")
+                filters[facet] = values
+            self._facet_filters = filters
+        return self._facet_filters
+
+    def get_requested_facets(self):
+        value = self.request.query_params.get(self.facets_query_param)
+        if value is None:
+            return None
+        requested = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in requested if name not in FACETS]
+        if not requested or unknown:
+            raise ValidationError(f"facets must name one or more of: {', '.join(FACETS)}.")
+        return requested
+
+    def filter_facets(self, queryset, exclude=None):
+        lookups = {
+            f'{facet}__in': values
+            for facet, values in self.get_facet_filters().items() if facet != exclude
+        }
+        return queryset.filter(**lookups)
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(self.filter_facets(queryset))
+
+    def facet_counts(self, facets):
+        """{facet: [{'value', 'count'}]} over the view's queryset."""
+        queryset = self.get_queryset()
+        counts = {}
+        for facet in facets:
+            rows = (
+                self.filter_facets(queryset, exclude=facet)
+                .values(facet).annotate(count=Count('id')).order_by('-count', facet)
+            )
+            counts[facet] = [{'value': row[facet], 'count': row['count']} for row in rows[:FACET_VALUE_LIMIT]]
+        return counts
+
+    def list(self, request, *args, **kwargs):
+        facets = self.get_requested_facets()
+        if facets is None:
+            return super().list(request, *args, **kwargs)
+        if request.query_params.get(getattr(self, 'stream_query_param', None)) in ('1', 'true'):
+            raise ValidationError("facets cannot be combined with stream.")
+
+        response = super().list(request, *args, **kwargs)
+        if not isinstance(response.data, dict):
+            response.data = {'results': response.data}
+        response.data['facets'] = self.facet_counts(facets)
+        return response
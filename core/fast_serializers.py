@@ -0,0 +1,95 @@
+"""
+Read-only serialization without model instances.
+
+FastSerializer reads only the serializer's columns with QuerySet.values()
+and converts each value with the serializer field's own to_representation,
+compiled once per serializer. Fields whose representation of a database
+value is the value itself (integers, strings, booleans, primary keys) are
+copied as is. The output is the same as ``serializer(queryset, many=True).data``
+without building a model instance and running every field per row.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnList
+
+# Fields whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class FastSerializer:
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        model_fields = {field.name for field in model._meta.concrete_fields}
+        self.fields = []
+        for name, field in serializer.fields.items():
+            if field.source not in model_fields:
+                raise ImproperlyConfigured(
+                    f"{type(serializer).__name__}.{name} is not a {model.__name__} column; "
+                    "FastSerializer only handles plain model fields."
+                )
+            converter = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+            self.fields.append((name, field.source, converter))
+
+    @property
+    def columns(self):
+        return [source for _, source, _ in self.fields]
+
+    def values(self, queryset, *extra_columns):
+        """The queryset as dicts holding the serializer's columns (plus ``extra_columns``)."""
+        return queryset.values(*dict.fromkeys([*self.columns, *extra_columns]))
+
+    def represent(self, rows):
+        """Output dicts for rows from values()."""
+        fields = self.fields
+        return [
+            {
+                name: value if converter is None or value is None else converter(value)
+                for name, source, converter in fields
+                for value in (row[source],)
+            }
+            for row in rows
+        ]
+
+    def serialize(self, queryset):
+        return self.represent(self.values(queryset))
+
+
+class FastListSerializer:
+    """Stands in for ``serializer(rows, many=True)`` where only ``.data`` is read."""
+
+    def __init__(self, fast, rows):
+        self.fast = fast
+        self.rows = rows
+
+    @property
+    def data(self):
+        return ReturnList(self.fast.represent(self.rows), serializer=self)
+
+
+class FastReadMixin:
+    """
+    Serves a list view through FastSerializer: the queryset is narrowed to
+    values() rows and get_serializer(rows, many=True) returns a
+    FastListSerializer. Pagination, ?stream=1 and ?fields= keep working, as
+    they only go through filter_queryset and get_serializer.
+    """
+
+    def get_fast_serializer(self):
+        if not hasattr(self, '_fast_serializer'):
+            self._fast_serializer = FastSerializer(super().get_serializer())
+        return self._fast_serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        pagination_class = getattr(self, 'pagination_class', None)
+        return self.get_fast_serializer().values(queryset, *getattr(pagination_class, 'ordering', ()))
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            return FastListSerializer(self.get_fast_serializer(), args[0])
+        return super().get_serializer(*args, **kwargs)
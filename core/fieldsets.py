@@ -0,0 +1,51 @@
+"""
+Sparse fieldsets (?fields=id,name,price) for the list endpoints.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Restricts a list view to the comma-separated fields named in ?fields=.
+    The serializer only outputs those fields and the queryset only selects
+    their columns (plus the pagination keys). Unknown names are rejected.
+    Requires a DynamicFieldsModelSerializer.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.parse_fields(self.request.query_params.get(self.fields_query_param))
+        return self._requested_fields
+
+    def parse_fields(self, value):
+        if value is None:
+            return None
+        requested = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        if not requested:
+            raise ValidationError("fields must name at least one field.")
+
+        available = list(self.get_serializer_class()().fields)
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError(
+                f"Unknown field(s): {', '.join(unknown)}. Available fields: {', '.join(available)}."
+            )
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = [name for name in fields if name in model_fields]
+        # Keyset pagination reads its ordering keys from every row
+        pagination_class = getattr(self, 'pagination_class', None)
+        columns.extend(getattr(pagination_class, 'ordering', ()))
+        return queryset.only(*dict.fromkeys(columns))
@@ -0,0 +1,134 @@
+"""
+Database full-text search over Mask.name and Pharmacy.name.
+
+MySQL uses a FULLTEXT index queried with MATCH ... AGAINST in boolean mode.
+SQLite uses an FTS5 table per model (external content, so it stores only
+the index) kept in step with the model table by triggers. Django rebuilds
+SQLite tables for some schema changes, dropping their triggers, so
+install() is idempotent and restore() runs it after every migrate once
+the FTS5 tables exist (see core.apps).
+
+Every query word is required and matches the start of a word; unlike the
+in-memory index there are no matches inside a word. InnoDB does not index
+words shorter than innodb_ft_min_token_size (3 by default), so on MySQL
+such words are checked with LIKE instead.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from .models import Mask, Pharmacy
+
+MODELS = (Mask, Pharmacy)
+MYSQL_MIN_TOKEN_SIZE = 3
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def fulltext_index(model):
+    return f"{model._meta.db_table}_name_fulltext"
+
+
+def is_installed(connection, model):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT 1 FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                [model._meta.db_table, fulltext_index(model)],
+            )
+        else:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table(model)])
+        return cursor.fetchone() is not None
+
+
+def sqlite_triggers(model):
+    """{name: CREATE TRIGGER statement} keeping the FTS5 table of ``model`` current."""
+    table, fts = model._meta.db_table, fts_table(model)
+    insert = f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name);"
+    delete = f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name);"
+    return {
+        f"{fts}_insert": f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"{fts}_delete": f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"{fts}_update": f"CREATE TRIGGER {fts}_update AFTER UPDATE OF name ON {table} BEGIN {delete} {insert} END",
+    }
+
+
+def install(connection):
+    """Create the full-text indexes (and SQLite triggers) that are missing."""
+    if connection.vendor not in ('mysql', 'sqlite'):
+        return
+    with connection.cursor() as cursor:
+        for model in MODELS:
+            table = model._meta.db_table
+            if connection.vendor == 'mysql':
+                if not is_installed(connection, model):
+                    cursor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {fulltext_index(model)} (name)")
+                continue
+
+            fts = fts_table(model)
+            if not is_installed(connection, model):
+                cursor.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5(name, content='{table}', content_rowid='id')")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [sql for name, sql in sqlite_triggers(model).items() if name not in existing]
+            for statement in missing:
+                cursor.execute(statement)
+            if missing:
+                # Rows written without the triggers are indexed again
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def restore(sender, using, **kwargs):
+    """post_migrate: put back SQLite triggers dropped when Django rebuilt a table."""
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and all(is_installed(connection, model) for model in MODELS):
+        install(connection)
+
+
+def uninstall(connection):
+    if connection.vendor not in ('mysql', 'sqlite'):
+        return
+    with connection.cursor() as cursor:
+        for model in MODELS:
+            if not is_installed(connection, model):
+                continue
+            if connection.vendor == 'mysql':
+                cursor.execute(f"ALTER TABLE {model._meta.db_table} DROP INDEX {fulltext_index(model)}")
+                continue
+            fts = fts_table(model)
+            for name in sqlite_triggers(model):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE {fts}")
+
+
+def search(connection, model, terms, limit):
+    """[(object_id, relevance)] of rows whose name has every term as a word prefix, best first."""
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        indexed = [term for term in terms if len(term) >= MYSQL_MIN_TOKEN_SIZE]
+        short = [f"%{term}%" for term in terms if len(term) < MYSQL_MIN_TOKEN_SIZE]
+        if indexed:
+            against = ' '.join(f"+{term}*" for term in indexed)
+            match = "MATCH(name) AGAINST (%s IN BOOLEAN MODE)"
+            sql = (
+                f"SELECT id, {match} AS relevance FROM {table} WHERE {match}"
+                + ''.join(' AND name LIKE %s' for _ in short)
+                + " ORDER BY relevance DESC, id LIMIT %s"
+            )
+            params = [against, against, *short, limit]
+        else:
+            # Nothing the FULLTEXT index can answer
+            sql = f"SELECT id, 1 FROM {table} WHERE {' AND '.join(['name LIKE %s'] * len(short))} ORDER BY id LIMIT %s"
+            params = [*short, limit]
+    elif connection.vendor == 'sqlite':
+        fts = fts_table(model)
+        # bm25() is lower for better matches
+        sql = f"SELECT rowid, -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s ORDER BY bm25({fts}), rowid LIMIT %s"
+        params = [' '.join(f'"{term}"*' for term in terms), limit]
+    else:
+        raise ImproperlyConfigured(f"SEARCH_BACKEND 'database' supports MySQL and SQLite, not {connection.vendor}.")
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(object_id, float(relevance)) for object_id, relevance in cursor.fetchall()]
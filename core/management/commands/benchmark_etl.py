@@ -0,0 +1,80 @@
+import os
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.benchmarks import Timer, default_report_path, measurement, peak_rss_mb, write_report
+from core.etl import iter_json_array, transform_records, transform_pharmacy, transform_user
+from core.management.commands.load_initial_data import Command as LoadInitialDataCommand
+from core.models import Pharmacy, User
+
+
+class Command(BaseCommand):
+    help = 'Time each ETL phase (extract, transform, load) and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', required=True, help='Directory containing pharmacies.json and users.json.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--backend', choices=['orm', 'native'], default='orm')
+        parser.add_argument('--output', help='Report path (default: benchmarks/etl-<timestamp>.json).')
+        parser.add_argument('--skip-load', action='store_true', help='Only time extract and transform.')
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        paths = {name: os.path.join(data_dir, f'{name}.json') for name in ('pharmacies', 'users')}
+        for path in paths.values():
+            if not os.path.exists(path):
+                raise CommandError(f"{path} does not exist.")
+        if not options['skip_load'] and (Pharmacy.objects.exists() or User.objects.exists()):
+            raise CommandError("The load phase needs an empty database (run `manage.py flush` first) or --skip-load.")
+
+        results = []
+        tz = timezone.get_current_timezone()
+
+        for name, path in paths.items():
+            with Timer() as extract:
+                rows = sum(1 for _ in iter_json_array(path))
+            results.append(measurement(f'extract.{name}', extract.seconds, rows))
+
+            transform = transform_pharmacy if name == 'pharmacies' else transform_user
+            kwargs = {} if name == 'pharmacies' else {'tz': tz}
+            with Timer() as extract_transform:
+                for _ in transform_records(
+                    iter_json_array(path), transform,
+                    workers=options['workers'], chunk_size=options['batch_size'], **kwargs
+                ):
+                    pass
+            # Reported separately from extraction, which it necessarily includes
+            results.append(measurement(
+                f'transform.{name}', max(extract_transform.seconds - extract.seconds, 0.0), rows,
+                includes_extract_seconds=round(extract_transform.seconds, 4),
+            ))
+
+        if not options['skip_load']:
+            loader = LoadInitialDataCommand(stdout=StringIO())
+            with Timer() as load:
+                call_command(
+                    loader, data_dir=data_dir,
+                    batch_size=options['batch_size'], workers=options['workers'],
+                    backend=options['backend'],
+                )
+            for writer in loader.writers:
+                results.append(measurement(f'load.{writer.model.__name__}', writer.elapsed, writer.rows))
+            results.append(measurement('load.total', load.seconds, sum(w.rows for w in loader.writers)))
+
+        output = options['output'] or default_report_path('etl')
+        write_report(
+            output, 'etl', results,
+            options={key: options[key] for key in ('data_dir', 'batch_size', 'workers', 'backend')},
+            input_bytes={name: os.path.getsize(path) for name, path in paths.items()},
+            worker_peak_rss_mb=peak_rss_mb(children=True),
+        )
+
+        for result in results:
+            rate = f"{result['rows_per_second']:.0f} rows/s" if result['rows_per_second'] else '-'
+            self.stdout.write(
+                f"{result['name']:<28} {result['rows']:>10} rows {result['seconds']:>9.3f}s "
+                f"{rate:>16}  peak {result['peak_rss_mb']} MB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
@@ -0,0 +1,81 @@
+import random
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from core.benchmarks import Timer, default_report_path, measurement, write_report
+from core.catalog import mask_fields
+from core.models import Mask, Pharmacy
+
+# (min_price, max_price, compare, count) as passed to pharmacies/mask-filter/
+CASES = [
+    (Decimal('0'), None, None, 0),
+    (Decimal('10'), Decimal('30'), 'gt', 3),
+    (Decimal('5'), Decimal('25'), 'lte', 3),
+    (Decimal('40'), Decimal('45'), 'lt', 1),
+]
+
+
+class Command(BaseCommand):
+    help = 'Time the pharmacies/mask-filter/ query on seeded data and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pharmacies', type=int, default=10000, help='Pharmacies to seed (default: 10000).')
+        parser.add_argument('--masks', type=int, default=1000000, help='Masks to seed (default: 1000000).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the fastest is reported (default: 3).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Report path (default: benchmarks/mask-filter-<timestamp>.json).')
+
+    def handle(self, *args, **options):
+        if options['pharmacies'] < 1 or options['masks'] < 0 or options['repeat'] < 1:
+            raise CommandError("--pharmacies and --repeat must be positive and --masks non-negative.")
+
+        # The seeded rows only exist for the run: everything is rolled back.
+        with db_transaction.atomic():
+            self.seed(random.Random(options['seed']), options['pharmacies'], options['masks'])
+            results = self.run(options['repeat'])
+            db_transaction.set_rollback(True)
+
+        output = options['output'] or default_report_path('mask-filter')
+        write_report(
+            output, 'mask-filter', results,
+            options={key: options[key] for key in ('pharmacies', 'masks', 'repeat', 'seed')},
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<36} {result['rows']:>8} pharmacies {result['seconds']:>9.3f}s"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
+
+    def seed(self, rng, pharmacies, masks):
+        created = Pharmacy.objects.bulk_create(
+            (Pharmacy(name=f"Benchmark Pharmacy {index}", cash_balance=Decimal('0')) for index in range(pharmacies)),
+            batch_size=5000,
+        )
+        pharmacy_ids = [pharmacy.id for pharmacy in created]
+        if pharmacy_ids[0] is None:  # backends that do not return ids from bulk inserts
+            pharmacy_ids = list(Pharmacy.objects.filter(name__startswith='Benchmark Pharmacy ').values_list('id', flat=True))
+        Mask.objects.bulk_create(
+            (
+                Mask(pharmacy_id=rng.choice(pharmacy_ids), name='Benchmark Mask', price=price,
+                     **mask_fields('Benchmark Mask', price))
+                for price in (Decimal(rng.randrange(100, 5000)) / 100 for _ in range(masks))
+            ),
+            batch_size=5000,
+        )
+
+    def run(self, repeat):
+        results = []
+        for min_price, max_price, compare, count in CASES:
+            queryset = Pharmacy.objects.with_mask_count(min_price, max_price)
+            if compare:
+                queryset = queryset.filter(**{f'mask_count__{compare}': count})
+
+            best = None
+            for _ in range(repeat):
+                with Timer() as timer:
+                    rows = len(list(queryset.values_list('id', 'mask_count')))
+                best = timer.seconds if best is None else min(best, timer.seconds)
+
+            name = f"{min_price}-{max_price or 'max'} {compare or 'all'} {count}"
+            results.append(measurement(name, best, rows, plan=queryset.explain()))
+        return results
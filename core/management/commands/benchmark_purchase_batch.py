@@ -0,0 +1,102 @@
+import random
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+from core.analytics import top_users_engine
+from core.benchmarks import (Timer, confirm_database, create_rows, default_report_path, delete_rows, measurement,
+                             write_report)
+from core.catalog import mask_fields
+from core.models import DailySales, Mask, Pharmacy, Transaction, User
+from core.views import PurchaseBatchView, PurchaseView
+
+USER_PREFIX = 'Benchmark User '
+PHARMACY_PREFIX = 'Benchmark Pharmacy '
+
+
+class Command(BaseCommand):
+    help = 'Compare one purchase/ call per order with one purchase/batch/ call on seeded data and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000, help='Orders per run (default: 5000).')
+        parser.add_argument('--items', type=int, default=3, help='Line items per order (default: 3).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Report path (default: benchmarks/purchase-batch-<timestamp>.json).')
+        parser.add_argument('--database', help='Name of the configured database, to confirm it may be written to.')
+
+    def handle(self, *args, **options):
+        if options['orders'] < 1 or options['items'] < 1:
+            raise CommandError("--orders and --items must be positive.")
+        # Both runs commit for real (one transaction per purchase/ call, one
+        # per group in purchase/batch/), so the seeded rows are committed
+        # and deleted afterwards, by id.
+        confirm_database(options['database'])
+
+        self.user_ids, self.pharmacy_ids, self.mask_ids = [], [], []
+        factory = APIRequestFactory()
+        try:
+            orders = self.seed(random.Random(options['seed']), options['orders'], options['items'])
+            single = PurchaseView.as_view()
+            with Timer() as sequential:
+                for order in orders:
+                    response = single(factory.post('/api/purchase/', order, format='json'))
+                    if response.status_code != 201:
+                        raise CommandError(f"purchase/ failed: {response.data}")
+            with Timer() as batch:
+                response = PurchaseBatchView.as_view()(
+                    factory.post('/api/purchase/batch/', {'orders': orders}, format='json')
+                )
+            if response.data['rejected']:
+                raise CommandError(f"{response.data['rejected']} batch orders were rejected.")
+        finally:
+            self.clean_up()
+
+        results = [
+            measurement('purchase/ per order', sequential.seconds, len(orders)),
+            measurement('purchase/batch/', batch.seconds, len(orders)),
+        ]
+        output = options['output'] or default_report_path('purchase-batch')
+        write_report(
+            output, 'purchase-batch', results,
+            options={key: options[key] for key in ('orders', 'items', 'seed')},
+        )
+        for result in results:
+            self.stdout.write(f"{result['name']:<24} {result['rows_per_second']:>10.1f} orders/s")
+        speedup = sequential.seconds / batch.seconds if batch.seconds else 0
+        self.stdout.write(self.style.SUCCESS(f"Batch: {speedup:.1f}x. Report written to {output}"))
+
+    def seed(self, rng, orders, items):
+        """One user per order, with enough cash for both runs."""
+        self.pharmacy_ids += create_rows(Pharmacy, (
+            Pharmacy(name=f"{PHARMACY_PREFIX}{index}", cash_balance=Decimal('0')) for index in range(50)
+        ), name__startswith=PHARMACY_PREFIX)
+        masks = []
+        for pharmacy_id in self.pharmacy_ids:
+            for index in range(20):
+                name, price = f"Benchmark Mask ({index % 3 + 1} per pack)", Decimal(rng.randrange(100, 2000)) / 100
+                masks.append(Mask(pharmacy_id=pharmacy_id, name=name, price=price, **mask_fields(name, price)))
+        self.mask_ids += create_rows(Mask, masks, pharmacy_id__in=self.pharmacy_ids)
+        masks = [(mask.pharmacy_id, mask_id) for mask, mask_id in zip(masks, self.mask_ids)]
+
+        self.user_ids += create_rows(User, (
+            User(name=f"{USER_PREFIX}{index}", cash_balance=Decimal('100000')) for index in range(orders)
+        ), name__startswith=USER_PREFIX)
+        return [
+            {
+                'user_id': user_id,
+                'purchases': [
+                    {'pharmacy_id': pharmacy_id, 'mask_id': mask_id, 'quantity': rng.randint(1, 5)}
+                    for pharmacy_id, mask_id in rng.sample(masks, items)
+                ],
+            }
+            for user_id in self.user_ids
+        ]
+
+    def clean_up(self):
+        """Delete the rows the benchmark created, and the purchases of its users."""
+        for model in (DailySales, Transaction):
+            delete_rows(model, 'user_id', self.user_ids)
+        delete_rows(Mask, 'id', self.mask_ids)
+        delete_rows(Pharmacy, 'id', self.pharmacy_ids)
+        delete_rows(User, 'id', self.user_ids)
+        # The analytics snapshot may have loaded the deleted transactions
+        top_users_engine.invalidate()
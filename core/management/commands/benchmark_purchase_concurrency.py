@@ -0,0 +1,174 @@
+import itertools
+import random
+import threading
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Min, Sum
+from rest_framework.exceptions import ValidationError
+from core.analytics import top_users_engine
+from core.benchmarks import (Timer, confirm_database, create_rows, default_report_path, delete_rows, measurement,
+                             write_report)
+from core.catalog import mask_fields
+from core.models import DailySales, Mask, Pharmacy, Transaction, User
+from core.purchases import OPTIMISTIC, PESSIMISTIC, PurchaseConflict, place_order
+
+USER_PREFIX = 'Benchmark User '
+PHARMACY_PREFIX = 'Benchmark Pharmacy '
+
+
+class Command(BaseCommand):
+    help = ('Place purchases from concurrent threads with pessimistic and optimistic concurrency, '
+            'check the balances and write a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=2000, help='Orders per run (default: 2000).')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Users the orders are spread over; fewer means more conflicts (default: 20).')
+        parser.add_argument('--pharmacies', type=int, default=2,
+                            help='Pharmacies the masks are spread over (default: 2).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Report path (default: benchmarks/purchase-concurrency-<timestamp>.json).')
+        parser.add_argument('--database', help='Name of the configured database, to confirm it may be written to.')
+
+    def handle(self, *args, **options):
+        if min(options['threads'], options['orders'], options['users'], options['pharmacies']) < 1:
+            raise CommandError("--threads, --orders, --users and --pharmacies must be positive.")
+        # Every thread commits on its own connection, so the seeded rows are
+        # committed and deleted afterwards, by id.
+        confirm_database(options['database'])
+
+        if connection.vendor == 'sqlite':
+            self.check_sqlite()
+
+        rng = random.Random(options['seed'])
+        self.user_ids, self.pharmacy_ids, self.mask_ids = [], [], []
+        results = []
+        try:
+            orders, cash = self.seed(rng, options['orders'], options['users'], options['pharmacies'])
+            for mode in (PESSIMISTIC, OPTIMISTIC):
+                self.reset(cash)
+                results.append(self.run(mode, orders, options['threads']))
+        finally:
+            self.clean_up()
+
+        output = options['output'] or default_report_path('purchase-concurrency')
+        write_report(
+            output, 'purchase-concurrency', results,
+            options={key: options[key] for key in ('threads', 'orders', 'users', 'pharmacies', 'seed')},
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<12} {result['rows_per_second']:>10.1f} settled orders/s  "
+                f"accepted {result['accepted']}  rejected {result['rejected']}  failed {result['failed']}  "
+                f"conflicts/order {result['conflict_rate']:.3f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"No balance went negative. Report written to {output}"))
+
+    def check_sqlite(self):
+        """
+        SQLite ignores SELECT ... FOR UPDATE, so the pessimistic mode only
+        serializes orders if transactions take the write lock when they begin.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        if journal_mode.lower() != 'wal' or connection.transaction_mode != 'IMMEDIATE':
+            self.stderr.write(self.style.WARNING(
+                "Concurrent pessimistic orders will fail with 'database is locked'. For a meaningful "
+                "comparison on SQLite set DATABASES OPTIONS to {'init_command': 'PRAGMA journal_mode=WAL;', "
+                "'transaction_mode': 'IMMEDIATE', 'timeout': 20} (see setup.md), or run it on MySQL."
+            ))
+
+    def seed(self, rng, orders, users, pharmacies):
+        """Orders of random users, who can afford about half of theirs."""
+        self.pharmacy_ids += create_rows(Pharmacy, (
+            Pharmacy(name=f"{PHARMACY_PREFIX}{index}", cash_balance=Decimal('0')) for index in range(pharmacies)
+        ), name__startswith=PHARMACY_PREFIX)
+        masks = []
+        for pharmacy_id in self.pharmacy_ids:
+            for index in range(5):
+                name, price = f"Benchmark Mask ({index % 3 + 1} per pack)", Decimal(rng.randrange(100, 2000)) / 100
+                masks.append(Mask(pharmacy_id=pharmacy_id, name=name, price=price, **mask_fields(name, price)))
+        self.mask_ids += create_rows(Mask, masks, pharmacy_id__in=self.pharmacy_ids)
+        masks = [(mask.pharmacy_id, mask_id) for mask, mask_id in zip(masks, self.mask_ids)]
+
+        # Orders average 31.50: two lines of 1-2 masks at 1.00-20.00
+        cash = (Decimal(orders) / users * Decimal('15.75')).quantize(Decimal('0.01'))
+        self.user_ids += create_rows(User, (
+            User(name=f"{USER_PREFIX}{index}", cash_balance=cash) for index in range(users)
+        ), name__startswith=USER_PREFIX)
+        return [
+            (rng.choice(self.user_ids), [
+                (pharmacy_id, mask_id, rng.randint(1, 2)) for pharmacy_id, mask_id in rng.sample(masks, 2)
+            ])
+            for _ in range(orders)
+        ], cash
+
+    def run(self, mode, orders, threads):
+        counts = {'accepted': 0, 'rejected': 0, 'failed': 0}
+        conflicts = itertools.count()
+        lock = threading.Lock()
+
+        def work(chunk):
+            try:
+                for user_id, items in chunk:
+                    try:
+                        place_order(user_id, items, concurrency=mode, on_conflict=conflicts.__next__)
+                        outcome = 'accepted'
+                    except ValidationError:
+                        outcome = 'rejected'
+                    except (PurchaseConflict, DatabaseError):
+                        outcome = 'failed'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=work, args=(orders[index::threads],)) for index in range(threads)]
+        with Timer() as timer:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.check_balances(mode)
+        conflict_count = next(conflicts)
+        # Throughput counts settled orders: failed ones did no work
+        return measurement(mode, timer.seconds, counts['accepted'] + counts['rejected'], **counts,
+                           conflicts=conflict_count, conflict_rate=round(conflict_count / len(orders), 4))
+
+    def check_balances(self, mode):
+        """No negative balance, and money only moved from users to pharmacies through transactions."""
+        users = User.objects.filter(id__in=self.user_ids).aggregate(lowest=Min('cash_balance'), total=Sum('cash_balance'))
+        credited = Pharmacy.objects.filter(id__in=self.pharmacy_ids).aggregate(total=Sum('cash_balance'))['total']
+        spent = Transaction.objects.filter(user_id__in=self.user_ids).aggregate(
+            total=Sum('transaction_amount'))['total'] or Decimal('0')
+        # SQLite stores and adds decimals as floats
+        cents = Decimal('0.01')
+        lowest, remaining, credited, spent = (
+            value.quantize(cents) for value in (users['lowest'], users['total'], credited, spent)
+        )
+        if lowest < 0:
+            raise CommandError(f"{mode}: a user balance went negative ({lowest}).")
+        if credited != spent or remaining + spent != self.initial_total:
+            raise CommandError(f"{mode}: balances do not add up (spent {spent}, credited {credited}).")
+
+    def reset(self, cash):
+        self.delete_purchases()
+        User.objects.filter(id__in=self.user_ids).update(cash_balance=cash, version=0)
+        Pharmacy.objects.filter(id__in=self.pharmacy_ids).update(cash_balance=Decimal('0'), version=0)
+        self.initial_total = cash * len(self.user_ids)
+
+    def delete_purchases(self):
+        for model in (DailySales, Transaction):
+            delete_rows(model, 'user_id', self.user_ids)
+
+    def clean_up(self):
+        """Delete the rows the benchmark created, and the purchases of its users."""
+        self.delete_purchases()
+        delete_rows(Mask, 'id', self.mask_ids)
+        delete_rows(Pharmacy, 'id', self.pharmacy_ids)
+        delete_rows(User, 'id', self.user_ids)
+        # The analytics snapshot may have loaded the deleted transactions
+        top_users_engine.invalidate()
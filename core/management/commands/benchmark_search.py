@@ -0,0 +1,101 @@
+import random
+import statistics
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from core.benchmarks import Timer, default_report_path, measurement, write_report
+from core.catalog import mask_fields
+from core.management.commands.generate_dataset import MASK_BRANDS, MASK_COLORS
+from core.models import Mask, Pharmacy
+from core.search import SEARCH_BACKENDS, SEARCH_INDEXES, get_search_backend
+
+QUERIES = ['true barrier', 'blue', 'smile black 6 per pack', 'maskt', 'cotton kiss 3', 'zzz']
+
+
+class Command(BaseCommand):
+    help = 'Compare search backend latency on seeded masks and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--masks', type=int, default=1000000, help='Masks to seed (default: 1000000).')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query and backend (default: 20).')
+        parser.add_argument('--limit', type=int, default=100, help='Results per search (default: 100).')
+        parser.add_argument(
+            '--backends', default=','.join(SEARCH_BACKENDS),
+            help=f"Comma-separated backends to time (default: {','.join(SEARCH_BACKENDS)}).",
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Report path (default: benchmarks/search-<timestamp>.json).')
+
+    def handle(self, *args, **options):
+        if options['masks'] < 1 or options['repeat'] < 1 or options['limit'] < 1:
+            raise CommandError("--masks, --repeat and --limit must be positive.")
+        backends = [name.strip() for name in options['backends'].split(',') if name.strip()]
+        unknown = [name for name in backends if name not in SEARCH_BACKENDS]
+        if unknown:
+            raise CommandError(f"Unknown backend(s): {', '.join(unknown)}.")
+
+        # InnoDB applies FULLTEXT changes at commit, so on MySQL the masks are
+        # committed and deleted afterwards; elsewhere they are rolled back.
+        commit = connection.vendor == 'mysql'
+        with db_transaction.atomic():
+            pharmacy = self.seed(random.Random(options['seed']), options['masks'])
+            if not commit:
+                results = self.run(backends, options['repeat'], options['limit'])
+                db_transaction.set_rollback(True)
+        if commit:
+            try:
+                results = self.run(backends, options['repeat'], options['limit'])
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {Mask._meta.db_table} WHERE pharmacy_id = %s", [pharmacy.id])
+                    cursor.execute(f"DELETE FROM {Pharmacy._meta.db_table} WHERE id = %s", [pharmacy.id])
+        # The in-process index saw the seeded masks
+        SEARCH_INDEXES[Mask].invalidate()
+
+        output = options['output'] or default_report_path('search')
+        write_report(
+            output, 'search', results,
+            options={key: options[key] for key in ('masks', 'repeat', 'limit', 'seed')},
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<36} {result['rows']:>8} rows  median {result['median_ms']:>9.3f} ms  "
+                f"max {result['max_ms']:>9.3f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
+
+    def seed(self, rng, masks):
+        pharmacy = Pharmacy.objects.create(name='Benchmark Pharmacy', cash_balance=Decimal('0'))
+
+        def build():
+            name = f"{rng.choice(MASK_BRANDS)} ({rng.choice(MASK_COLORS)}) ({rng.randint(1, 12)} per pack)"
+            price = Decimal(rng.randrange(100, 5000)) / 100
+            return Mask(pharmacy=pharmacy, name=name, price=price, **mask_fields(name, price))
+
+        Mask.objects.bulk_create((build() for _ in range(masks)), batch_size=5000)
+        return pharmacy
+
+    def run(self, backends, repeat, limit):
+        results = []
+        for name in backends:
+            backend = get_search_backend(name)
+            if name == 'memory':
+                with Timer() as timer:
+                    SEARCH_INDEXES[Mask].build()
+                milliseconds = round(timer.seconds * 1000, 3)
+                results.append(measurement(
+                    'memory (build)', timer.seconds, len(SEARCH_INDEXES[Mask]),
+                    median_ms=milliseconds, max_ms=milliseconds,
+                ))
+            for query in QUERIES:
+                timings = []
+                for _ in range(repeat):
+                    with Timer() as timer:
+                        hits = backend.search(Mask, query, limit)
+                    timings.append(timer.seconds)
+                results.append(measurement(
+                    f"{name} {query!r}", min(timings), len(hits),
+                    median_ms=round(statistics.median(timings) * 1000, 3),
+                    max_ms=round(max(timings) * 1000, 3),
+                ))
+        return results
@@ -0,0 +1,70 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from rest_framework.renderers import JSONRenderer
+from core.benchmarks import Timer, default_report_path, measurement, write_report
+from core.catalog import mask_fields
+from core.fast_serializers import FastSerializer
+from core.models import Mask, Pharmacy
+from core.serializers import MaskSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF ModelSerializer and FastSerializer throughput on masks and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Masks to serialize (default: 100000).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per engine; the fastest is reported (default: 3).')
+        parser.add_argument('--output', help='Report path (default: benchmarks/serializers-<timestamp>.json).')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows < 1 or repeat < 1:
+            raise CommandError("--rows and --repeat must be positive.")
+
+        # The masks only exist for the run: everything is rolled back.
+        with db_transaction.atomic():
+            self.seed(rows)
+            results = self.run(rows, repeat)
+            db_transaction.set_rollback(True)
+
+        output = options['output'] or default_report_path('serializers')
+        write_report(output, 'serializers', results, options={'rows': rows, 'repeat': repeat})
+
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<12} {result['rows']:>10} rows {result['seconds']:>9.3f}s "
+                f"{result['rows_per_second']:>12.0f} rows/s"
+            )
+        speedup = results[0]['seconds'] / results[1]['seconds'] if results[1]['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(f"FastSerializer: {speedup:.1f}x. Report written to {output}"))
+
+    def seed(self, rows):
+        pharmacy = Pharmacy.objects.create(name='Benchmark Pharmacy', cash_balance=Decimal('0'))
+
+        def build(index):
+            name, price = f"Benchmark Mask ({index % 3 + 1} per pack)", Decimal(index % 5000) / 100
+            return Mask(pharmacy=pharmacy, name=name, price=price, **mask_fields(name, price))
+
+        Mask.objects.bulk_create((build(index) for index in range(rows)), batch_size=5000)
+
+    def run(self, rows, repeat):
+        queryset = Mask.objects.filter(pharmacy__name='Benchmark Pharmacy').order_by('id')
+        engines = [
+            ('drf.Mask', lambda: MaskSerializer(queryset.all(), many=True).data),
+            ('fast.Mask', lambda: FastSerializer(MaskSerializer()).serialize(queryset.all())),
+        ]
+
+        results, outputs = [], []
+        for name, serialize in engines:
+            best = None
+            for _ in range(repeat):
+                with Timer() as timer:
+                    data = serialize()
+                best = timer.seconds if best is None else min(best, timer.seconds)
+            outputs.append(JSONRenderer().render(data))
+            results.append(measurement(name, best, rows))
+
+        if outputs[0] != outputs[1]:
+            raise CommandError("FastSerializer output differs from MaskSerializer.")
+        return results
@@ -0,0 +1,63 @@
+import random
+from django.core.management.base import BaseCommand, CommandError
+from core.analytics import TransactionSnapshot, np
+from core.benchmarks import Timer, default_report_path, measurement, peak_rss_mb, write_report
+
+DAY_US = 24 * 60 * 60 * 1_000_000
+
+
+class Command(BaseCommand):
+    help = 'Time date-range top-K queries on a synthetic in-memory transaction snapshot and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000000, help='Transactions in the snapshot (default: 20000000).')
+        parser.add_argument('--users', type=int, default=1000000, help='Distinct users (default: 1000000).')
+        parser.add_argument('--days', type=int, default=365, help='Days the transactions span (default: 365).')
+        parser.add_argument('--queries', type=int, default=50, help='Random date ranges to time (default: 50).')
+        parser.add_argument('--limit', type=int, default=10, help='K of the top-K (default: 10).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Report path (default: benchmarks/top-users-<timestamp>.json).')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("This benchmark needs NumPy (pip install numpy).")
+        if min(options['rows'], options['users'], options['days'], options['queries']) < 1:
+            raise CommandError("--rows, --users, --days and --queries must be positive.")
+
+        generator = np.random.default_rng(options['seed'])
+        rows, span = options['rows'], options['days'] * DAY_US
+        with Timer() as build:
+            snapshot = TransactionSnapshot(*(np.empty(0, dtype=np.int64) for _ in range(3))).extend(
+                generator.integers(0, span, rows, dtype=np.int64),
+                generator.integers(1, options['users'] + 1, rows, dtype=np.int64),
+                generator.integers(100, 50000, rows, dtype=np.int64),
+            )
+        results = [measurement('build', build.seconds, rows)]
+
+        rng = random.Random(options['seed'])
+        timings, scanned = [], 0
+        for _ in range(options['queries']):
+            start, end = sorted(rng.randrange(span) for _ in range(2))
+            with Timer() as query:
+                snapshot.top_users(start, end, options['limit'])
+            timings.append(query.seconds)
+            scanned += int(np.searchsorted(snapshot.dates, end, 'right') - np.searchsorted(snapshot.dates, start))
+
+        timings.sort()
+        results.append(measurement(
+            'top_users', sum(timings), scanned,
+            queries=len(timings),
+            median_ms=round(timings[len(timings) // 2] * 1000, 2),
+            max_ms=round(timings[-1] * 1000, 2),
+        ))
+
+        output = options['output'] or default_report_path('top-users')
+        write_report(
+            output, 'top-users', results,
+            options={key: options[key] for key in ('rows', 'users', 'days', 'queries', 'limit', 'seed')},
+        )
+        self.stdout.write(f"build      {rows:>10} rows {build.seconds:>9.3f}s  peak {peak_rss_mb()} MB")
+        self.stdout.write(
+            f"top_users  {len(timings):>10} ranges  median {results[1]['median_ms']} ms  max {results[1]['max_ms']} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
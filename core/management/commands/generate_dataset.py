@@ -0,0 +1,134 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+
+PHARMACY_NAMES = [
+    'DFW Wellness', 'Carepoint', 'First Care Rx', 'Welltrack', 'Prescription Hope', 'Health Mart',
+    'Health Warehouse', 'First Pharmacy', 'Centrico', 'Below Drug', 'Medlife', 'PharmaMed',
+    'Foundation Care', 'Keystone Pharmacy', 'RX Universal', 'Health Element', 'Blink Health',
+    'Acculife Drug Stores',
+]
+MASK_BRANDS = ['True Barrier', 'MaskT', 'Second Smile', 'Masquerade', 'Cotton Kiss']
+MASK_COLORS = ['black', 'blue', 'green']
+PACK_SIZES = [3, 6, 10]
+FIRST_NAMES = [
+    'Yvonne', 'Ada', 'Geneva', 'Lester', 'Violet', 'Bertha', 'Sherri', 'Timothy', 'Marilyn', 'Eric',
+    'Ismael', 'Robyn', 'Winifred', 'Willie', 'Marlon', 'Holly', 'Wilbert', 'Felipe', 'Pamela', 'Bonnie',
+]
+LAST_NAMES = [
+    'Guerrero', 'Larson', 'Floyd', 'Arnold', 'Bush', 'Guzman', 'Lynch', 'Schultz', 'Cruz', 'Underwood',
+    'Cole', 'Wilson', 'Steele', 'Moran', 'Watson', 'Thompson', 'Love', 'Gibson', 'French', 'Malone',
+]
+
+# Ranges use the short names understood by expand_days; comma lists use the
+# mixed spellings ('Thur') found in the source data.
+RANGE_DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+LIST_DAYS = ['Mon', 'Tue', 'Wed', 'Thur', 'Fri', 'Sat', 'Sun']
+DAY_TIMES = ['08:00 - 12:00', '08:00 - 17:00', '09:00 - 18:00', '14:00 - 18:00', '10:00 - 22:00']
+NIGHT_TIMES = ['20:00 - 02:00', '22:00 - 06:00']
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic pharmacies.json / users.json dataset in the source schema'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='data/generated', help='Directory for the generated files.')
+        parser.add_argument('--pharmacies', type=int, default=1000, help='Number of pharmacies (default: 1000).')
+        parser.add_argument('--masks-per-pharmacy', type=int, default=8, help='Average masks per pharmacy (default: 8).')
+        parser.add_argument('--users', type=int, default=10000, help='Number of users (default: 10000).')
+        parser.add_argument('--transactions', type=int, default=100000, help='Total purchase history entries (default: 100000).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets (default: 0).')
+
+    def handle(self, *args, **options):
+        if options['pharmacies'] < 1 or options['masks_per_pharmacy'] < 1 or options['users'] < 1:
+            raise CommandError("--pharmacies, --masks-per-pharmacy and --users must be positive.")
+        if options['transactions'] < 0:
+            raise CommandError("--transactions cannot be negative.")
+
+        rng = random.Random(options['seed'])
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+
+        catalog = []
+        pharmacies_path = os.path.join(output_dir, 'pharmacies.json')
+        self.write_array(pharmacies_path, self.generate_pharmacies(rng, options, catalog))
+
+        users_path = os.path.join(output_dir, 'users.json')
+        self.write_array(users_path, self.generate_users(rng, options, catalog))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['pharmacies']} pharmacies, {options['users']} users and "
+            f"{options['transactions']} transactions to {output_dir}."
+        ))
+
+    def write_array(self, path, items):
+        """Write items as a JSON array one element at a time."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for index, item in enumerate(items):
+                f.write(',\n  ' if index else '\n  ')
+                f.write(json.dumps(item))
+            f.write('\n]\n')
+
+    def generate_pharmacies(self, rng, options, catalog):
+        """Yields pharmacies and fills ``catalog`` with (name, [(mask_name, price)])."""
+        average = options['masks_per_pharmacy']
+        for index in range(options['pharmacies']):
+            name = f"{rng.choice(PHARMACY_NAMES)} {index + 1}"
+            masks = []
+            for _ in range(rng.randint(1, 2 * average - 1)):
+                pack_size = rng.choice(PACK_SIZES)
+                mask_name = f"{rng.choice(MASK_BRANDS)} ({rng.choice(MASK_COLORS)}) ({pack_size} per pack)"
+                masks.append({'name': mask_name, 'price': round(pack_size * rng.uniform(0.5, 5.0), 2)})
+
+            catalog.append((name, [(mask['name'], mask['price']) for mask in masks]))
+            yield {
+                'name': name,
+                'cashBalance': round(rng.uniform(100, 1000), 2),
+                'openingHours': self.opening_hours(rng),
+                'masks': masks,
+            }
+
+    def opening_hours(self, rng):
+        """Mixes the 'Mon - Fri', 'Mon, Wed, Fri' and overnight formats of the source data."""
+        segments = []
+        for _ in range(rng.choice([1, 1, 2])):
+            if rng.random() < 0.5:
+                start = rng.randrange(len(RANGE_DAYS))
+                end = (start + rng.randint(1, 5)) % len(RANGE_DAYS)
+                days = f"{RANGE_DAYS[start]} - {RANGE_DAYS[end]}"
+            else:
+                days = ', '.join(sorted(rng.sample(LIST_DAYS, rng.randint(1, 3)), key=LIST_DAYS.index))
+            times = rng.choice(NIGHT_TIMES) if rng.random() < 0.2 else rng.choice(DAY_TIMES)
+            segments.append(f"{days} {times}")
+        return ' / '.join(segments)
+
+    def generate_users(self, rng, options, catalog):
+        users, transactions = options['users'], options['transactions']
+        per_user, remainder = divmod(transactions, users)
+        start = datetime(2021, 1, 1)
+        year_seconds = 365 * 24 * 60 * 60
+
+        for index in range(users):
+            dates = sorted(
+                start + timedelta(seconds=rng.randrange(year_seconds))
+                for _ in range(per_user + (1 if index < remainder else 0))
+            )
+            histories = []
+            for transaction_date in dates:
+                pharmacy_name, masks = rng.choice(catalog)
+                mask_name, price = rng.choice(masks)
+                histories.append({
+                    'pharmacyName': pharmacy_name,
+                    'maskName': mask_name,
+                    'transactionAmount': round(price * rng.choice([1, 1, 1, 2, 3]), 2),
+                    'transactionDate': transaction_date.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+
+            yield {
+                'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'cashBalance': round(rng.uniform(50, 1000), 2),
+                'purchaseHistories': histories,
+            }
@@ -1,147 +1,424 @@
 import os
-import json
-import re
-from datetime import datetime
-from django.core.management.base import BaseCommand
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import F
 from django.utils import timezone
-from core.models import Pharmacy, Mask, User, Transaction, PharmacyOpeningHour
+from core.bulkload import BulkWriter, NativeWriter, tables_locked
+from core.etl import chunked, fingerprint, iter_json_array, transform_records, transform_pharmacy, transform_user
+from core.models import DailySales, Pharmacy, Mask, User, Transaction, PharmacyOpeningHour, SourceFingerprint
+from core.open_hours import open_hours_index
+from core.search import mask_search_index, pharmacy_search_index
+from core.suggest import suggest_index
+from core.rollups import rebuild_daily_sales, record_sales_between
+
+
+class FingerprintStore:
+    """Looks up and records SourceFingerprint rows for the --sync mode."""
+
+    LOOKUP_SIZE = 1000
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.new = BulkWriter(SourceFingerprint, batch_size)
+        self.changed = []
+        self.stats = {kind: Counter() for kind, _ in SourceFingerprint.KIND_CHOICES}
+
+    def lookup(self, kind, keys):
+        """Return {key: SourceFingerprint} for the keys already recorded."""
+        found = {}
+        for batch in chunked(keys, self.LOOKUP_SIZE):
+            queryset = SourceFingerprint.objects.filter(kind=kind, key__in=batch).only('key', 'digest', 'object_id')
+            found.update((fp.key, fp) for fp in queryset)
+        return found
+
+    def add(self, kind, key, digest, object_id):
+        self.new.add(kind=kind, key=key, digest=digest, object_id=object_id)
+        self.stats[kind]['inserted'] += 1
+
+    def update(self, kind, fp, digest):
+        fp.digest = digest
+        self.changed.append(fp)
+        self.stats[kind]['updated'] += 1
+
+    def skip(self, kind):
+        self.stats[kind]['unchanged'] += 1
+
+    def flush(self):
+        self.new.flush()
+        SourceFingerprint.objects.bulk_update(self.changed, ['digest'], batch_size=self.batch_size)
+        self.changed = []
+
 
 class Command(BaseCommand):
     help = 'ETL json data'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            help='Directory containing pharmacies.json and users.json (default: the bundled data/ directory).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of rows written per bulk INSERT (default: 2000).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes used to parse and transform records (default: 1, in-process).',
+        )
+        parser.add_argument(
+            '--backend',
+            choices=['orm', 'native'],
+            default='orm',
+            help="How transactions are written: 'orm' batches bulk_create, 'native' stages a CSV "
+                 "file and uses LOAD DATA LOCAL INFILE (MySQL) or one executemany transaction.",
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Incremental re-sync: upsert changed records and insert only new '
+                 'transactions, using content fingerprints from earlier --sync runs.',
+        )
+
     def handle(self, *args, **options):
         # Define your data directory
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        data_dir = os.path.join(base_dir, 'data')
+        data_dir = options['data_dir'] or os.path.join(base_dir, 'data')
+
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if batch_size < 1 or workers < 1:
+            self.stderr.write(self.style.ERROR("--batch-size and --workers must be positive integers."))
+            return
 
-        # Load data files
-        pharmacy_data = self.load_json_file(os.path.join(data_dir, 'pharmacies.json'))
-        user_data = self.load_json_file(os.path.join(data_dir, 'users.json'))
+        sync = options['sync']
+        if sync and options['backend'] == 'native':
+            raise CommandError("--sync commits batch by batch and cannot be combined with --backend native.")
+
+        self.pharmacies = BulkWriter(Pharmacy, batch_size)
+        self.masks = BulkWriter(Mask, batch_size, parents=[self.pharmacies])
+        self.opening_hours = BulkWriter(PharmacyOpeningHour, batch_size, parents=[self.pharmacies])
+        self.users = BulkWriter(User, batch_size)
+        transaction_writer = NativeWriter if options['backend'] == 'native' else BulkWriter
+        self.transactions = transaction_writer(Transaction, batch_size, parents=[self.users, self.masks])
+        writers = [self.pharmacies, self.masks, self.opening_hours, self.users, self.transactions]
+        self.writers = writers
+        self.load_existing_maps()
+
+        if sync:
+            if Pharmacy.objects.exists() and not SourceFingerprint.objects.exists():
+                raise CommandError(
+                    "--sync needs fingerprints from an earlier --sync load; "
+                    "this database was loaded without them."
+                )
+            self.batch_size = batch_size
+            self.fingerprints = FingerprintStore(batch_size)
+            self.user_occurrences = Counter()
+            self.rolled_up = 0
+
+        # Stream data files through the transform stage; a single writer
+        # consumes the transformed rows in input order
+        pharmacy_data = transform_records(
+            iter_json_array(os.path.join(data_dir, 'pharmacies.json')),
+            transform_pharmacy, workers=workers, chunk_size=batch_size,
+        )
+        user_data = transform_records(
+            iter_json_array(os.path.join(data_dir, 'users.json')),
+            transform_user, workers=workers, chunk_size=batch_size,
+            tz=timezone.get_current_timezone(),
+        )
 
         # Process Pharmacies
         self.stdout.write("Processing pharmacies...")
-        self.process_pharmacies(pharmacy_data)
+        if sync:
+            self.sync_pharmacies(pharmacy_data)
+        else:
+            self.process_pharmacies(pharmacy_data)
 
         # Process Users
         self.stdout.write("Processing users...")
-        self.process_users(user_data)
+        if sync:
+            self.sync_users(user_data)
+        else:
+            self.process_users(user_data)
+
+        for writer in writers:
+            writer.finish()
+        self.reset_sequences([writer.model for writer in writers])
+        # bulk_create sends no signals
+        open_hours_index.invalidate()
+        mask_search_index.invalidate()
+        pharmacy_search_index.invalidate()
+        suggest_index.invalidate()
+        self.report(writers)
+
+        if sync:
+            self.stdout.write(f"  DailySales: {self.rolled_up} transactions added")
+            self.report_sync()
+        else:
+            self.stdout.write("Rebuilding daily sales rollup...")
+            self.stdout.write(f"  DailySales: {rebuild_daily_sales(batch_size)} rows")
 
         self.stdout.write(self.style.SUCCESS("ETL process complete."))
 
-    def load_json_file(self, filepath):
-        """Load JSON data from a file."""
-        with open(filepath, encoding='utf-8') as f:
-            return json.load(f)
+    def load_existing_maps(self):
+        """Seed the name->id maps with rows already in the database."""
+        self.pharmacy_ids = dict(Pharmacy.objects.values_list('name', 'id'))
+        self.mask_ids = {}
+        for mask_id, pharmacy_id, name in Mask.objects.order_by('id').values_list('id', 'pharmacy_id', 'name'):
+            self.mask_ids.setdefault((pharmacy_id, name), mask_id)
 
-    def process_pharmacies(self, data):
+    def reset_sequences(self, models):
+        """Move id sequences past the explicitly assigned keys (no-op on MySQL/SQLite)."""
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def report(self, writers):
+        for writer in writers:
+            self.stdout.write(
+                f"  {writer.model.__name__}: {writer.rows} rows in {writer.elapsed:.2f}s "
+                f"({writer.rows_per_second:.0f} rows/s)"
+            )
+
+    def report_sync(self):
+        for kind, label in SourceFingerprint.KIND_CHOICES:
+            stats = self.fingerprints.stats[kind]
+            self.stdout.write(
+                f"  {label}: {stats['inserted']} new, {stats['updated']} changed, "
+                f"{stats['unchanged']} unchanged"
+            )
+
+    def process_pharmacies(self, rows):
         """
         Creates Pharmacy objects along with related Masks
-        and parses/stores PharmacyOpeningHour entries.
+        and PharmacyOpeningHour entries from transformed rows.
         """
-        for pharmacy_data in data:
-            pharmacy = Pharmacy.objects.create(
-                name = pharmacy_data['name'],
-                cash_balance = pharmacy_data['cashBalance']
-            )
-            for mask_data in pharmacy_data['masks']:
-                Mask.objects.create(
-                    pharmacy = pharmacy,
-                    name = mask_data['name'],
-                    price = mask_data['price']
+        for name, cash_balance, masks, opening_hours in rows:
+            pharmacy_id = self.pharmacies.add(name=name, cash_balance=cash_balance)
+            self.pharmacy_ids[name] = pharmacy_id
+
+            for mask_name, price, brand, color, pack_size, unit_price in masks:
+                mask_id = self.masks.add(
+                    pharmacy_id=pharmacy_id, name=mask_name, price=price,
+                    brand=brand, color=color, pack_size=pack_size, unit_price=unit_price,
                 )
-        
-            self.process_opening_hours(pharmacy, pharmacy_data['openingHours'])
+                self.mask_ids.setdefault((pharmacy_id, mask_name), mask_id)
 
-    def process_opening_hours(self, pharmacy, opening_hours_str):
-        if not opening_hours_str:
-            return
+            for day_of_week, open_time, close_time, start_minute, end_minute in opening_hours:
+                self.opening_hours.add(
+                    pharmacy_id=pharmacy_id,
+                    day_of_week=day_of_week,
+                    open_time=open_time,
+                    close_time=close_time,
+                    start_minute=start_minute,
+                    end_minute=end_minute,
+                )
 
-        entries = self.parse_opening_hours(opening_hours_str)
-        for entry in entries:
-            PharmacyOpeningHour.objects.create(
-                pharmacy=pharmacy,
-                day_of_week=entry['day_of_week'],
-                open_time=entry['open_time'],
-                close_time=entry['close_time'],
-            )
+    def process_users(self, rows):
+        """
+        Creates User objects and the Transaction records linking them to
+        Pharmacies and Masks, resolved through the in-memory name->id maps.
+        """
+        for name, cash_balance, purchases in rows:
+            user_id = self.users.add(name=name, cash_balance=cash_balance)
+
+            for pharmacy_name, mask_name, amount, transaction_date in purchases:
+                # Find the Pharmacy by name
+                pharmacy_id = self.pharmacy_ids.get(pharmacy_name)
+                if not pharmacy_id:
+                    self.stdout.write(self.style.WARNING(f"Pharmacy '{pharmacy_name}' not found. Skipping transaction."))
+                    continue
 
-    def parse_opening_hours(self, opening_hours_str):
-        """Parse complex strings like 'Mon - Fri 08:00 - 17:00 / Sat, Sun 08:00 - 12:00'"""
-        segments = [seg.strip() for seg in opening_hours_str.split('/')]
-
-        results = []
-        for segment in segments:
-            match = re.match(r'(.+?)\s+(\d{2}:\d{2})\s*-\s*(\d{2}:\d{2})', segment)
-            if not match:
-                continue
-
-            days_str = match.group(1).strip()
-            open_time = datetime.strptime(match.group(2), '%H:%M').time()
-            close_time = datetime.strptime(match.group(3), '%H:%M').time()
-
-            days = self.expand_days(days_str)
-
-            for day in days:
-                results.append({
-                    'day_of_week': day,
-                    'open_time': open_time,
-                    'close_time': close_time,
-                })
-
-        return results
-
-    def expand_days(self, days_str):
-        DAY_ORDER = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        if '-' in days_str:
-            start_day, end_day = [d.strip() for d in days_str.split('-')]
-            start_index = DAY_ORDER.index(start_day)
-            end_index = DAY_ORDER.index(end_day)
-            if start_index <= end_index:
-                return DAY_ORDER[start_index:end_index + 1]
+                # Find the Mask by pharmacy and mask name
+                mask_id = self.mask_ids.get((pharmacy_id, mask_name))
+                if not mask_id:
+                    self.stdout.write(self.style.WARNING(f"Mask '{mask_name}' not found in pharmacy '{pharmacy_name}'. Skipping transaction."))
+                    continue
+
+                self.transactions.add(
+                    user_id=user_id,
+                    pharmacy_id=pharmacy_id,
+                    mask_id=mask_id,
+                    transaction_date=transaction_date or timezone.now(),
+                    transaction_amount=amount
+                )
+
+    def sync(self, rows, sync_chunk):
+        """
+        Apply ``sync_chunk`` to batches of rows. Each batch's data and
+        fingerprints are written in one transaction, so an interrupted sync
+        never records a fingerprint for a row that was not stored.
+
+        The sync runs against a live database: each batch holds its tables
+        locked and continues ids past the rows inserted since the last one
+        (purchases), so no pre-assigned id is taken meanwhile and the
+        transactions it rolls up are exactly the ones it wrote.
+        """
+        locked = [writer.model for writer in self.writers] + [SourceFingerprint, DailySales]
+        for chunk in chunked(rows, self.batch_size):
+            with tables_locked(locked):
+                for writer in self.writers + [self.fingerprints.new]:
+                    writer.restart()
+                first_transaction = self.transactions.next_id
+                sync_chunk(chunk)
+                for writer in self.writers:
+                    writer.flush()
+                self.fingerprints.flush()
+                # Loaded transactions are never changed or removed: only the
+                # ones this batch appended need rolling up
+                self.rolled_up += record_sales_between(first_transaction, self.transactions.next_id, self.batch_size)
+
+    def sync_pharmacies(self, rows):
+        self.sync(rows, self.sync_pharmacy_chunk)
+
+    def sync_users(self, rows):
+        self.sync(rows, self.sync_user_chunk)
+
+    def sync_pharmacy_chunk(self, chunk):
+        """Insert new pharmacies/masks and update the ones whose content changed."""
+        kind, mask_kind = SourceFingerprint.PHARMACY, SourceFingerprint.MASK
+
+        keyed = []
+        for name, cash_balance, masks, opening_hours in chunk:
+            occurrences = Counter()
+            keyed_masks = []
+            for mask_name, price, *attributes in masks:
+                key = fingerprint(name, mask_name, occurrences[mask_name])
+                occurrences[mask_name] += 1
+                keyed_masks.append((key, fingerprint(price), mask_name, price, attributes))
+
+            digest = fingerprint(cash_balance, *(value for entry in opening_hours for value in entry[:3]))
+            keyed.append((fingerprint(name), digest, name, cash_balance, keyed_masks, opening_hours))
+
+        known = self.fingerprints.lookup(kind, [entry[0] for entry in keyed])
+        known_masks = self.fingerprints.lookup(mask_kind, [m[0] for entry in keyed for m in entry[4]])
+
+        # Opening hours of changed pharmacies are replaced wholesale; clear
+        # them before any new rows for this chunk can be flushed.
+        changed = [
+            known[key] for key, digest, *_ in keyed
+            if key in known and known[key].digest != digest
+        ]
+        PharmacyOpeningHour.objects.filter(pharmacy_id__in=[fp.object_id for fp in changed]).delete()
+        updated_pharmacies = []
+        updated_masks = []
+
+        for key, digest, name, cash_balance, keyed_masks, opening_hours in keyed:
+            fp = known.get(key)
+            if fp is None:
+                pharmacy_id = self.pharmacies.add(name=name, cash_balance=cash_balance)
+                self.fingerprints.add(kind, key, digest, pharmacy_id)
             else:
-                return DAY_ORDER[start_index:] + DAY_ORDER[:end_index + 1]
-        else:
-            return [d.strip() for d in days_str.split(',')]
+                pharmacy_id = fp.object_id
+                if fp.digest == digest:
+                    self.fingerprints.skip(kind)
+                    opening_hours = []
+                else:
+                    updated_pharmacies.append(Pharmacy(id=pharmacy_id, cash_balance=cash_balance, version=F('version') + 1))
+                    self.fingerprints.update(kind, fp, digest)
+            self.pharmacy_ids[name] = pharmacy_id
 
+            for day_of_week, open_time, close_time, start_minute, end_minute in opening_hours:
+                self.opening_hours.add(
+                    pharmacy_id=pharmacy_id,
+                    day_of_week=day_of_week,
+                    open_time=open_time,
+                    close_time=close_time,
+                    start_minute=start_minute,
+                    end_minute=end_minute,
+                )
 
-    def process_users(self, data):
+            for mask_key, mask_digest, mask_name, price, (brand, color, pack_size, unit_price) in keyed_masks:
+                mask_fp = known_masks.get(mask_key)
+                if mask_fp is None:
+                    mask_id = self.masks.add(
+                        pharmacy_id=pharmacy_id, name=mask_name, price=price,
+                        brand=brand, color=color, pack_size=pack_size, unit_price=unit_price,
+                    )
+                    self.fingerprints.add(mask_kind, mask_key, mask_digest, mask_id)
+                else:
+                    mask_id = mask_fp.object_id
+                    if mask_fp.digest == mask_digest:
+                        self.fingerprints.skip(mask_kind)
+                    else:
+                        updated_masks.append(Mask(id=mask_id, price=price, unit_price=unit_price))
+                        self.fingerprints.update(mask_kind, mask_fp, mask_digest)
+                self.mask_ids.setdefault((pharmacy_id, mask_name), mask_id)
+
+        Pharmacy.objects.bulk_update(updated_pharmacies, ['cash_balance', 'version'], batch_size=self.batch_size)
+        Mask.objects.bulk_update(updated_masks, ['price', 'unit_price'], batch_size=self.batch_size)
+
+    def sync_user_chunk(self, chunk):
         """
-        TODO: 
-        - Create or update User objects
-        - Create Transaction records linking Users and Pharmacies
+        Insert new users, update changed balances and insert purchase
+        history entries that were not loaded before. Users have no natural
+        key, so a user is identified by name plus its occurrence among
+        same-named users in the file.
         """
-        for user_data in data:
-            user_obj = User.objects.create(
-                name = user_data['name'],
-                cash_balance = user_data['cashBalance']
-            )
+        kind, purchase_kind = SourceFingerprint.USER, SourceFingerprint.PURCHASE
 
-            for transaction_data in user_data.get('purchaseHistories', []):
-                # Find the Pharmacy by name
-                pharmacy_obj = Pharmacy.objects.filter(name=transaction_data['pharmacyName']).first()
-                if not pharmacy_obj:
-                    self.stdout.write(self.style.WARNING(f"Pharmacy '{transaction_data['pharmacyName']}' not found. Skipping transaction."))
+        keyed = []
+        for name, cash_balance, purchases in chunk:
+            key = fingerprint(name, self.user_occurrences[name])
+            self.user_occurrences[name] += 1
+
+            occurrences = Counter()
+            keyed_purchases = []
+            for purchase in purchases:
+                occurrence = occurrences[purchase]
+                occurrences[purchase] += 1
+                keyed_purchases.append((fingerprint(key, *purchase, occurrence), purchase))
+
+            keyed.append((key, fingerprint(cash_balance), name, cash_balance, keyed_purchases))
+
+        known = self.fingerprints.lookup(kind, [entry[0] for entry in keyed])
+        known_purchases = self.fingerprints.lookup(purchase_kind, [p[0] for entry in keyed for p in entry[4]])
+        updated_users = []
+
+        for key, digest, name, cash_balance, keyed_purchases in keyed:
+            fp = known.get(key)
+            if fp is None:
+                user_id = self.users.add(name=name, cash_balance=cash_balance)
+                self.fingerprints.add(kind, key, digest, user_id)
+            else:
+                user_id = fp.object_id
+                if fp.digest == digest:
+                    self.fingerprints.skip(kind)
+                else:
+                    updated_users.append(User(id=user_id, cash_balance=cash_balance, version=F('version') + 1))
+                    self.fingerprints.update(kind, fp, digest)
+
+            for purchase_key, (pharmacy_name, mask_name, amount, transaction_date) in keyed_purchases:
+                # Purchase entries are immutable: a known key means already loaded
+                if purchase_key in known_purchases:
+                    self.fingerprints.skip(purchase_kind)
                     continue
 
-                # Find the Mask by pharmacy and mask name
-                mask_obj = Mask.objects.filter(pharmacy=pharmacy_obj, name=transaction_data['maskName']).first()
-                if not mask_obj:
-                    self.stdout.write(self.style.WARNING(f"Mask '{transaction_data['maskName']}' not found in pharmacy '{pharmacy_obj.name}'. Skipping transaction."))
+                pharmacy_id = self.pharmacy_ids.get(pharmacy_name)
+                if not pharmacy_id:
+                    self.stdout.write(self.style.WARNING(f"Pharmacy '{pharmacy_name}' not found. Skipping transaction."))
                     continue
 
-                # Parse transaction date if available, else use now
-                transaction_date = transaction_data.get('transactionDate')
-                if transaction_date:
-                    dt_naive = datetime.strptime(transaction_date, '%Y-%m-%d %H:%M:%S')
-                    transaction_date = timezone.make_aware(dt_naive)
-                else:
-                    transaction_date = timezone.now()
-
-                # Create Transaction object
-                Transaction.objects.create(
-                    user=user_obj,
-                    pharmacy=pharmacy_obj,
-                    mask=mask_obj,
-                    transaction_date=transaction_date,
-                    transaction_amount=transaction_data['transactionAmount']
-                )
\ No newline at end of file
+                mask_id = self.mask_ids.get((pharmacy_id, mask_name))
+                if not mask_id:
+                    self.stdout.write(self.style.WARNING(f"Mask '{mask_name}' not found in pharmacy '{pharmacy_name}'. Skipping transaction."))
+                    continue
+
+                transaction_id = self.transactions.add(
+                    user_id=user_id,
+                    pharmacy_id=pharmacy_id,
+                    mask_id=mask_id,
+                    transaction_date=transaction_date or timezone.now(),
+                    transaction_amount=amount
+                )
+                self.fingerprints.add(purchase_kind, purchase_key, purchase_key, transaction_id)
+
+        User.objects.bulk_update(updated_users, ['cash_balance', 'version'], batch_size=self.batch_size)
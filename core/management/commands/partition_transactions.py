@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+from core import partitions
+from core.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the transactions table and drop or archive expired ones (MySQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enable', action='store_true',
+            help='Partition the table by month if it is not partitioned yet (rewrites the table).',
+        )
+        parser.add_argument(
+            '--disable', action='store_true',
+            help='Turn the table back into a single one with its original primary key and foreign keys '
+                 '(rewrites the table). Required before applying core migrations.',
+        )
+        parser.add_argument(
+            '--ahead', type=int, default=None,
+            help='Months after the current one to create in advance '
+                 '(default: settings.TRANSACTION_PARTITION_MONTHS_AHEAD).',
+        )
+        parser.add_argument(
+            '--retain', type=int, default=None,
+            help='Months to keep, the current one included; older partitions expire '
+                 '(default: settings.TRANSACTION_RETENTION_MONTHS, keep everything if unset).',
+        )
+        parser.add_argument(
+            '--archive', action='store_true',
+            help='Move expired partitions into <table>_pYYYYMM tables instead of dropping their rows.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Print the statements without running them.')
+
+    def handle(self, *args, **options):
+        ahead = options['ahead']
+        if ahead is None:
+            ahead = getattr(settings, 'TRANSACTION_PARTITION_MONTHS_AHEAD', 3)
+        retain = options['retain']
+        if retain is None:
+            retain = getattr(settings, 'TRANSACTION_RETENTION_MONTHS', None)
+        if ahead < 0 or (retain is not None and retain < 1):
+            raise CommandError("--ahead must be non-negative and --retain positive.")
+        if options['enable'] and options['disable']:
+            raise CommandError("--enable and --disable cannot be combined.")
+
+        if not partitions.is_supported():
+            self.stdout.write(f"Partitioning is only used on MySQL; {connection.vendor} keeps a single table.")
+            return
+
+        table = Transaction._meta.db_table
+        today = timezone.now().date()
+        existing = partitions.existing_partitions(table)
+        if options['disable']:
+            self.disable(table, existing, options['dry_run'])
+            return
+
+        statements = []
+        if not existing:
+            if not options['enable']:
+                raise CommandError(f"{table} is not partitioned. Run with --enable to partition it by month.")
+            unapplied = partitions.unapplied_migrations()
+            if unapplied:
+                raise CommandError(
+                    f"Apply the pending core migrations ({', '.join(unapplied)}) before partitioning {table}."
+                )
+            first = Transaction.objects.aggregate(first=Min('transaction_date'))['first']
+            months = partitions.months_between(
+                first.date() if first else today, partitions.add_months(partitions.month_start(today), ahead)
+            )
+            statements += partitions.enable_sql(table, partitions.foreign_keys(table), months)
+            existing = [partitions.partition_name(month) for month in months]
+        else:
+            months = []
+
+        create, expire = partitions.plan(existing, today, ahead, retain)
+        statements += partitions.create_sql(table, create)
+        statements += partitions.expire_sql(table, expire, archive=options['archive'])
+
+        if options['dry_run']:
+            for statement in statements:
+                self.stdout.write(statement + ';')
+            return
+
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        partitions.forget_rollup(expire)
+
+        created = len(months) + len(create)
+        action = 'archived' if options['archive'] else 'dropped'
+        self.stdout.write(self.style.SUCCESS(
+            f"{table}: {created} partition(s) created, {len(expire)} {action}."
+        ))
+
+    def disable(self, table, existing, dry_run):
+        if not existing:
+            self.stdout.write(f"{table} is not partitioned.")
+            return
+        statements = partitions.disable_sql(table, partitions.foreign_key_sql(Transaction))
+        if dry_run:
+            for statement in statements:
+                self.stdout.write(statement + ';')
+            return
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS(f"{table}: partitioning removed, foreign keys restored."))
@@ -0,0 +1,50 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+from core.purchases import process_orders
+
+
+class Command(BaseCommand):
+    help = 'Apply purchases queued with Prefer: respond-async, oldest first, and record their outcome'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Orders applied per database transaction (default: settings.PURCHASE_BATCH_GROUP_SIZE).',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds to wait when the queue is empty (default: settings.PURCHASE_WORKER_POLL_INTERVAL).',
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or getattr(settings, 'PURCHASE_BATCH_GROUP_SIZE', 500)
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'PURCHASE_WORKER_POLL_INTERVAL', 1.0)
+        if batch_size < 1 or interval < 0:
+            raise CommandError("--batch-size must be positive and --interval non-negative.")
+
+        # Every batch commits its orders with their outcome, so stopping the
+        # worker at any point leaves unfinished orders pending for the next run.
+        total = 0
+        while True:
+            close_old_connections()
+            try:
+                settled = process_orders(batch_size)
+            except DatabaseError as exc:
+                if options['once']:
+                    raise CommandError(f"Could not apply queued orders: {exc}")
+                self.stderr.write(f"Could not apply queued orders, retrying: {exc}")
+                time.sleep(interval)
+                continue
+            total += settled
+            if settled:
+                self.stdout.write(f"Settled {settled} orders.")
+            elif options['once']:
+                break
+            else:
+                time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS(f"Queue empty. Settled {total} orders."))
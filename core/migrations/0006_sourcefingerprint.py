@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_pharmacyopeninghour_day_of_week'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('pharmacy', 'Pharmacy'), ('mask', 'Mask'), ('user', 'User'), ('purchase', 'Purchase history entry')], max_length=16)),
+                ('key', models.CharField(max_length=32)),
+                ('digest', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_source_fingerprint')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+# Copied from core.schedule as of this migration, so later changes to that
+# module do not change what this migration does.
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MINUTES_PER_DAY = 24 * 60
+
+
+def day_of_week_index(value):
+    value = (value or '').strip().lower()
+    if len(value) < 3:
+        return None
+    for index, name in enumerate(DAY_NAMES):
+        if name.lower().startswith(value):
+            return index
+    return None
+
+
+def opening_span(day_index, open_time, close_time):
+    start = day_index * MINUTES_PER_DAY + open_time.hour * 60 + open_time.minute
+    end = day_index * MINUTES_PER_DAY + close_time.hour * 60 + close_time.minute
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def populate_minutes(apps, schema_editor):
+    PharmacyOpeningHour = apps.get_model('core', 'PharmacyOpeningHour')
+    changed = []
+    for hour in PharmacyOpeningHour.objects.all().iterator():
+        day_index = day_of_week_index(hour.day_of_week)
+        if day_index is None:
+            continue
+        hour.start_minute, hour.end_minute = opening_span(day_index, hour.open_time, hour.close_time)
+        changed.append(hour)
+    PharmacyOpeningHour.objects.bulk_update(changed, ['start_minute', 'end_minute'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_sourcefingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pharmacyopeninghour',
+            name='end_minute',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='pharmacyopeninghour',
+            name='start_minute',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(populate_minutes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pharmacyopeninghour',
+            index=models.Index(fields=['start_minute', 'end_minute'], name='opening_hour_minutes_idx'),
+        ),
+    ]
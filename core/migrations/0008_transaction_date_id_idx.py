@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_opening_hour_minutes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_date', 'id'], name='transaction_date_id_idx'),
+        ),
+    ]
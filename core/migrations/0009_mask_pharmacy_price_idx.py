@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_transaction_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['pharmacy', 'price'], name='mask_pharmacy_price_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_mask_pharmacy_price_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['pharmacy', 'name'], name='mask_pharmacy_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_date'], name='transaction_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['pharmacy', 'transaction_date'], name='transaction_pharmacy_date_idx'),
+        ),
+    ]
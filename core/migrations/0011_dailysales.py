@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_sales(apps, schema_editor):
+    Transaction = apps.get_model('core', 'Transaction')
+    DailySales = apps.get_model('core', 'DailySales')
+    rows = (
+        Transaction.objects
+        .annotate(date=TruncDate('transaction_date'))
+        .values('date', 'user_id', 'pharmacy_id')
+        .annotate(count=Count('id'), amount=Sum('transaction_amount'))
+        .order_by()
+    )
+    DailySales.objects.bulk_create(
+        (
+            DailySales(
+                date=row['date'], user_id=row['user_id'], pharmacy_id=row['pharmacy_id'],
+                transaction_count=row['count'], transaction_amount=row['amount'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=2000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_mask_transaction_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('transaction_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.pharmacy')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'user', 'pharmacy'), name='unique_daily_sales')],
+            },
+        ),
+        migrations.RunPython(populate_daily_sales, migrations.RunPython.noop),
+    ]
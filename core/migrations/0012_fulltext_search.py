@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# The statements are copied from core.fulltext as of this migration, so
+# later changes to that module do not change what this migration does.
+TABLES = ('core_mask', 'core_pharmacy')
+
+
+def sqlite_triggers(table):
+    fts = f"{table}_fts"
+    insert = f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name);"
+    delete = f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name);"
+    return {
+        f"{fts}_insert": f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"{fts}_delete": f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"{fts}_update": f"CREATE TRIGGER {fts}_update AFTER UPDATE OF name ON {table} BEGIN {delete} {insert} END",
+    }
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            if connection.vendor == 'mysql':
+                cursor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {table}_name_fulltext (name)")
+            elif connection.vendor == 'sqlite':
+                fts = f"{table}_fts"
+                cursor.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5(name, content='{table}', content_rowid='id')")
+                for statement in sqlite_triggers(table).values():
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            if connection.vendor == 'mysql':
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {table}_name_fulltext")
+            elif connection.vendor == 'sqlite':
+                for name in sqlite_triggers(table):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_dailysales'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:10
+
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+# Copied from core.catalog as of this migration, so later changes to that
+# module do not change what this migration does.
+MASK_NAME_RE = re.compile(
+    r'^\s*(?P<brand>.*?)\s*\((?P<color>[^()]*)\)\s*\((?P<pack_size>\d+)\s*per\s*pack\)\s*$',
+    re.IGNORECASE,
+)
+
+
+def mask_attributes(name, price):
+    match = MASK_NAME_RE.match(name or '')
+    if match is None or not int(match.group('pack_size')):
+        brand, color, pack_size = (name or '').strip(), '', None
+    else:
+        brand, color, pack_size = match.group('brand'), match.group('color').strip().lower(), int(match.group('pack_size'))
+    unit_price = (Decimal(str(price)) / (pack_size or 1)).quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+    return brand, color, pack_size, unit_price
+
+
+def populate_attributes(apps, schema_editor):
+    Mask = apps.get_model('core', 'Mask')
+    changed = []
+    for mask in Mask.objects.all().iterator(chunk_size=5000):
+        mask.brand, mask.color, mask.pack_size, mask.unit_price = mask_attributes(mask.name, mask.price)
+        changed.append(mask)
+        if len(changed) == 5000:
+            Mask.objects.bulk_update(changed, ['brand', 'color', 'pack_size', 'unit_price'], batch_size=1000)
+            changed = []
+    Mask.objects.bulk_update(changed, ['brand', 'color', 'pack_size', 'unit_price'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mask',
+            name='brand',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='mask',
+            name='color',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='mask',
+            name='pack_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mask',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), editable=False, max_digits=14),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_attributes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['pharmacy', 'unit_price'], name='mask_pharmacy_unit_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['brand', 'color', 'pack_size'], name='mask_brand_color_pack_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['color', 'pack_size'], name='mask_color_pack_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['pack_size'], name='mask_pack_size_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mask',
+            index=models.Index(fields=['unit_price', 'id'], name='mask_unit_price_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_mask_catalog_attributes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('items', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='pending', max_length=16)),
+                ('error', models.CharField(blank=True, default='', max_length=255)),
+                ('total', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('transaction_ids', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_orders', to='core.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='purchase_order_status_idx')],
+            },
+        ),
+    ]
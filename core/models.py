@@ -1,20 +1,43 @@
 from django.db import models
+from django.db.models import Count, FilteredRelation, Q
 from django.utils import timezone
+from .catalog import mask_attributes
+from .schedule import day_of_week_index, opening_span
 
 class User(models.Model):
     name = models.CharField(max_length=255)
     cash_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    # Incremented by every cash_balance change (see core.purchases)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
 
 
+class PharmacyQuerySet(models.QuerySet):
+    def with_mask_count(self, min_price=0, max_price=None):
+        """
+        Annotate mask_count, the number of masks priced within
+        [min_price, max_price]. Masks are LEFT JOINed with the price range in
+        the join condition, so pharmacies without such masks count 0.
+        """
+        condition = Q(masks__price__gte=min_price)
+        if max_price is not None:
+            condition &= Q(masks__price__lte=max_price)
+        return self.annotate(
+            priced_masks=FilteredRelation('masks', condition=condition),
+        ).annotate(mask_count=Count('priced_masks'))
+
+
 class Pharmacy(models.Model):
     name = models.CharField(max_length=255, unique=True)
     cash_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PharmacyQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -23,6 +46,33 @@ class Mask(models.Model):
     pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='masks')
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Parsed from the name on save (see core.catalog). Names not in the
+    # "Brand (color) (N per pack)" form keep the whole name as brand, an
+    # empty color and a NULL pack size, and are priced as single masks.
+    brand = models.CharField(max_length=255, default='', blank=True)
+    color = models.CharField(max_length=50, default='', blank=True)
+    pack_size = models.PositiveIntegerField(null=True, blank=True)
+    unit_price = models.DecimalField(max_digits=14, decimal_places=4, editable=False)
+
+    class Meta:
+        indexes = [
+            # Covers the price-range join of Pharmacy.objects.with_mask_count()
+            # and pharmacies/<id>/masks/?sort=price
+            models.Index(fields=['pharmacy', 'price'], name='mask_pharmacy_price_idx'),
+            models.Index(fields=['pharmacy', 'name'], name='mask_pharmacy_name_idx'),
+            models.Index(fields=['pharmacy', 'unit_price'], name='mask_pharmacy_unit_price_idx'),
+            # Facet filters and counts on masks/ (each facet is counted with
+            # the other facets' filters applied)
+            models.Index(fields=['brand', 'color', 'pack_size'], name='mask_brand_color_pack_idx'),
+            models.Index(fields=['color', 'pack_size'], name='mask_color_pack_idx'),
+            models.Index(fields=['pack_size'], name='mask_pack_size_idx'),
+            # masks/?sort_by=unit_price keyset pages
+            models.Index(fields=['unit_price', 'id'], name='mask_unit_price_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.brand, self.color, self.pack_size, self.unit_price = mask_attributes(self.name, self.price)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -35,15 +85,132 @@ class Transaction(models.Model):
     transaction_date = models.DateTimeField(default=timezone.now)
     transaction_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order of /api/transactions/; also serves the
+            # transaction_date range filters as its leftmost column.
+            models.Index(fields=['transaction_date', 'id'], name='transaction_date_id_idx'),
+            models.Index(fields=['user', 'transaction_date'], name='transaction_user_date_idx'),
+            models.Index(fields=['pharmacy', 'transaction_date'], name='transaction_pharmacy_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name} - {self.transaction_amount}"
 
 
+class DailySales(models.Model):
+    """
+    Transaction totals per (day, user, pharmacy), so date-range reports can
+    sum whole days instead of scanning every transaction. Days are dates in
+    the current time zone. Maintained by PurchaseView and load_initial_data;
+    see core.rollups.
+    """
+    date = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_sales')
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='daily_sales')
+    transaction_count = models.PositiveIntegerField(default=0)
+    transaction_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'user', 'pharmacy'], name='unique_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.user_id}/{self.pharmacy_id}: {self.transaction_amount}"
+
+
 class PharmacyOpeningHour(models.Model):
     pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='opening_hours')
     day_of_week = models.CharField(max_length=4)  # Mon, Tue, etc.
     open_time = models.TimeField()
     close_time = models.TimeField()
+    # Minutes from Monday 00:00, both inclusive; end_minute runs past the day
+    # (or the week) for windows that close after midnight. NULL if the day is
+    # not recognised.
+    start_minute = models.PositiveIntegerField(null=True)
+    end_minute = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_minute', 'end_minute'], name='opening_hour_minutes_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.start_minute, self.end_minute = self.minute_span(self.day_of_week, self.open_time, self.close_time)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def minute_span(day_of_week, open_time, close_time):
+        day_index = day_of_week_index(day_of_week)
+        if day_index is None:
+            return None, None
+        return opening_span(day_index, open_time, close_time)
 
     def __str__(self):
         return f"{self.pharmacy.name} - {self.day_of_week}"
+
+
+class PurchaseOrder(models.Model):
+    """
+    A purchase accepted with `Prefer: respond-async` and applied later by
+    the process_purchase_orders worker (see core.purchases). The order's
+    balances, transactions and outcome are committed together, so an
+    order is applied exactly once however often the worker restarts.
+    """
+    PENDING = 'pending'
+    ACCEPTED = 'accepted'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (ACCEPTED, 'Accepted'),
+        (REJECTED, 'Rejected'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purchase_orders')
+    items = models.JSONField()  # [[pharmacy_id, mask_id, quantity], ...]
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    error = models.CharField(max_length=255, blank=True, default='')
+    total = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    transaction_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker claims the oldest pending orders
+            models.Index(fields=['status', 'id'], name='purchase_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.status})"
+
+
+class SourceFingerprint(models.Model):
+    """
+    Content hash of a record from the source JSON files, written by
+    `load_initial_data --sync` to detect new and changed records.
+    """
+    PHARMACY = 'pharmacy'
+    MASK = 'mask'
+    USER = 'user'
+    PURCHASE = 'purchase'
+    KIND_CHOICES = [
+        (PHARMACY, 'Pharmacy'),
+        (MASK, 'Mask'),
+        (USER, 'User'),
+        (PURCHASE, 'Purchase history entry'),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    key = models.CharField(max_length=32)  # hash of the record's identity
+    digest = models.CharField(max_length=32)  # hash of the record's content
+    object_id = models.BigIntegerField()  # id of the row loaded from the record
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_source_fingerprint'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key}"
@@ -0,0 +1,91 @@
+"""
+In-process index answering "which pharmacies are open at this minute of the
+week" without querying PharmacyOpeningHour.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from django.conf import settings
+from .models import PharmacyOpeningHour
+from .schedule import MINUTES_PER_WEEK
+
+
+class OpenHoursIndex:
+    """
+    The week is cut into segments at every minute where some pharmacy opens
+    or closes. Each segment stores the sorted ids of the pharmacies open
+    throughout it, so a lookup is one bisect over the segment boundaries.
+    Overnight windows (e.g. Fri 20:00 - 02:00, or Sunday nights wrapping to
+    Monday) are split at the end of the week.
+
+    The index is rebuilt lazily: on the first lookup, after invalidate()
+    (called by the PharmacyOpeningHour signals), and once it is older than
+    settings.OPEN_HOURS_INDEX_MAX_AGE seconds so changes made by other
+    processes (e.g. load_initial_data) are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+    def open_at(self, minute):
+        """Sorted tuple of the ids of pharmacies open at ``minute`` of the week."""
+        boundaries, segments = self._current()
+        return segments[bisect_right(boundaries, minute % MINUTES_PER_WEEK) - 1]
+
+    def _current(self):
+        snapshot = self._snapshot
+        max_age = getattr(settings, 'OPEN_HOURS_INDEX_MAX_AGE', 300)
+        if snapshot is None or time.monotonic() - self._built_at > max_age:
+            with self._lock:
+                if self._snapshot is not snapshot and self._snapshot is not None:
+                    return self._snapshot  # another thread rebuilt it meanwhile
+                generation = self._generation
+                self._built_at = time.monotonic()
+                snapshot = self.build()
+                # An invalidation during the build may not be reflected in it;
+                # serve it for this lookup only.
+                self._snapshot = snapshot if generation == self._generation else None
+        return snapshot
+
+    def build(self):
+        # minute -> {pharmacy_id: change in number of open windows}
+        events = defaultdict(lambda: defaultdict(int))
+        rows = PharmacyOpeningHour.objects.filter(start_minute__isnull=False).values_list(
+            'pharmacy_id', 'start_minute', 'end_minute'
+        )
+        for pharmacy_id, start, end in rows.iterator():
+            stop = end + 1  # half-open
+            if stop > MINUTES_PER_WEEK:
+                self._add_window(events, pharmacy_id, 0, stop - MINUTES_PER_WEEK)
+                stop = MINUTES_PER_WEEK
+            self._add_window(events, pharmacy_id, start, stop)
+
+        events.setdefault(0, defaultdict(int))
+        boundaries, segments = [], []
+        open_windows = defaultdict(int)
+        for minute in sorted(events):
+            if minute >= MINUTES_PER_WEEK:
+                break
+            for pharmacy_id, delta in events[minute].items():
+                open_windows[pharmacy_id] += delta
+                if not open_windows[pharmacy_id]:
+                    del open_windows[pharmacy_id]
+            boundaries.append(minute)
+            segments.append(tuple(sorted(open_windows)))
+        return boundaries, segments
+
+    @staticmethod
+    def _add_window(events, pharmacy_id, start, stop):
+        events[start][pharmacy_id] += 1
+        events[stop][pharmacy_id] -= 1
+
+
+open_hours_index = OpenHoursIndex()
@@ -0,0 +1,174 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Each page is fetched with a WHERE on the ordering key of the last row seen
+rather than an OFFSET, so it costs one index range scan however deep the
+client has paged.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_key_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pages through a queryset ordered by ``ordering``, a tuple of fields that
+    together are unique and covered by an index (ending in 'id' makes it
+    unique). The cursor is an opaque token encoding the key of the row the
+    page starts after and the paging direction.
+
+    The default page size and the largest page a client may ask for with
+    ?page_size= come from settings.API_PAGE_SIZE and API_MAX_PAGE_SIZE.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        key, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [f'-{field}' if reverse else field for field in self.ordering]
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self.after(key, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # A page reached by a cursor always has rows on the side it came from.
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else key is not None
+        self.next_key = self.key_of(rows[-1]) if rows and has_next else None
+        self.previous_key = self.key_of(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_page_size(self, request):
+        max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return min(getattr(settings, 'API_PAGE_SIZE', 100), max_page_size)
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            raise ValidationError("page_size must be a positive integer.")
+        return min(page_size, max_page_size)
+
+    def after(self, key, reverse):
+        """Rows strictly after ``key`` in the (possibly reversed) ordering."""
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+        for index in range(len(self.ordering) - 1, -1, -1):
+            ties = {field: value for field, value in zip(self.ordering[:index], key)}
+            condition = Q(**ties, **{f'{self.ordering[index]}__{lookup}': key[index]}) | condition
+        return condition
+
+    def key_of(self, row):
+        if isinstance(row, dict):  # values() rows
+            return [row[field] for field in self.ordering]
+        return [getattr(row, field) for field in self.ordering]
+
+    def encode_cursor(self, key, reverse):
+        payload = json.dumps({'k': key, 'r': int(reverse)}, default=_encode_key_value, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            key, reverse = payload['k'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # A tampered key must not reach the query with values of the wrong type
+        try:
+            key = [model._meta.get_field(field).to_python(value) for field, value in zip(self.ordering, key)]
+        except (DjangoValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in key):
+            raise NotFound(self.invalid_cursor_message)
+        return key, reverse
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return self.encode_cursor(self.next_key, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_key is None:
+            return None
+        return self.encode_cursor(self.previous_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor taken from the next or previous link of a page.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results per page, capped at the server maximum.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('transaction_date', 'id')
+
+
+class MaskUnitPricePagination(KeysetPagination):
+    """masks/?sort_by=unit_price: cheapest per mask first."""
+    ordering = ('unit_price', 'id')
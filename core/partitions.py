@@ -0,0 +1,202 @@
+"""
+Monthly RANGE partitioning of the transactions table on transaction_date.
+
+Only MySQL is partitioned; other databases keep a single table and the
+commands here do nothing. Partitions are named pYYYYMM and hold one
+calendar month of transaction_date as stored (UTC). A last ``pfuture``
+partition (VALUES LESS THAN MAXVALUE) takes rows past the newest month, so
+inserts never fail when maintenance is late. Queries comparing
+transaction_date with plain ranges, as the date-range endpoints do, only
+read the partitions their range overlaps.
+
+MySQL requires every unique key of a partitioned table to contain the
+partitioning column and does not allow foreign keys on it, so enabling
+partitioning makes the primary key (id, transaction_date) and drops the
+table's foreign key constraints. Django still treats ``id`` as the primary
+key and performs ON DELETE CASCADE itself.
+
+The migration state knows nothing of this, so a later migration altering
+the table would fail or put the constraints back. Enabling requires every
+core migration to be applied, and migrate refuses to apply core migrations
+to a partitioned table (refuse_partitioned_migrate): disable partitioning
+first, which restores the primary key and constraints migrate created.
+"""
+import re
+from datetime import date
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from .models import DailySales, Transaction
+
+FUTURE = 'pfuture'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name):
+    """First day of the month held by partition ``name``, None for pfuture or unknown names."""
+    match = re.fullmatch(r'p(\d{4})(\d{2})', name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def months_between(first, last):
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def plan(existing, today, ahead, retain=None):
+    """
+    Returns (create, expire) for a partitioned table whose partitions are
+    named ``existing``: the months to add so that every month up to
+    ``ahead`` months after today's has a partition, and the months whose
+    partitions fall outside the last ``retain`` months (today's included).
+    ``retain=None`` keeps everything.
+    """
+    current = month_start(today)
+    months = sorted(filter(None, map(partition_month, existing)))
+    after = add_months(months[-1], 1) if months else current
+    create = months_between(after, add_months(current, ahead))
+
+    expire = []
+    if retain is not None:
+        cutoff = add_months(current, 1 - retain)
+        expire = [month for month in months if month < cutoff]
+    return create, expire
+
+
+def partition_definitions(months):
+    definitions = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d} 00:00:00')"
+        for month in months
+    ]
+    definitions.append(f"PARTITION {FUTURE} VALUES LESS THAN (MAXVALUE)")
+    return ', '.join(definitions)
+
+
+def enable_sql(table, foreign_keys, months):
+    """Statements converting the unpartitioned ``table`` to monthly partitions ``months``."""
+    statements = [f"ALTER TABLE {table} DROP FOREIGN KEY {name}" for name in foreign_keys]
+    statements.append(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, transaction_date)")
+    statements.append(
+        f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS(transaction_date) ({partition_definitions(months)})"
+    )
+    return statements
+
+
+def disable_sql(table, foreign_key_statements):
+    """Statements turning the partitioned ``table`` back into the table migrate created."""
+    return [
+        f"ALTER TABLE {table} REMOVE PARTITIONING",
+        f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id)",
+        *foreign_key_statements,
+    ]
+
+
+def create_sql(table, months):
+    """Split the new ``months`` out of pfuture (rows already there move with them)."""
+    if not months:
+        return []
+    return [f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE} INTO ({partition_definitions(months)})"]
+
+
+def archive_table(table, month):
+    return f"{table}_{partition_name(month)}"
+
+
+def expire_sql(table, months, archive=False):
+    """
+    Drop the partitions of ``months``. With ``archive`` their rows are
+    first swapped into a plain table named after the partition.
+    """
+    if not months:
+        return []
+    statements = []
+    if archive:
+        for month in months:
+            target = archive_table(table, month)
+            statements += [
+                f"CREATE TABLE {target} LIKE {table}",
+                f"ALTER TABLE {target} REMOVE PARTITIONING",
+                f"ALTER TABLE {table} EXCHANGE PARTITION {partition_name(month)} WITH TABLE {target}",
+            ]
+    statements.append(f"ALTER TABLE {table} DROP PARTITION {', '.join(map(partition_name, months))}")
+    return statements
+
+
+def is_supported():
+    return connection.vendor == 'mysql'
+
+
+def existing_partitions(table=Transaction._meta.db_table, using=DEFAULT_DB_ALIAS):
+    """Partition names of ``table`` in order; empty when it is not partitioned."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def foreign_keys(table=Transaction._meta.db_table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def foreign_key_sql(model=Transaction):
+    """ADD CONSTRAINT statements for the model's foreign keys, named as migrate names them."""
+    # Only used to render the SQL, as in core.bulkload
+    editor = connection.schema_editor()
+    return [
+        str(editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+        for field in model._meta.local_concrete_fields
+        if field.remote_field and field.db_constraint
+    ]
+
+
+def unapplied_migrations(app_label='core'):
+    """Names of the app's migrations not applied to the database yet."""
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [migration.name for migration, backwards in plan if migration.app_label == app_label]
+
+
+def refuse_partitioned_migrate(sender, using=DEFAULT_DB_ALIAS, plan=None, **kwargs):
+    """pre_migrate: stop core migrations from running against the partitioned transactions table."""
+    if connections[using].vendor != 'mysql':
+        return
+    if not any(migration.app_label == 'core' for migration, _ in plan or []):
+        return
+    table = Transaction._meta.db_table
+    if existing_partitions(table, using):
+        raise CommandError(
+            f"{table} is partitioned, which the core migrations do not know about. Run "
+            "`manage.py partition_transactions --disable` first and --enable again after migrating."
+        )
+
+
+def forget_rollup(months):
+    """Remove the DailySales rows of expired months, so the rollup keeps matching Transaction."""
+    for month in months:
+        DailySales.objects.filter(date__gte=month, date__lt=add_months(month, 1)).delete()
@@ -0,0 +1,423 @@
+"""
+Purchases: one order debits a user and credits each pharmacy it buys from,
+recording a Transaction per line item, all in one database transaction.
+
+The queries an order makes do not grow with the number of line items: the
+user row is locked, every mask is read with its pharmacy in one query, the
+balances move with one UPDATE for the user and one for all pharmacies, and
+the transactions are inserted with one bulk_create. Rows are locked in a
+fixed order (users, then pharmacies, each by ascending id) so concurrent
+orders touching the same pharmacies queue up instead of deadlocking.
+
+With settings.PURCHASE_CONCURRENCY = 'optimistic', place_order() locks
+nothing while it reads: the user's balance is debited by a conditional
+UPDATE matching the version it read (every balance change increments
+``version``) and a balance still covering the order. When another order
+got there first the attempt changes nothing and is retried after a short
+random backoff. Pharmacy credits only add to the balance, so they are
+applied as increments at the end of the transaction, holding the
+pharmacy's row lock only until the commit.
+
+place_orders() applies many orders the same way, a group of them per
+database transaction (group commit), and settles each order on its own:
+a rejected order leaves the rest of its group untouched. Queued orders
+(enqueue_order) are applied in such groups by process_orders(), run by the
+process_purchase_orders worker.
+"""
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from .models import Mask, Pharmacy, PurchaseOrder, Transaction, User
+from .rollups import record_sales, record_sales_bulk
+from .utils import add_by_id
+
+PESSIMISTIC = 'pessimistic'
+OPTIMISTIC = 'optimistic'
+
+# The largest amount the cash_balance and transaction_amount columns hold
+# (max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class PurchaseConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The balances changed too often while placing the order. Please retry."
+    default_code = 'conflict'
+
+
+def whole_number(value):
+    """int(value), refusing booleans and fractions int() would truncate."""
+    if isinstance(value, bool):
+        raise TypeError("booleans are not numbers here")
+    number = int(value)
+    if not isinstance(value, str) and number != value:
+        raise ValueError(f"{value!r} is not a whole number")
+    return number
+
+
+def parse_user_id(value):
+    try:
+        return whole_number(value)
+    except (TypeError, ValueError):
+        raise ValidationError("'user_id' must be an integer.")
+
+
+def parse_items(purchases):
+    """[(pharmacy_id, mask_id, quantity)] of the request's line items."""
+    if not isinstance(purchases, list):
+        raise ValidationError("'purchases' must be a list.")
+    max_quantity = getattr(settings, 'PURCHASE_MAX_QUANTITY', 1000)
+    items = []
+    for item in purchases:
+        if not isinstance(item, dict):
+            raise ValidationError("Each purchase must include 'pharmacy_id', 'mask_id', and 'quantity'.")
+        pharmacy_id, mask_id, quantity = item.get('pharmacy_id'), item.get('mask_id'), item.get('quantity')
+        if not all([pharmacy_id, mask_id, quantity]):
+            raise ValidationError("Each purchase must include 'pharmacy_id', 'mask_id', and 'quantity'.")
+        try:
+            pharmacy_id, mask_id, quantity = whole_number(pharmacy_id), whole_number(mask_id), whole_number(quantity)
+        except (TypeError, ValueError):
+            raise ValidationError("'pharmacy_id', 'mask_id' and 'quantity' must be integers.")
+        if quantity < 1:
+            raise ValidationError("'quantity' must be a positive integer.")
+        if quantity > max_quantity:
+            raise ValidationError(f"'quantity' must be at most {max_quantity}.")
+        items.append((pharmacy_id, mask_id, quantity))
+    return items
+
+
+def price_items(masks, items):
+    """
+    (lines, credits) of an order: [(mask, amount)] per line item and
+    {pharmacy_id: amount}. ``masks`` maps ids to masks with their pharmacy.
+    """
+    lines = []
+    credits = defaultdict(Decimal)
+    for pharmacy_id, mask_id, quantity in items:
+        mask = masks.get(mask_id)
+        if mask is None or mask.pharmacy_id != pharmacy_id:
+            raise ValidationError(f"Mask {mask_id} not found in pharmacy {pharmacy_id}.")
+        amount = mask.price * quantity
+        lines.append((mask, amount))
+        credits[pharmacy_id] += amount
+    if sum(credits.values(), Decimal('0')) > MAX_AMOUNT:
+        raise ValidationError(f"The order total may not exceed {MAX_AMOUNT}.")
+    return lines, credits
+
+
+def load_masks(items):
+    """{mask_id: mask} of every mask ``items`` refer to, with its pharmacy, in one query."""
+    return Mask.objects.select_related('pharmacy').in_bulk({mask_id for _, mask_id, _ in items})
+
+
+def place_order(user_id, items, concurrency=None, on_conflict=None):
+    """
+    Buy ``items`` (from parse_items) for the user and return the created
+    Transactions, in line item order. Raises ValidationError, leaving
+    nothing changed, for an unknown user or mask and for insufficient funds.
+
+    ``concurrency`` (default settings.PURCHASE_CONCURRENCY) is PESSIMISTIC
+    or OPTIMISTIC; ``on_conflict`` is called before each optimistic retry.
+    """
+    user_id = parse_user_id(user_id)
+    if (concurrency or getattr(settings, 'PURCHASE_CONCURRENCY', PESSIMISTIC)) == OPTIMISTIC:
+        return place_order_optimistic(user_id, items, on_conflict)
+
+    with db_transaction.atomic():
+        try:
+            user = User.objects.select_for_update().get(id=user_id)
+        except User.DoesNotExist:
+            raise ValidationError("User not found.")
+
+        lines, credits = price_items(load_masks(items), items)
+        total_cost = sum(credits.values(), Decimal('0'))
+        if user.cash_balance < total_cost:
+            raise ValidationError(f"Insufficient funds. Required: {total_cost}, Available: {user.cash_balance}")
+
+        adjust_balances(User, {user.id: -total_cost})
+        user.cash_balance -= total_cost
+        adjust_balances(Pharmacy, credits)
+
+        now = timezone.now()
+        transactions = [
+            Transaction(user=user, pharmacy=mask.pharmacy, mask=mask, transaction_date=now, transaction_amount=amount)
+            for mask, amount in lines
+        ]
+        insert_transactions(transactions, [user.id], now)
+    return transactions
+
+
+def place_order_optimistic(user_id, items, on_conflict=None):
+    """
+    place_order() without locking on read. Raises PurchaseConflict once
+    settings.PURCHASE_OPTIMISTIC_RETRIES retries have all lost the race.
+    """
+    retries = getattr(settings, 'PURCHASE_OPTIMISTIC_RETRIES', 8)
+    backoff = getattr(settings, 'PURCHASE_OPTIMISTIC_BACKOFF', 0.002)
+    backoff_max = getattr(settings, 'PURCHASE_OPTIMISTIC_BACKOFF_MAX', 0.1)
+    for attempt in range(retries + 1):
+        if attempt:
+            if on_conflict is not None:
+                on_conflict()
+            # Full jitter keeps the retries of colliding orders apart
+            time.sleep(random.uniform(0, min(backoff_max, backoff * 2 ** (attempt - 1))))
+        transactions = try_place_order(user_id, items)
+        if transactions is not None:
+            return transactions
+    raise PurchaseConflict()
+
+
+def try_place_order(user_id, items):
+    """
+    One optimistic attempt: the created Transactions, or None if the user's
+    balance changed since it was read (or a lock could not be taken).
+    """
+    try:
+        lines, credits = price_items(load_masks(items), items)
+        total_cost = sum(credits.values(), Decimal('0'))
+        user = User.objects.filter(id=user_id).values('cash_balance', 'version').first()
+        if user is None:
+            raise ValidationError("User not found.")
+        if user['cash_balance'] < total_cost:
+            raise ValidationError(f"Insufficient funds. Required: {total_cost}, Available: {user['cash_balance']}")
+
+        with db_transaction.atomic():
+            if not debit_user(user_id, user['version'], total_cost):
+                return None
+            now = timezone.now()
+            transactions = [
+                Transaction(user_id=user_id, pharmacy=mask.pharmacy, mask=mask,
+                            transaction_date=now, transaction_amount=amount)
+                for mask, amount in lines
+            ]
+            insert_transactions(transactions, [user_id], now)
+            # Last, so the contended pharmacy rows stay locked the shortest
+            adjust_balances(Pharmacy, credits)
+    except OperationalError:
+        # A deadlock or lock wait timeout, or a busy database on SQLite
+        return None
+    return transactions
+
+
+def debit_user(user_id, version, amount):
+    """
+    Take ``amount`` from the user's balance if it is still at ``version``
+    and covers it. Returns whether it did.
+    """
+    return User.objects.filter(id=user_id, version=version, cash_balance__gte=amount).update(
+        cash_balance=F('cash_balance') - amount, version=F('version') + 1,
+    ) == 1
+
+
+def place_orders(orders, group_size=None):
+    """
+    Apply many {'user_id', 'purchases'} orders, ``group_size`` (default
+    settings.PURCHASE_BATCH_GROUP_SIZE) per database transaction, in order,
+    so one user's later orders see the balance left by the earlier ones.
+
+    Returns one result per order: {'index', 'status': 'accepted', 'total',
+    'transaction_ids'} or {'index', 'status': 'rejected', 'error'}.
+    """
+    group_size = group_size or getattr(settings, 'PURCHASE_BATCH_GROUP_SIZE', 500)
+    results = [None] * len(orders)
+    parsed = []
+    for index, order in enumerate(orders):
+        try:
+            if not isinstance(order, dict) or not order.get('user_id') or not order.get('purchases'):
+                raise ValidationError("'user_id' and 'purchases' fields are required.")
+            user_id = parse_user_id(order['user_id'])
+            parsed.append((index, user_id, parse_items(order['purchases'])))
+        except ValidationError as exc:
+            results[index] = rejected(index, exc)
+
+    # Prices are read once for the whole batch
+    masks = load_masks([item for _, _, items in parsed for item in items])
+    for start in range(0, len(parsed), group_size):
+        apply_group(parsed[start:start + group_size], masks, results)
+    return results
+
+
+def apply_group(group, masks, results):
+    """Commit the valid orders of ``group`` [(index, user_id, items)] together, filling ``results``."""
+    try:
+        with db_transaction.atomic():
+            settle_group(group, masks, results)
+    except DatabaseError:
+        # A failed group commit (a deadlock, a row deleted meanwhile) is
+        # retried an order at a time so only the failing orders are rejected.
+        for index, user_id, items in group:
+            try:
+                transactions = place_order(user_id, items)
+            except (ValidationError, PurchaseConflict, DatabaseError) as exc:
+                results[index] = rejected(index, exc)
+            else:
+                total_cost = sum((transaction.transaction_amount for transaction in transactions), Decimal('0'))
+                results[index] = accepted_result(index, total_cost, transactions)
+
+
+def settle_group(group, masks, results):
+    """
+    Apply the valid orders of ``group`` in the caller's database
+    transaction and fill ``results``. Users are locked in id order, then
+    pharmacies, and orders are applied in ``group`` order, so orders for
+    the same user or pharmacy take effect one after the other.
+    """
+    locked = User.objects.select_for_update().filter(id__in={user_id for _, user_id, _ in group}).order_by('id')
+    balances = {user.id: user.cash_balance for user in locked}
+    debits = defaultdict(Decimal)
+    credits = defaultdict(Decimal)
+    transactions = []
+    accepted = []
+    now = timezone.now()
+    for index, user_id, items in group:
+        try:
+            if user_id not in balances:
+                raise ValidationError("User not found.")
+            lines, order_credits = price_items(masks, items)
+            total_cost = sum(order_credits.values(), Decimal('0'))
+            if balances[user_id] < total_cost:
+                raise ValidationError(f"Insufficient funds. Required: {total_cost}, Available: {balances[user_id]}")
+        except ValidationError as exc:
+            results[index] = rejected(index, exc)
+            continue
+
+        balances[user_id] -= total_cost
+        debits[user_id] -= total_cost
+        for pharmacy_id, credit in order_credits.items():
+            credits[pharmacy_id] += credit
+        order_transactions = [
+            Transaction(user_id=user_id, pharmacy=mask.pharmacy, mask=mask,
+                        transaction_date=now, transaction_amount=amount)
+            for mask, amount in lines
+        ]
+        transactions += order_transactions
+        accepted.append((index, total_cost, order_transactions))
+
+    adjust_balances(User, debits)
+    adjust_balances(Pharmacy, credits)
+    insert_transactions(transactions, list(debits), now)
+    # Ids are known once the transactions are inserted
+    for index, total_cost, order_transactions in accepted:
+        results[index] = accepted_result(index, total_cost, order_transactions)
+
+
+def enqueue_order(user_id, items):
+    """
+    Check an order against the current users and masks and queue it as a
+    pending PurchaseOrder. Funds are only checked when it is applied.
+    """
+    user_id = parse_user_id(user_id)
+    if not User.objects.filter(id=user_id).exists():
+        raise ValidationError("User not found.")
+    price_items(load_masks(items), items)
+    return PurchaseOrder.objects.create(user_id=user_id, items=[list(item) for item in items])
+
+
+def process_orders(batch_size=None):
+    """
+    Apply up to ``batch_size`` (default settings.PURCHASE_BATCH_GROUP_SIZE)
+    pending orders, oldest first, and return how many were settled.
+
+    The orders are claimed, applied and marked accepted or rejected in one
+    database transaction: a worker stopped halfway leaves them pending, and
+    an order is never applied twice. Claims skip orders locked by another
+    worker (SKIP LOCKED), so several workers can drain the queue; orders are
+    then only applied in queue order within each worker's batch. A batch
+    that fails is retried an order at a time, and an order that fails with
+    a database error on its own is rejected.
+    """
+    batch_size = batch_size or getattr(settings, 'PURCHASE_BATCH_GROUP_SIZE', 500)
+    orders = []
+    try:
+        with db_transaction.atomic():
+            orders = list(
+                PurchaseOrder.objects.select_for_update(skip_locked=True)
+                .filter(status=PurchaseOrder.PENDING).order_by('id')[:batch_size]
+            )
+            if not orders:
+                return 0
+            group = [
+                (index, order.user_id, [tuple(item) for item in order.items])
+                for index, order in enumerate(orders)
+            ]
+            results = [None] * len(orders)
+            settle_group(group, load_masks([item for _, _, items in group for item in items]), results)
+
+            now = timezone.now()
+            for order, result in zip(orders, results):
+                order.status = result['status']
+                order.error = result.get('error', '')
+                order.total = result.get('total')
+                order.transaction_ids = result.get('transaction_ids', [])
+                order.processed_at = now
+            PurchaseOrder.objects.bulk_update(orders, ['status', 'error', 'total', 'transaction_ids', 'processed_at'])
+    except DatabaseError as exc:
+        if batch_size == 1:
+            # The order fails on its own (e.g. a balance out of the column's
+            # range): reject it so it does not hold up the orders behind it.
+            return reject_order(orders[0], exc) if orders else 0
+        # Settle the batch an order at a time to find the one that fails
+        settled = 0
+        for _ in range(batch_size):
+            count = process_orders(1)
+            if not count:
+                break
+            settled += count
+        return settled
+    return len(orders)
+
+
+def reject_order(order, exc):
+    """Mark the pending ``order`` rejected with ``exc``, in a new transaction; returns 1 if it was."""
+    return PurchaseOrder.objects.filter(id=order.id, status=PurchaseOrder.PENDING).update(
+        status=PurchaseOrder.REJECTED, error=rejected(0, exc)['error'], processed_at=timezone.now(),
+    )
+
+
+def accepted_result(index, total_cost, transactions):
+    return {
+        'index': index,
+        'status': 'accepted',
+        'total': str(total_cost),
+        'transaction_ids': [transaction.pk for transaction in transactions],
+    }
+
+
+def rejected(index, exc):
+    if isinstance(exc, APIException):
+        error = exc.detail[0] if isinstance(exc.detail, list) else exc.detail
+    else:
+        error = "The order could not be saved."
+    return {'index': index, 'status': 'rejected', 'error': str(error)}
+
+
+def adjust_balances(model, changes):
+    """Add {id: amount} to the rows' cash_balance, and 1 to their version, locking them in id order."""
+    add_by_id(model, ['cash_balance', 'version'], {object_id: (amount, 1) for object_id, amount in changes.items()})
+
+
+def insert_transactions(transactions, user_ids, now):
+    """bulk_create ``transactions``, all dated ``now`` for the locked ``user_ids``, and roll them up."""
+    Transaction.objects.bulk_create(transactions)
+    if transactions and transactions[0].pk is None:
+        # MySQL does not return ids from bulk inserts. The users' rows are
+        # locked, so these are the only rows at this instant for them.
+        ids = (
+            Transaction.objects.filter(user_id__in=user_ids, transaction_date=now)
+            .order_by('id').values_list('id', flat=True)
+        )
+        for transaction, transaction_id in zip(transactions, ids):
+            transaction.pk = transaction_id
+    # bulk_create sends no signals. A single order touches a few rollup
+    # rows; a group touches as many as it has orders.
+    if len(user_ids) > 1:
+        record_sales_bulk(transactions)
+    else:
+        record_sales(transactions)
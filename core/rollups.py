@@ -0,0 +1,263 @@
+"""
+DailySales rollup: maintenance and the date-range reports built on it.
+
+A date range [start, end] (aware datetimes, both inclusive, as the report
+endpoints filter transaction_date) splits into whole days, summed from
+DailySales, and the partial days at either end, read from Transaction. The
+results equal the same aggregate over the raw transactions.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailySales, Transaction
+from .utils import add_by_id
+
+
+def day_of(moment):
+    return timezone.localdate(moment)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def split_range(start, end):
+    """
+    Returns (first_day, last_day, partial) where the whole days
+    first_day..last_day lie inside [start, end] (first_day is None if there
+    are none) and partial is a Q over transaction_date for the rest.
+    """
+    if start > end:
+        return None, None, Q(pk__in=[])
+
+    first_day = day_of(start)
+    if start != start_of_day(first_day):
+        first_day += timedelta(days=1)
+    # The day containing ``end`` is never whole: the range stops at ``end``.
+    last_day = day_of(end) - timedelta(days=1)
+    if first_day > last_day:
+        return None, None, Q(transaction_date__range=(start, end))
+
+    partial = (
+        Q(transaction_date__gte=start, transaction_date__lt=start_of_day(first_day))
+        | Q(transaction_date__gte=start_of_day(last_day + timedelta(days=1)), transaction_date__lte=end)
+    )
+    return first_day, last_day, partial
+
+
+def raw_sales_summary(start, end):
+    return Transaction.objects.filter(transaction_date__range=(start, end)).aggregate(
+        total_masks_sold=Count('id'),
+        total_transaction_value=Sum('transaction_amount'),
+    )
+
+
+def sales_summary(start, end):
+    """Same result as raw_sales_summary(), from DailySales for the whole days."""
+    first_day, last_day, partial = split_range(start, end)
+    summary = Transaction.objects.filter(partial).aggregate(
+        total_masks_sold=Count('id'),
+        total_transaction_value=Sum('transaction_amount'),
+    )
+    if first_day is None:
+        return summary
+
+    days = DailySales.objects.filter(date__range=(first_day, last_day)).aggregate(
+        count=Sum('transaction_count'),
+        amount=Sum('transaction_amount'),
+    )
+    summary['total_masks_sold'] += days['count'] or 0
+    if days['amount'] is not None:
+        summary['total_transaction_value'] = (summary['total_transaction_value'] or 0) + days['amount']
+    return summary
+
+
+def raw_top_user_totals(start, end, limit):
+    """[(user_id, total_amount)] of the ``limit`` biggest spenders, ties by user id."""
+    return list(
+        Transaction.objects.filter(transaction_date__range=(start, end))
+        .values('user_id')
+        .annotate(total=Sum('transaction_amount'))
+        .order_by('-total', 'user_id')
+        .values_list('user_id', 'total')[:max(limit, 0)]
+    )
+
+
+def top_user_totals(start, end, limit):
+    """Same result as raw_top_user_totals(), from DailySales for the whole days."""
+    first_day, last_day, partial = split_range(start, end)
+    if limit <= 0:
+        return []
+    if first_day is None:
+        return raw_top_user_totals(start, end, limit)
+
+    totals = defaultdict(Decimal)
+    boundary = Transaction.objects.filter(partial)
+    for user_id, amount in boundary.values('user_id').annotate(total=Sum('transaction_amount')).values_list('user_id', 'total'):
+        totals[user_id] += amount
+    boundary_users = len(totals)
+
+    days = DailySales.objects.filter(date__range=(first_day, last_day))
+    # A user without boundary transactions ranks by their whole-day total
+    # alone. If they make the top ``limit``, at most ``limit - 1`` others
+    # and the boundary users rank above them among whole-day totals.
+    ranked = (
+        days.values('user_id').annotate(total=Sum('transaction_amount'))
+        .order_by('-total', 'user_id')
+        .values_list('user_id', 'total')[:limit + boundary_users]
+    )
+    leaders = dict(ranked)
+    if boundary_users:
+        leaders.update(
+            days.filter(user_id__in=boundary.values('user_id'))
+            .values('user_id').annotate(total=Sum('transaction_amount'))
+            .values_list('user_id', 'total')
+        )
+    for user_id, amount in leaders.items():
+        totals[user_id] += amount
+
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def record_sales(transactions):
+    """
+    Add transactions to DailySales. Runs in the caller's database
+    transaction, so the rollup commits or rolls back with them.
+    """
+    _apply(transactions, 1)
+
+
+def remove_sales(transactions):
+    """Take transactions out of DailySales."""
+    _apply(transactions, -1)
+
+
+def _group(transactions, sign):
+    """{(day, user_id, pharmacy_id): [count, amount]} of ``transactions``."""
+    grouped = defaultdict(lambda: [0, Decimal('0')])
+    for item in transactions:
+        totals = grouped[(day_of(item.transaction_date), item.user_id, item.pharmacy_id)]
+        totals[0] += sign
+        totals[1] += sign * Decimal(str(item.transaction_amount))
+    return grouped
+
+
+def _apply(transactions, sign):
+    _apply_grouped(_group(transactions, sign), sign)
+
+
+def _apply_grouped(grouped, sign):
+    for (day, user_id, pharmacy_id), (count, amount) in grouped.items():
+        key = {'date': day, 'user_id': user_id, 'pharmacy_id': pharmacy_id}
+        increment = {
+            'transaction_count': F('transaction_count') + count,
+            'transaction_amount': F('transaction_amount') + amount,
+        }
+        if DailySales.objects.filter(**key).update(**increment):
+            if sign < 0:
+                DailySales.objects.filter(**key, transaction_count=0).delete()
+            continue
+        if sign < 0:
+            continue
+        try:
+            with db_transaction.atomic():
+                DailySales.objects.create(**key, transaction_count=count, transaction_amount=amount)
+        except IntegrityError:
+            # Created concurrently since the update above
+            DailySales.objects.filter(**key).update(**increment)
+
+
+def record_sales_bulk(transactions, batch_size=1000):
+    """
+    record_sales() for many transactions spread over many (day, user,
+    pharmacy) rows, in a few statements: the existing rows are read and
+    locked in one query and incremented by id, and the missing ones are
+    written with bulk_create.
+    """
+    grouped = _group(transactions, 1)
+    if not grouped:
+        return
+    candidates = DailySales.objects.select_for_update().filter(
+        date__in={day for day, _, _ in grouped},
+        user_id__in={user_id for _, user_id, _ in grouped},
+        pharmacy_id__in={pharmacy_id for _, _, pharmacy_id in grouped},
+    )
+    existing = {(row.date, row.user_id, row.pharmacy_id): row for row in candidates}
+
+    changed = {}
+    missing = {}
+    for key, (count, amount) in grouped.items():
+        row = existing.get(key)
+        if row is None:
+            missing[key] = (count, amount)
+        else:
+            changed[row.id] = (count, amount)
+    add_by_id(DailySales, ['transaction_count', 'transaction_amount'], changed)
+    try:
+        with db_transaction.atomic():
+            DailySales.objects.bulk_create(
+                [
+                    DailySales(date=day, user_id=user_id, pharmacy_id=pharmacy_id,
+                               transaction_count=count, transaction_amount=amount)
+                    for (day, user_id, pharmacy_id), (count, amount) in missing.items()
+                ],
+                batch_size=batch_size,
+            )
+    except IntegrityError:
+        # Some were created concurrently since the read above
+        _apply_grouped(missing, 1)
+
+
+def record_sales_between(first_id, end_id, batch_size=2000):
+    """
+    record_sales_bulk() for the transactions with ids in [first_id,
+    end_id) (the rows a load just wrote), batch_size at a time, in one
+    database transaction. Returns the number of transactions rolled up.
+    """
+    rows = (
+        Transaction.objects.filter(id__gte=first_id, id__lt=end_id).order_by('id')
+        .only('id', 'user_id', 'pharmacy_id', 'transaction_date', 'transaction_amount')
+    )
+    added = 0
+    with db_transaction.atomic():
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                record_sales_bulk(batch, batch_size)
+                added += len(batch)
+                batch = []
+        record_sales_bulk(batch, batch_size)
+        added += len(batch)
+    return added
+
+
+def rebuild_daily_sales(batch_size=2000):
+    """Recompute DailySales from every Transaction. Returns the number of rows."""
+    rows = (
+        Transaction.objects
+        .annotate(date=TruncDate('transaction_date'))
+        .values('date', 'user_id', 'pharmacy_id')
+        .annotate(count=Count('id'), amount=Sum('transaction_amount'))
+        .order_by()
+    )
+    created = 0
+    with db_transaction.atomic():
+        DailySales.objects.all().delete()
+        batch = []
+        for row in rows.iterator():
+            batch.append(DailySales(
+                date=row['date'], user_id=row['user_id'], pharmacy_id=row['pharmacy_id'],
+                transaction_count=row['count'], transaction_amount=row['amount'],
+            ))
+            if len(batch) >= batch_size:
+                DailySales.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailySales.objects.bulk_create(batch)
+        created += len(batch)
+    return created
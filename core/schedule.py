@@ -0,0 +1,42 @@
+"""
+Minute-of-week arithmetic for pharmacy opening hours.
+
+Minutes are counted from Monday 00:00, so a week spans 0..10079. Plain
+Python only, so the ETL transform workers can use it too.
+"""
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def day_of_week_index(value):
+    """
+    Monday-based index of a day name, accepting any case-insensitive prefix of
+    at least three letters ('Mon', 'Thur', 'thursday'). Returns None if the
+    value is not a day name.
+    """
+    value = (value or '').strip().lower()
+    if len(value) < 3:
+        return None
+    for index, name in enumerate(DAY_NAMES):
+        if name.lower().startswith(value):
+            return index
+    return None
+
+
+def minute_of_week(day_index, time):
+    return day_index * MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+
+def opening_span(day_index, open_time, close_time):
+    """
+    (start, end) minutes of an opening window, both inclusive. A closing time
+    at or before the opening time runs past midnight into the next day, so
+    end may exceed the day (and, for Sunday nights, the week).
+    """
+    start = minute_of_week(day_index, open_time)
+    end = minute_of_week(day_index, close_time)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
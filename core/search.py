@@ -0,0 +1,348 @@
+"""
+Ranked name search for SearchView, through the backend named by
+settings.SEARCH_BACKEND: 'memory' (default, below), 'database'
+(core.fulltext) or 'like' (the former icontains scan).
+
+Each SearchIndex keeps an inverted index over one model's ``name``:
+token postings for exact and prefix matches (prefixes come from the sorted
+vocabulary) and trigram postings over the vocabulary for matches inside a
+token, so "ask" still finds "Mask". Every query term must match (AND).
+Names are scored with BM25, terms counting fully for an exact token,
+less for a prefix and least for an infix, and boosted when the whole name
+equals or starts with the query.
+
+Postings point at distinct normalized names rather than rows: catalogues
+repeat the same few mask names across a million rows, so scoring touches
+each name once and the matching ids are read off its sorted id array.
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from heapq import merge
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from . import fulltext
+from .fast_serializers import FastSerializer
+from .models import Mask, Pharmacy
+
+TOKEN_RE = re.compile(r'\w+')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Weight of a term matching a whole token, the start of one, or its inside
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.6
+INFIX_WEIGHT = 0.3
+# Multipliers when the whole name equals / starts with the query
+NAME_EXACT_BOOST = 2.0
+NAME_PREFIX_BOOST = 1.5
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """
+    Built lazily from the database on the first search, after invalidate()
+    (bulk loads) and once older than settings.SEARCH_INDEX_MAX_AGE seconds
+    to pick up changes made by other processes. The model's signals keep
+    it current in between with add() and remove().
+    """
+
+    def __init__(self, model, field='name'):
+        self.model = model
+        self.field = field
+        self._lock = threading.RLock()
+        self._built_at = 0.0
+        self._reset()
+        self._built = False
+
+    def _reset(self):
+        self.keys = {}          # object id -> normalized name
+        self.groups = {}        # normalized name -> sorted array of object ids
+        self.frequencies = {}   # normalized name -> Counter of its tokens
+        self.lengths = {}       # normalized name -> number of tokens
+        self.postings = {}      # token -> set of normalized names containing it
+        self.df = Counter()     # token -> number of objects whose name contains it
+        self.vocabulary = []    # sorted tokens
+        self.trigram_postings = {}  # trigram -> set of tokens containing it
+        self.total_length = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._reset()
+            self._built = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def build(self):
+        with self._lock:
+            self._reset()
+            ids_by_name = {}
+            rows = self.model.objects.order_by('id').values_list('id', self.field)
+            for object_id, name in rows.iterator(chunk_size=5000):
+                ids_by_name.setdefault(name or '', []).append(object_id)
+            for name, object_ids in ids_by_name.items():
+                self._add_group(tokenize(name), object_ids)
+            self._built = True
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        max_age = getattr(settings, 'SEARCH_INDEX_MAX_AGE', 300)
+        if not self._built or time.monotonic() - self._built_at > max_age:
+            self.build()
+
+    def add(self, object_id, name):
+        """Index (or re-index) one object. A no-op until the index is first built."""
+        with self._lock:
+            if self._built:
+                self._add(object_id, name)
+
+    def remove(self, object_id):
+        with self._lock:
+            if self._built:
+                self._remove(object_id)
+
+    def _add(self, object_id, name):
+        tokens = tokenize(name or '')
+        previous = self.keys.get(object_id)
+        if previous == ' '.join(tokens):
+            return
+        if previous is not None:
+            self._remove(object_id)
+        self._add_group(tokens, [object_id])
+
+    def _add_group(self, tokens, object_ids):
+        """Index objects sharing one name; ``object_ids`` are sorted and not indexed yet."""
+        key = ' '.join(tokens)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = array('q')
+            frequencies = self.frequencies[key] = Counter(tokens)
+            self.lengths[key] = len(tokens)
+            for token in frequencies:
+                if token not in self.postings:
+                    self.postings[token] = set()
+                    insort(self.vocabulary, token)
+                    for trigram in trigrams(token):
+                        self.trigram_postings.setdefault(trigram, set()).add(token)
+                self.postings[token].add(key)
+        if not group or group[-1] < object_ids[0]:
+            group.extend(object_ids)
+        elif len(object_ids) == 1:
+            group.insert(bisect_left(group, object_ids[0]), object_ids[0])
+        else:
+            self.groups[key] = array('q', sorted([*group, *object_ids]))
+
+        self.keys.update(dict.fromkeys(object_ids, key))
+        for token in self.frequencies[key]:
+            self.df[token] += len(object_ids)
+        self.total_length += len(tokens) * len(object_ids)
+
+    def _remove(self, object_id):
+        key = self.keys.pop(object_id, None)
+        if key is None:
+            return
+        group = self.groups[key]
+        del group[bisect_left(group, object_id)]
+        frequencies = self.frequencies[key]
+        self.df.subtract(frequencies.keys())
+        self.total_length -= self.lengths[key]
+        if group:
+            return
+
+        del self.groups[key], self.frequencies[key], self.lengths[key]
+        for token in frequencies:
+            names = self.postings[token]
+            names.discard(key)
+            if names:
+                continue
+            del self.postings[token], self.df[token]
+            del self.vocabulary[bisect_left(self.vocabulary, token)]
+            for trigram in trigrams(token):
+                tokens = self.trigram_postings[trigram]
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigram_postings[trigram]
+
+    def expand(self, term):
+        """{token: weight} of the indexed tokens ``term`` matches."""
+        matches = {}
+        for index in range(bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            token = self.vocabulary[index]
+            if not token.startswith(term):
+                break
+            matches[token] = EXACT_WEIGHT if token == term else PREFIX_WEIGHT
+        if len(term) >= 3:
+            candidates = None
+            for trigram in trigrams(term):
+                tokens = self.trigram_postings.get(trigram)
+                if not tokens:
+                    return matches
+                candidates = set(tokens) if candidates is None else candidates & tokens
+            for token in candidates:
+                if token not in matches and term in token:
+                    matches[token] = INFIX_WEIGHT
+        return matches
+
+    def search(self, query, limit):
+        """[(object_id, relevance)] of the best ``limit`` matches, best first, ties by id."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+        # Only the lookups hold the lock: concurrent searches score in parallel
+        with self._lock:
+            self._ensure_built()
+            snapshot = self._match(terms)
+        if snapshot is None:
+            return []
+        groups, frequencies, lengths, average_length, matched = snapshot
+        ranked = self._score(terms, frequencies, lengths, average_length, matched)
+        with self._lock:
+            return self._hits(ranked, groups, limit)
+
+    def _match(self, terms):
+        """
+        What scoring ``terms`` reads, taken under the lock: (groups,
+        frequencies, lengths, average_length, [(idf, [(token, weight,
+        names)])]), or None when a term matches nothing. The dicts are the
+        live ones; names removed from them since are skipped.
+        """
+        count = len(self.keys)
+        if not count:
+            return None
+        matched = []
+        for term in terms:
+            matches = self.expand(term)
+            if not matches:
+                return None
+            # The term's idf counts every object it matches (at most once
+            # each, approximately), so expanding to a rare token does not
+            # outrank an exact match.
+            df = min(count, sum(self.df[token] for token in matches))
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            matched.append((idf, [(token, weight, tuple(self.postings[token])) for token, weight in matches.items()]))
+        average_length = self.total_length / count or 1
+        return self.groups, self.frequencies, self.lengths, average_length, matched
+
+    @staticmethod
+    def _score(terms, frequencies, lengths, average_length, matched):
+        """{score: [names]} of the names matching every term, boosted for the whole phrase."""
+        term_scores = []
+        for idf, postings in matched:
+            scores = {}
+            for token, weight, names in postings:
+                for key in names:
+                    key_frequencies, length = frequencies.get(key), lengths.get(key)
+                    if key_frequencies is None or length is None:
+                        continue
+                    tf = key_frequencies[token]
+                    norm = 1 - B + B * length / average_length
+                    score = weight * idf * tf * (K1 + 1) / (tf + K1 * norm)
+                    if score > scores.get(key, 0):
+                        scores[key] = score
+            if not scores:
+                return {}
+            term_scores.append(scores)
+
+        term_scores.sort(key=len)
+        phrase = ' '.join(terms)
+        ranked = {}
+        for key, score in term_scores[0].items():
+            for scores in term_scores[1:]:
+                if key not in scores:
+                    break
+                score += scores[key]
+            else:
+                if key == phrase:
+                    score *= NAME_EXACT_BOOST
+                elif key.startswith(phrase):
+                    score *= NAME_PREFIX_BOOST
+                ranked.setdefault(score, []).append(key)
+        return ranked
+
+    @staticmethod
+    def _hits(ranked, groups, limit):
+        # Equal scores are merged so their ids come out in order
+        hits = []
+        for score in sorted(ranked, reverse=True):
+            for object_id in merge(*(groups.get(key, ()) for key in ranked[score])):
+                hits.append((object_id, score))
+                if len(hits) == limit:
+                    return hits
+        return hits
+
+
+mask_search_index = SearchIndex(Mask)
+pharmacy_search_index = SearchIndex(Pharmacy)
+SEARCH_INDEXES = {Mask: mask_search_index, Pharmacy: pharmacy_search_index}
+
+
+class MemoryBackend:
+    """The in-process SearchIndex above."""
+
+    def search(self, model, query, limit):
+        return SEARCH_INDEXES[model].search(query, limit)
+
+
+class DatabaseBackend:
+    """FULLTEXT (MySQL) or FTS5 (SQLite) search in the database; see core.fulltext."""
+
+    def search(self, model, query, limit):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+        return fulltext.search(connection, model, terms, limit)
+
+
+class LikeBackend:
+    """The former unranked ``name icontains query`` scan, kept as a baseline."""
+
+    def search(self, model, query, limit):
+        ids = model.objects.filter(name__icontains=query).order_by('id').values_list('id', flat=True)[:limit]
+        return [(object_id, 1.0) for object_id in ids]
+
+
+SEARCH_BACKENDS = {
+    'memory': MemoryBackend,
+    'database': DatabaseBackend,
+    'like': LikeBackend,
+}
+
+
+def get_search_backend(name=None):
+    name = name or getattr(settings, 'SEARCH_BACKEND', 'memory')
+    try:
+        return SEARCH_BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown SEARCH_BACKEND {name!r}; choose one of {', '.join(SEARCH_BACKENDS)}."
+        )
+
+
+def search_rows(model, serializer, query, limit, backend=None):
+    """Serialized best matches for ``query``, each with its ``relevance``, best first."""
+    hits = (backend or get_search_backend()).search(model, query, limit)
+    fast = FastSerializer(serializer)
+    queryset = model.objects.filter(id__in=[object_id for object_id, _ in hits])
+    found = {row['id']: row for row in fast.values(queryset, 'id')}
+    results = []
+    for object_id, score in hits:
+        if object_id in found:  # deleted by another process since the index was built
+            [row] = fast.represent([found[object_id]])
+            row['relevance'] = round(score, 4)
+            results.append(row)
+    return results
@@ -1,27 +1,43 @@
 from rest_framework import serializers
-from .models import User, Pharmacy, PharmacyOpeningHour, Mask, Transaction
+from .models import User, Pharmacy, PharmacyOpeningHour, Mask, Transaction, PurchaseOrder
 
-class UserSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    Takes an optional ``fields`` argument naming the subset of fields to
+    output; the others are dropped before any row is serialized.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class UserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
-        fields = '__all__'
+        # version only guards concurrent balance updates
+        exclude = ['version']
 
-class PharmacySerializer(serializers.ModelSerializer):
+class PharmacySerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Pharmacy
-        fields = '__all__'
+        exclude = ['version']
 
-class PharmacyOpeningHourSerializer(serializers.ModelSerializer):
+class PharmacyMaskCountSerializer(PharmacySerializer):
+    mask_count = serializers.IntegerField(read_only=True)
+
+class PharmacyOpeningHourSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = PharmacyOpeningHour
         fields = '__all__'
 
-class MaskSerializer(serializers.ModelSerializer):
+class MaskSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Mask
         fields = '__all__'
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
@@ -33,4 +49,29 @@ class PurchaseItemSerializer(serializers.Serializer):
 
 class PurchaseRequestSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
-    purchases = PurchaseItemSerializer(many=True)
\ No newline at end of file
+    purchases = PurchaseItemSerializer(many=True)
+
+class PurchaseOrderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurchaseOrder
+        fields = ['id', 'user', 'status', 'error', 'total', 'transaction_ids', 'created_at', 'processed_at']
+
+class PurchaseBatchRequestSerializer(serializers.Serializer):
+    orders = PurchaseRequestSerializer(many=True)
+
+class PurchaseResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['accepted', 'rejected'])
+    total = serializers.DecimalField(max_digits=14, decimal_places=2, required=False)
+    transaction_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    error = serializers.CharField(required=False)
+
+class PurchaseBatchResponseSerializer(serializers.Serializer):
+    accepted = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+    results = PurchaseResultSerializer(many=True)
+
+class SuggestionSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    category = serializers.ChoiceField(choices=['masks', 'pharmacies'])
+    sales = serializers.IntegerField()
@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Mask, Pharmacy, PharmacyOpeningHour, Transaction
+from .analytics import top_users_engine
+from .open_hours import open_hours_index
+from .rollups import record_sales, remove_sales
+from .search import SEARCH_INDEXES
+from .suggest import suggest_index
+
+SUGGEST_CATEGORIES = {Mask: 'masks', Pharmacy: 'pharmacies'}
+
+
+@receiver([post_save, post_delete], sender=PharmacyOpeningHour)
+def invalidate_open_hours_index(sender, **kwargs):
+    open_hours_index.invalidate()
+
+
+@receiver(pre_save, sender=Mask)
+@receiver(pre_save, sender=Pharmacy)
+def remember_previous_name(sender, instance, raw=False, **kwargs):
+    # Only needed to move a renamed object in a built suggest index
+    instance._suggest_previous_name = None
+    if suggest_index.is_built() and instance.pk is not None and not raw and not instance._state.adding:
+        instance._suggest_previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Mask)
+@receiver(post_save, sender=Pharmacy)
+def update_search_index_on_save(sender, instance, created=False, **kwargs):
+    SEARCH_INDEXES[sender].add(instance.pk, instance.name)
+    previous = None if created else getattr(instance, '_suggest_previous_name', None)
+    if created or previous is not None:
+        suggest_index.saved(SUGGEST_CATEGORIES[sender], instance.name, previous)
+
+
+@receiver(post_delete, sender=Mask)
+@receiver(post_delete, sender=Pharmacy)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    SEARCH_INDEXES[sender].remove(instance.pk)
+    suggest_index.deleted(SUGGEST_CATEGORIES[sender], instance.name)
+
+
+# Keep DailySales in step with transactions saved through the ORM (bulk
+# loads rebuild it instead; see load_initial_data).
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk is not None and not raw and not instance._state.adding:
+        instance._rollup_previous = Transaction.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_daily_sales_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        remove_sales([previous])
+        # The analytics snapshot only picks up new ids by itself
+        top_users_engine.invalidate()
+    record_sales([instance])
+
+
+@receiver(post_delete, sender=Transaction)
+def update_daily_sales_on_delete(sender, instance, **kwargs):
+    remove_sales([instance])
+    top_users_engine.invalidate()
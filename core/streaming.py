@@ -0,0 +1,54 @@
+"""
+Streaming JSON export for the cursor-paginated list endpoints.
+"""
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils import encoders
+
+
+class StreamingListMixin:
+    """
+    With ?stream=1 a list view returns every row as one JSON array, written
+    to the client a chunk at a time instead of being built in memory first.
+
+    Rows are read in batches of settings.API_STREAM_CHUNK_SIZE using the
+    view's keyset ordering, rather than QuerySet.iterator(): MySQLdb buffers
+    a whole result set on the client, so a single query would not bound
+    memory there.
+    """
+    stream_query_param = 'stream'
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param) not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_json(queryset), content_type='application/json')
+
+    def stream_json(self, queryset):
+        yield '['
+        first = True
+        for rows in self.iter_batches(queryset):
+            items = self.get_serializer(rows, many=True).data
+            chunk = ','.join(
+                json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+                for item in items
+            )
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+
+    def iter_batches(self, queryset):
+        keyset = self.pagination_class()
+        chunk_size = getattr(settings, 'API_STREAM_CHUNK_SIZE', 2000)
+        queryset = queryset.order_by(*keyset.ordering)
+        key = None
+        while True:
+            batch = queryset if key is None else queryset.filter(keyset.after(key, reverse=False))
+            rows = list(batch[:chunk_size])
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            key = keyset.key_of(rows[-1])
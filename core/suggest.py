@@ -0,0 +1,258 @@
+"""
+Typeahead completions for search/suggest/.
+
+Every distinct mask name and every pharmacy name is an entry ranked by
+popularity: the number of transactions of the masks with that name, or
+of the pharmacy. Each entry is reachable from its normalized name and from
+every word suffix of it ("barrier green" completes "True Barrier (green)"),
+stored in one sorted array per category, so a prefix is a bisect plus a
+walk over the matching keys. The best completions of prefixes matching
+many keys (short ones, or a name shared by thousands of pharmacies) are
+computed at build.
+
+Saves and deletes update the built tables in place, and the periodic
+refresh of popularity is built in a background thread while requests keep
+reading the previous tables, so no request waits for a rebuild once the
+index has been built.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from heapq import nsmallest
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Sum
+from .models import DailySales, Mask, Pharmacy, Transaction
+from .search import tokenize
+
+# Prefixes matching more keys than this have their completions precomputed
+PRECOMPUTED_RANGE = 256
+# Sorts after every character a key can continue a prefix with
+END = '\U0010ffff'
+
+
+class CompletionTable:
+    """
+    Completions of one category: ``entries`` are (name, popularity) pairs and
+    ``counts`` the number of objects using each name (default 1), so a name
+    is only dropped when its last object goes.
+
+    add() and discard() run one at a time (under SuggestIndex's lock) while
+    requests read without it: they only append to ``entries`` and publish
+    new key lists and removal sets with a single assignment, so a reader
+    sees either the old or the new state of each.
+    """
+
+    def __init__(self, entries, max_results, counts=None):
+        self.entries = list(entries)
+        self.max_results = max_results
+        self.indexes = {name: index for index, (name, _) in enumerate(entries)}
+        self.counts = Counter(counts or {name: 1 for name, _ in entries})
+        self.removed = frozenset()
+        pairs = sorted(
+            (key, index)
+            for index, (name, _) in enumerate(entries)
+            for key in self._keys(name)
+        )
+        # Sorted keys and the entry index owning each, replaced together
+        self.keyed = ([key for key, _ in pairs], [index for _, index in pairs])
+
+        # Walk down from one-character prefixes while they stay broad
+        keys, owners = self.keyed
+        self.precomputed = {}
+        prefixes = {key[:1] for key in keys}
+        while prefixes:
+            broad = set()
+            for prefix in prefixes:
+                lo, hi = self._range(keys, prefix)
+                if hi - lo > PRECOMPUTED_RANGE:
+                    self.precomputed[prefix] = self._rank(owners[lo:hi], self.removed, max_results)
+                    broad.update(key[:len(prefix) + 1] for key in keys[lo:hi] if len(key) > len(prefix))
+            prefixes = broad
+
+    @staticmethod
+    def _keys(name):
+        tokens = tokenize(name)
+        return [' '.join(tokens[start:]) for start in range(len(tokens))]
+
+    def add(self, name):
+        """One more object named ``name``; a new name enters with no sales."""
+        self.counts[name] += 1
+        index = self.indexes.get(name)
+        if index is not None:
+            self.removed = self.removed - {index}
+            return
+        index = self.indexes[name] = len(self.entries)
+        # Appended before any key refers to it
+        self.entries.append((name, 0))
+        keys, owners = (list(items) for items in self.keyed)
+        for key in self._keys(name):
+            position = bisect_right(keys, key)
+            keys.insert(position, key)
+            owners.insert(position, index)
+            for end in range(1, len(key) + 1):
+                best = self.precomputed.get(key[:end])
+                if best is not None:
+                    self.precomputed[key[:end]] = nsmallest(self.max_results, set(best) | {index}, key=self.rank_key)
+        self.keyed = (keys, owners)
+
+    def discard(self, name):
+        """One object fewer named ``name``; the name is hidden with its last object."""
+        if self.counts[name] > 1:
+            self.counts[name] -= 1
+        elif name in self.indexes:
+            self.counts.pop(name, None)
+            self.removed = self.removed | {self.indexes[name]}
+
+    def rank_key(self, index):
+        name, popularity = self.entries[index]
+        return -popularity, name
+
+    def complete(self, prefix, limit):
+        """[(name, popularity)] of the best ``limit`` entries with a key starting with ``prefix``."""
+        keys, owners = self.keyed
+        removed = self.removed
+        indexes = self.precomputed.get(prefix)
+        if indexes is not None and removed.intersection(indexes):
+            indexes = None
+        if indexes is None:
+            lo, hi = self._range(keys, prefix)
+            indexes = self._rank(owners[lo:hi], removed, limit)
+        return [self.entries[index] for index in indexes[:limit]]
+
+    @staticmethod
+    def _range(keys, prefix):
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + END)
+
+    def _rank(self, owners, removed, limit):
+        return nsmallest(limit, set(owners) - removed, key=self.rank_key)
+
+
+class SuggestIndex:
+    """
+    Built lazily like the other in-process indexes, and rebuilt inline after
+    invalidate() (bulk loads). Saves and deletes through the ORM update it in
+    place. Once older than settings.SUGGEST_INDEX_MAX_AGE seconds it is
+    rebuilt in the background, which refreshes popularity and picks up
+    changes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None
+        self._built_at = 0.0
+        self._refreshing = False
+        # Bumped by every in-place change, so a refresh that read the
+        # database before one can tell its tables may have missed it
+        self._changes = 0
+
+    def invalidate(self):
+        self._tables = None
+
+    def is_built(self):
+        return self._tables is not None
+
+    def saved(self, category, name, previous=None):
+        """An object was saved as ``name``, formerly ``previous`` (None if new)."""
+        if name == previous:
+            return
+        with self._lock:
+            tables = self._tables
+            if tables is None:
+                return
+            self._changes += 1
+            if previous is not None:
+                tables[category].discard(previous)
+            tables[category].add(name)
+
+    def deleted(self, category, name):
+        with self._lock:
+            tables = self._tables
+            if tables is None:
+                return
+            self._changes += 1
+            tables[category].discard(name)
+
+    def suggest(self, query, limit, category=None):
+        """
+        [{'name', 'category', 'sales'}] of the best ``limit`` completions of
+        ``query``, most popular first, from 'masks', 'pharmacies' or both.
+        """
+        prefix = ' '.join(tokenize(query))
+        if not prefix or limit <= 0:
+            return []
+        tables = self._current()
+        completions = []
+        for name, table in tables.items():
+            if category in (None, name):
+                completions += [(entry, name) for entry in table.complete(prefix, limit)]
+        completions.sort(key=lambda item: (-item[0][1], item[0][0], item[1]))
+        return [
+            {'name': entry_name, 'category': name, 'sales': popularity}
+            for (entry_name, popularity), name in completions[:limit]
+        ]
+
+    def _current(self):
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._built_at = time.monotonic()
+                    self._tables = self.build()
+                return self._tables
+        max_age = getattr(settings, 'SUGGEST_INDEX_MAX_AGE', 300)
+        if time.monotonic() - self._built_at > max_age:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh, daemon=True).start()
+        return tables
+
+    def _refresh(self):
+        try:
+            changes = self._changes
+            started = time.monotonic()
+            try:
+                tables = self.build()
+            except Exception:
+                self._built_at = started  # keep serving, retry after another max age
+                raise
+            with self._lock:
+                if self._tables is not None:
+                    self._tables = tables
+                    # Refresh again soon if it raced with an in-place change
+                    self._built_at = started if self._changes == changes else 0.0
+        finally:
+            with self._lock:
+                self._refreshing = False
+            connections.close_all()
+
+    def build(self):
+        max_results = getattr(settings, 'SUGGEST_MAX_LIMIT', 20)
+
+        mask_sales = dict(
+            Transaction.objects.values('mask_id').annotate(count=Count('id')).order_by().values_list('mask_id', 'count')
+        )
+        popularity = {}
+        mask_counts = Counter()
+        for mask_id, name in Mask.objects.values_list('id', 'name').iterator(chunk_size=5000):
+            popularity[name] = popularity.get(name, 0) + mask_sales.get(mask_id, 0)
+            mask_counts[name] += 1
+
+        pharmacy_sales = dict(
+            DailySales.objects.values('pharmacy_id').annotate(count=Sum('transaction_count')).order_by()
+            .values_list('pharmacy_id', 'count')
+        )
+        pharmacy_names = dict(Pharmacy.objects.values_list('id', 'name'))
+        return {
+            'masks': CompletionTable(list(popularity.items()), max_results, mask_counts),
+            'pharmacies': CompletionTable(
+                [(name, pharmacy_sales.get(pharmacy_id, 0)) for pharmacy_id, name in pharmacy_names.items()],
+                max_results,
+            ),
+        }
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,96 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.analytics import TopUsersEngine, np, top_users_engine
+from core.models import User, Transaction, Pharmacy, Mask
+from core.rollups import raw_top_user_totals
+
+
+@skipIf(np is None, "NumPy is not installed")
+class TopUsersEngineTests(TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.users = [User.objects.create(name=f"User {i}", cash_balance=1000) for i in range(8)]
+        self.pharmacy = Pharmacy.objects.create(name="Pharmacy", cash_balance=1000)
+        self.mask = Mask.objects.create(pharmacy=self.pharmacy, name="Mask", price=Decimal("5.00"))
+        self.start = timezone.make_aware(datetime(2021, 1, 1))
+        for _ in range(150):
+            self.buy(rng.choice(self.users), Decimal(rng.randrange(1, 800)) / 100,
+                     self.start + timedelta(minutes=rng.randrange(10 * 24 * 60)))
+        # Equal totals, to check the tie order
+        self.buy(self.users[6], Decimal("1000.00"), self.start + timedelta(days=3))
+        self.buy(self.users[7], Decimal("1000.00"), self.start + timedelta(days=3))
+        self.engine = TopUsersEngine(chunk_size=40)
+
+    def buy(self, user, amount, when):
+        return Transaction.objects.create(
+            user=user, pharmacy=self.pharmacy, mask=self.mask, transaction_amount=amount, transaction_date=when,
+        )
+
+    def assertMatchesOrm(self):
+        rng = random.Random(5)
+        for _ in range(30):
+            start, end = sorted(self.start + timedelta(minutes=rng.randrange(-600, 11 * 24 * 60)) for _ in range(2))
+            for limit in (1, 2, 5, 20):
+                self.assertEqual(
+                    self.engine.top_user_totals(start, end, limit), raw_top_user_totals(start, end, limit),
+                    (start, end, limit),
+                )
+
+    def test_matches_orm(self):
+        self.assertMatchesOrm()
+
+    def test_inclusive_bounds(self):
+        moment = self.start + timedelta(days=20)
+        transaction = self.buy(self.users[0], Decimal("3.21"), moment)
+        self.assertEqual(self.engine.top_user_totals(moment, moment, 5), [(self.users[0].id, Decimal("3.21"))])
+        self.assertEqual(self.engine.top_user_totals(moment + timedelta(microseconds=1), moment + timedelta(days=1), 5), [])
+        transaction.delete()
+
+    def test_picks_up_new_transactions_incrementally(self):
+        self.engine.refresh()
+        self.buy(self.users[1], Decimal("500.00"), self.start + timedelta(days=9))
+        self.buy(self.users[2], Decimal("400.00"), self.start + timedelta(days=1))  # back-dated
+        self.assertEqual(len(self.engine.refresh()), Transaction.objects.count())
+        self.assertMatchesOrm()
+
+    def test_picks_up_lower_ids_committed_after_a_refresh(self):
+        late = self.buy(self.users[3], Decimal("900.00"), self.start + timedelta(days=2))
+        # A concurrent purchase took a higher id and committed first
+        self.buy(self.users[4], Decimal("1.00"), self.start + timedelta(days=2))
+        late_row = Transaction.objects.filter(id=late.id).values().get()
+        late.delete()
+        self.engine.refresh()
+
+        Transaction.objects.create(**late_row)
+        self.assertEqual(len(self.engine.refresh()), Transaction.objects.count())
+        self.assertMatchesOrm()
+
+    def test_reloads_after_delete(self):
+        top_users_engine.refresh()
+        Transaction.objects.filter(user=self.users[6]).delete()
+        self.assertEqual(len(top_users_engine.refresh()), Transaction.objects.count())
+
+    @override_settings(ANALYTICS_ENGINE_ENABLED=True)
+    def test_view_uses_engine(self):
+        top_users_engine.invalidate()
+        params = {'start_date': '2020-12-31', 'end_date': '2021-01-10', 'limit': 3}
+        response = self.client.get(reverse('top-users-by-transaction'), params)
+        with self.settings(ANALYTICS_ENGINE_ENABLED=False):
+            expected = self.client.get(reverse('top-users-by-transaction'), params)
+        self.assertEqual(response.data, expected.data)
+        self.assertEqual(len(response.data), 3)
+
+
+@skipIf(np is None, "NumPy is not installed")
+class BenchmarkTopUsersTests(TestCase):
+    def test_reports_query_timings(self):
+        out = StringIO()
+        call_command('benchmark_top_users', rows=5000, users=100, queries=5, output='/dev/null', stdout=out)
+        self.assertIn('median', out.getvalue())
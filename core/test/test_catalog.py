@@ -0,0 +1,113 @@
+from decimal import Decimal
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.catalog import mask_attributes, parse_mask_name, unit_price
+from core.etl import transform_pharmacy
+from core.models import Mask, Pharmacy
+
+
+class ParseMaskNameTests(SimpleTestCase):
+    def test_brand_color_and_pack_size(self):
+        self.assertEqual(parse_mask_name("True Barrier (green) (3 per pack)"), ("True Barrier", "green", 3))
+        self.assertEqual(parse_mask_name(" MaskT (Black) (10 PER PACK) "), ("MaskT", "black", 10))
+
+    def test_other_names_keep_the_whole_name_as_brand(self):
+        self.assertEqual(parse_mask_name("N95"), ("N95", "", None))
+        self.assertEqual(parse_mask_name("Cotton Kiss (3 per pack)"), ("Cotton Kiss (3 per pack)", "", None))
+        self.assertEqual(parse_mask_name("Smile (blue) (0 per pack)"), ("Smile (blue) (0 per pack)", "", None))
+
+    def test_unit_price(self):
+        self.assertEqual(unit_price(Decimal('10.00'), 3), Decimal('3.3333'))
+        self.assertEqual(unit_price(Decimal('13.70'), None), Decimal('13.7000'))
+        self.assertEqual(mask_attributes("A (red) (4 per pack)", 9), ("A", "red", 4, Decimal('2.2500')))
+
+    def test_transform_pharmacy_emits_attributes(self):
+        _, _, masks, _ = transform_pharmacy({
+            'name': 'Carepoint', 'cashBalance': 10, 'openingHours': '',
+            'masks': [{'name': 'Second Smile (black) (10 per pack)', 'price': 31.98}],
+        })
+        self.assertEqual(masks, [
+            ('Second Smile (black) (10 per pack)', Decimal('31.98'), 'Second Smile', 'black', 10, Decimal('3.1980')),
+        ])
+
+
+class MaskCatalogFieldsTests(APITestCase):
+    def test_save_derives_attributes(self):
+        pharmacy = Pharmacy.objects.create(name="Carepoint", cash_balance=100)
+        mask = Mask.objects.create(pharmacy=pharmacy, name="Masquerade (blue) (6 per pack)", price=Decimal('12.00'))
+        mask.refresh_from_db()
+        self.assertEqual((mask.brand, mask.color, mask.pack_size, mask.unit_price),
+                         ("Masquerade", "blue", 6, Decimal('2.0000')))
+
+        mask.price = Decimal('18.00')
+        mask.save()
+        mask.refresh_from_db()
+        self.assertEqual(mask.unit_price, Decimal('3.0000'))
+
+
+class MaskFacetTests(APITestCase):
+    def setUp(self):
+        self.pharmacy = Pharmacy.objects.create(name="Carepoint", cash_balance=100)
+        other = Pharmacy.objects.create(name="Welltrack", cash_balance=100)
+        for pharmacy, name, price in (
+            (self.pharmacy, "True Barrier (green) (3 per pack)", '9.00'),
+            (self.pharmacy, "True Barrier (blue) (10 per pack)", '20.00'),
+            (self.pharmacy, "MaskT (green) (10 per pack)", '12.00'),
+            (other, "MaskT (black) (6 per pack)", '30.00'),
+            (other, "N95", '4.00'),
+        ):
+            Mask.objects.create(pharmacy=pharmacy, name=name, price=Decimal(price))
+
+    def get(self, params, url=None):
+        response = self.client.get(url or reverse('mask-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_filters(self):
+        data = self.get({'brand': 'True Barrier,MaskT', 'color': 'GREEN'})
+        self.assertEqual([row['name'] for row in data['results']],
+                         ["True Barrier (green) (3 per pack)", "MaskT (green) (10 per pack)"])
+        data = self.get({'pack_size': '6,3'})
+        self.assertEqual([row['pack_size'] for row in data['results']], [3, 6])
+        self.assertNotIn('facets', data)
+
+    def test_facet_counts_skip_their_own_filter(self):
+        data = self.get({'color': 'green', 'facets': 'color,brand,pack_size'})
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['facets']['color'], [
+            {'value': 'green', 'count': 2}, {'value': '', 'count': 1},
+            {'value': 'black', 'count': 1}, {'value': 'blue', 'count': 1},
+        ])
+        self.assertEqual(data['facets']['brand'], [{'value': 'MaskT', 'count': 1}, {'value': 'True Barrier', 'count': 1}])
+        self.assertEqual(data['facets']['pack_size'], [{'value': 3, 'count': 1}, {'value': 10, 'count': 1}])
+
+    def test_pharmacy_masks(self):
+        url = reverse('pharmacy-masks', args=[self.pharmacy.id])
+        data = self.get({'facets': 'brand', 'sort_by': '-unit_price'}, url=url)
+        self.assertEqual([row['unit_price'] for row in data['results']], ['3.0000', '2.0000', '1.2000'])
+        self.assertEqual(data['facets'], {'brand': [{'value': 'True Barrier', 'count': 2}, {'value': 'MaskT', 'count': 1}]})
+        # Without ?facets= the response stays a plain list
+        self.assertEqual(len(self.get({'pack_size': '10'}, url=url)), 2)
+
+    def test_sort_by_unit_price_pages(self):
+        data = self.get({'sort_by': 'unit_price', 'page_size': 3})
+        prices = [row['unit_price'] for row in data['results']]
+        data = self.client.get(data['next']).data
+        prices += [row['unit_price'] for row in data['results']]
+        self.assertEqual(prices, ['1.2000', '2.0000', '3.0000', '4.0000', '5.0000'])
+        # A cursor is tied to the ordering it came from
+        response = self.client.get(data['previous'].replace('sort_by=unit_price', 'sort_by=id'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_streams_with_facet_filters(self):
+        response = self.client.get(reverse('mask-list'), {'stream': 1, 'color': 'green', 'sort_by': 'unit_price'})
+        self.assertEqual(b''.join(response.streaming_content).count(b'"color":"green"'), 2)
+
+    def test_invalid_parameters(self):
+        for params in ({'pack_size': 'ten'}, {'color': ','}, {'facets': 'price'}, {'facets': ''},
+                       {'sort_by': 'price'}, {'facets': 'brand', 'stream': 1}):
+            with self.subTest(params):
+                response = self.client.get(reverse('mask-list'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,53 @@
+from datetime import datetime, time
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from core.fast_serializers import FastSerializer
+from core.models import User, Transaction, Pharmacy, PharmacyOpeningHour, Mask
+from core.serializers import (UserSerializer, PharmacySerializer, PharmacyOpeningHourSerializer,
+                              MaskSerializer, TransactionSerializer)
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(name="Ada Larson", cash_balance=Decimal("12.5"))
+        pharmacy = Pharmacy.objects.create(name="Carepoint", cash_balance=Decimal("593.35"))
+        mask = Mask.objects.create(pharmacy=pharmacy, name="MaskT (black) (10 per pack)", price=Decimal("41"))
+        Transaction.objects.create(
+            user=user, pharmacy=pharmacy, mask=mask, transaction_amount=Decimal("41.00"),
+            transaction_date=timezone.make_aware(datetime(2021, 1, 2, 3, 4, 5, 678901)),
+        )
+        PharmacyOpeningHour.objects.create(pharmacy=pharmacy, day_of_week="Thur", open_time=time(20, 0), close_time=time(2, 0))
+        PharmacyOpeningHour.objects.create(pharmacy=pharmacy, day_of_week="Xyz", open_time=time(8, 0), close_time=time(9, 30))
+
+    def assertSameOutput(self, serializer_class, **kwargs):
+        queryset = serializer_class.Meta.model.objects.order_by('id')
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, **kwargs).data)
+        actual = JSONRenderer().render(FastSerializer(serializer_class(**kwargs)).serialize(queryset))
+        self.assertEqual(actual, expected)
+
+    def test_output_matches_model_serializers(self):
+        for serializer_class in (UserSerializer, PharmacySerializer, PharmacyOpeningHourSerializer,
+                                 MaskSerializer, TransactionSerializer):
+            with self.subTest(serializer_class.__name__):
+                self.assertSameOutput(serializer_class)
+
+    def test_output_matches_with_sparse_fields(self):
+        self.assertSameOutput(TransactionSerializer, fields=['transaction_date', 'mask'])
+
+    def test_reads_only_serializer_columns(self):
+        with self.assertNumQueries(1):
+            rows = FastSerializer(MaskSerializer(fields=['price'])).serialize(Mask.objects.all())
+        self.assertEqual(rows, [{'price': "41.00"}])
+
+
+class BenchmarkSerializersTests(TestCase):
+    def test_reports_both_engines_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_serializers', rows=50, output='/dev/null', stdout=out)
+        self.assertIn('drf.Mask', out.getvalue())
+        self.assertIn('fast.Mask', out.getvalue())
+        self.assertFalse(Mask.objects.exists())
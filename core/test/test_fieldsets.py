@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import User, Transaction, Pharmacy, Mask
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Alice", cash_balance=1000)
+        self.pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        self.mask = Mask.objects.create(pharmacy=self.pharmacy, name="True Barrier (green) (3 per pack)", price=Decimal("13.70"))
+        Transaction.objects.create(
+            user=self.user, pharmacy=self.pharmacy, mask=self.mask,
+            transaction_date=timezone.make_aware(datetime(2021, 1, 5)), transaction_amount=Decimal("13.70"),
+        )
+
+    def test_returns_only_requested_fields(self):
+        response = self.client.get(reverse('mask-list'), {'fields': 'id,name,price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            [{'id': self.mask.id, 'name': "True Barrier (green) (3 per pack)", 'price': "13.70"}],
+        )
+
+    def test_balance_version_is_not_exposed(self):
+        for url in (reverse('user-list'), reverse('pharmacy-list')):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertNotIn('version', response.data['results'][0])
+                response = self.client.get(url, {'fields': 'id,version'})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_selects_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('pharmacy-list'), {'fields': 'name'})
+        self.assertEqual(response.data['results'], [{'name': "Pharmacy One"}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('cash_balance', queries[0]['sql'])
+
+    def test_keeps_pagination_keys_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('transaction-list'), {'fields': 'transaction_amount', 'page_size': 1})
+        self.assertEqual(response.data['results'], [{'transaction_amount': "13.70"}])
+        self.assertEqual(len(queries), 1)  # no deferred loads for the cursor key
+
+    def test_foreign_key_field(self):
+        response = self.client.get(reverse('transaction-list'), {'fields': 'mask,user'})
+        self.assertEqual(response.data['results'], [{'user': self.user.id, 'mask': self.mask.id}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('mask-list'), {'fields': 'id,colour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('colour', str(response.data))
+
+    def test_empty_fields_is_rejected(self):
+        response = self.client.get(reverse('mask-list'), {'fields': ','})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_with_fields(self):
+        response = self.client.get(reverse('mask-list'), {'fields': 'name', 'stream': 1})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [{'name': self.mask.name}])
+
+    def test_unpaginated_views(self):
+        response = self.client.get(reverse('pharmacy-masks', args=[self.pharmacy.id]), {'fields': 'price', 'sort': 'name'})
+        self.assertEqual(response.data, [{'price': "13.70"}])
+
+        response = self.client.get(
+            reverse('top-users-by-transaction'),
+            {'start_date': '2021-01-01', 'end_date': '2021-01-31', 'fields': 'name'},
+        )
+        self.assertEqual(response.data, [{'name': "Alice"}])
@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from core.etl import iter_json_array
+from core.purchases import place_order
+from core.rollups import rebuild_daily_sales, record_sales_between
+from core.models import User, Transaction, Pharmacy, PharmacyOpeningHour, Mask, SourceFingerprint, DailySales
+
+
+def sample_path(name):
+    return os.path.join(settings.BASE_DIR, 'data', name)
+
+
+def load_sample(name):
+    with open(sample_path(name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def write_temp(self, content):
+        f = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8')
+        with f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_matches_json_load_with_tiny_chunks(self):
+        path = sample_path('users.json')
+        with open(path, encoding='utf-8') as f:
+            expected = json.load(f, parse_float=Decimal)
+
+        self.assertEqual(list(iter_json_array(path, chunk_size=7)), expected)
+
+    def test_empty_array(self):
+        path = self.write_temp(' [ ] ')
+        self.assertEqual(list(iter_json_array(path)), [])
+
+    def test_rejects_non_array(self):
+        path = self.write_temp('{"name": "x"}')
+        with self.assertRaises(ValueError):
+            list(iter_json_array(path))
+
+    def test_truncated_file_raises(self):
+        path = self.write_temp('[{"name": "a"}, {"name": ')
+        with self.assertRaises(ValueError):
+            list(iter_json_array(path, chunk_size=4))
+
+
+class LoadInitialDataTests(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('load_initial_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_loads_every_row(self):
+        pharmacies = load_sample('pharmacies.json')
+        users = load_sample('users.json')
+
+        self.run_command()
+
+        self.assertEqual(Pharmacy.objects.count(), len(pharmacies))
+        self.assertEqual(Mask.objects.count(), sum(len(p['masks']) for p in pharmacies))
+        self.assertEqual(User.objects.count(), len(users))
+        self.assertEqual(Transaction.objects.count(), sum(len(u['purchaseHistories']) for u in users))
+        self.assertTrue(PharmacyOpeningHour.objects.exists())
+
+    def test_small_batches_respect_foreign_keys(self):
+        self.run_command('--batch-size', '3')
+
+        transaction = Transaction.objects.select_related('mask', 'pharmacy').order_by('id').first()
+        self.assertEqual(transaction.mask.pharmacy_id, transaction.pharmacy_id)
+        self.assertEqual(Transaction.objects.count(), 100)
+
+    def test_transactions_resolve_names(self):
+        self.run_command()
+
+        user = load_sample('users.json')[0]
+        history = user['purchaseHistories'][0]
+        transaction = Transaction.objects.filter(user__name=user['name']).order_by('id').first()
+        self.assertEqual(transaction.pharmacy.name, history['pharmacyName'])
+        self.assertEqual(transaction.mask.name, history['maskName'])
+
+    def test_reports_rows_per_second(self):
+        output = self.run_command()
+        self.assertIn('Transaction: 100 rows', output)
+        self.assertIn('rows/s', output)
+
+    def test_fills_daily_sales(self):
+        self.run_command()
+
+        totals = DailySales.objects.aggregate(count=Sum('transaction_count'), amount=Sum('transaction_amount'))
+        self.assertEqual(totals['count'], Transaction.objects.count())
+        self.assertEqual(totals['amount'], Transaction.objects.aggregate(amount=Sum('transaction_amount'))['amount'])
+
+    def test_native_backend_matches_orm_rows(self):
+        columns = ('id', 'user_id', 'pharmacy_id', 'mask_id', 'transaction_date', 'transaction_amount')
+        self.run_command()
+        expected = list(Transaction.objects.order_by('id').values_list(*columns))
+        Pharmacy.objects.all().delete()
+        User.objects.all().delete()
+
+        output = self.run_command('--backend', 'native', '--batch-size', '7')
+
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list(*columns)), expected)
+        self.assertIn('Transaction: 100 rows', output)
+
+    def test_native_backend_keeps_foreign_key_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command('--backend', 'native')
+        dropped = ' '.join(query['sql'] for query in queries if query['sql'].startswith('DROP INDEX'))
+        self.assertIn('transaction_date_id_idx', dropped)
+        self.assertNotIn('transaction_user_date_idx', dropped)
+        self.assertNotIn('transaction_pharmacy_date_idx', dropped)
+
+    def test_native_backend_cannot_sync(self):
+        with self.assertRaises(CommandError):
+            self.run_command('--backend', 'native', '--sync')
+
+    def test_worker_pool_matches_in_process_load(self):
+        self.run_command()
+        expected = list(Transaction.objects.order_by('id').values_list(
+            'user__name', 'pharmacy__name', 'mask__name', 'transaction_date', 'transaction_amount'))
+        Pharmacy.objects.all().delete()
+        User.objects.all().delete()
+
+        self.run_command('--workers', '2', '--batch-size', '4')
+
+        actual = list(Transaction.objects.order_by('id').values_list(
+            'user__name', 'pharmacy__name', 'mask__name', 'transaction_date', 'transaction_amount'))
+        self.assertEqual(actual, expected)
+
+
+class LoadInitialDataSyncTests(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('load_initial_data', '--sync', *args, stdout=out)
+        return out.getvalue()
+
+    def test_second_sync_touches_nothing(self):
+        self.run_command()
+        counts = (Pharmacy.objects.count(), Mask.objects.count(), User.objects.count(), Transaction.objects.count())
+
+        output = self.run_command()
+
+        self.assertEqual(
+            (Pharmacy.objects.count(), Mask.objects.count(), User.objects.count(), Transaction.objects.count()),
+            counts,
+        )
+        self.assertIn('Transaction: 0 rows', output)
+        self.assertIn('Purchase history entry: 0 new, 0 changed, 100 unchanged', output)
+
+    def test_sync_updates_changed_records_only(self):
+        self.run_command()
+        pharmacy = Pharmacy.objects.get(name='DFW Wellness')
+        user = User.objects.order_by('id').first()
+        Pharmacy.objects.filter(id=pharmacy.id).update(cash_balance=0)
+        User.objects.filter(id=user.id).update(cash_balance=0)
+        # Simulate a changed source record by forgetting its content hash
+        SourceFingerprint.objects.filter(kind=SourceFingerprint.PHARMACY, object_id=pharmacy.id).update(digest='stale')
+
+        output = self.run_command()
+
+        pharmacy.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(pharmacy.cash_balance, Decimal('328.41'))
+        self.assertEqual(user.cash_balance, 0)  # unchanged in the source, so not touched
+        self.assertEqual(pharmacy.opening_hours.count(), 5)
+        self.assertIn('Pharmacy: 0 new, 1 changed, 19 unchanged', output)
+
+    def test_sync_inserts_only_new_transactions(self):
+        self.run_command()
+        purchase = SourceFingerprint.objects.filter(kind=SourceFingerprint.PURCHASE).order_by('id').first()
+        Transaction.objects.filter(id=purchase.object_id).delete()
+        purchase.delete()
+
+        output = self.run_command()
+
+        self.assertEqual(Transaction.objects.count(), 100)
+        self.assertEqual(User.objects.count(), 20)
+        # Only the re-inserted transaction is rolled up, and the rollup still
+        # matches a full rebuild
+        self.assertIn('DailySales: 1 transactions added', output)
+        rollup = sorted(DailySales.objects.values_list('date', 'user_id', 'pharmacy_id', 'transaction_count', 'transaction_amount'))
+        rebuild_daily_sales()
+        self.assertEqual(
+            sorted(DailySales.objects.values_list('date', 'user_id', 'pharmacy_id', 'transaction_count', 'transaction_amount')),
+            rollup,
+        )
+
+    def test_sync_continues_ids_past_concurrent_purchases(self):
+        self.run_command()
+        # The sync writes the first and last purchase entries again, in different batches
+        purchases = SourceFingerprint.objects.filter(kind=SourceFingerprint.PURCHASE).order_by('id')
+        for purchase in (purchases.first(), purchases.last()):
+            Transaction.objects.filter(id=purchase.object_id).delete()
+            purchase.delete()
+        user, mask = User.objects.order_by('id').first(), Mask.objects.order_by('id').first()
+        User.objects.filter(id=user.id).update(cash_balance=1000)
+        purchased = []
+
+        def purchase_meanwhile(first_id, end_id, batch_size):
+            if not purchased:
+                purchased.extend(place_order(user.id, [(mask.pharmacy_id, mask.id, 1)]))
+            return record_sales_between(first_id, end_id, batch_size)
+
+        with mock.patch('core.management.commands.load_initial_data.record_sales_between', side_effect=purchase_meanwhile):
+            output = self.run_command('--batch-size', '4')
+
+        self.assertEqual(Transaction.objects.count(), 101)
+        self.assertIn('DailySales: 2 transactions added', output)
+        # The purchase is rolled up once, by place_order()
+        rollup = sorted(DailySales.objects.values_list('date', 'user_id', 'pharmacy_id', 'transaction_count', 'transaction_amount'))
+        rebuild_daily_sales()
+        self.assertEqual(
+            sorted(DailySales.objects.values_list('date', 'user_id', 'pharmacy_id', 'transaction_count', 'transaction_amount')),
+            rollup,
+        )
+
+    def test_refuses_database_loaded_without_fingerprints(self):
+        call_command('load_initial_data', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            self.run_command()
+
+
+class GenerateDatasetTests(TestCase):
+    def test_generated_dataset_loads(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command(
+            'generate_dataset', '--output-dir', output_dir, '--pharmacies', '30',
+            '--users', '40', '--transactions', '250', '--seed', '7', stdout=StringIO(),
+        )
+
+        call_command('load_initial_data', '--data-dir', output_dir, stdout=StringIO())
+
+        self.assertEqual(Pharmacy.objects.count(), 30)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Transaction.objects.count(), 250)
+        self.assertTrue(PharmacyOpeningHour.objects.exists())
+
+    def test_same_seed_is_reproducible(self):
+        contents = []
+        for _ in range(2):
+            output_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, output_dir)
+            call_command('generate_dataset', '--output-dir', output_dir, '--pharmacies', '5',
+                         '--users', '5', '--transactions', '20', stdout=StringIO())
+            with open(os.path.join(output_dir, 'users.json'), encoding='utf-8') as f:
+                contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
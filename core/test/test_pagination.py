@@ -0,0 +1,147 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import User, Transaction, Pharmacy, Mask
+
+
+@override_settings(API_PAGE_SIZE=3, API_MAX_PAGE_SIZE=5)
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Alice", cash_balance=1000)
+        self.pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        self.masks = [
+            Mask.objects.create(pharmacy=self.pharmacy, name=f"Mask {i}", price=Decimal("5.00"))
+            for i in range(8)
+        ]
+        start = timezone.make_aware(datetime(2021, 1, 1, 12, 0, 0, 123456))
+        # Several transactions share a date, so the id breaks ties; dates
+        # descend while ids ascend.
+        for i in range(10):
+            Transaction.objects.create(
+                user=self.user, pharmacy=self.pharmacy, mask=self.masks[0],
+                transaction_date=start - timedelta(days=i // 3), transaction_amount=Decimal("5.00"),
+            )
+
+    def walk(self, url, params=None):
+        pages = []
+        response = self.client.get(url, params or {})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_default_page_size_and_links(self):
+        response = self.client.get(reverse('mask-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['id'] for m in response.data['results']], [m.id for m in self.masks[:3]])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_walks_every_row_once_in_id_order(self):
+        pages = self.walk(reverse('mask-list'))
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 2])
+        self.assertEqual([m['id'] for page in pages for m in page['results']], [m.id for m in self.masks])
+
+    def test_transactions_ordered_by_date_then_id(self):
+        pages = self.walk(reverse('transaction-list'))
+        ids = [t['id'] for page in pages for t in page['results']]
+        expected = list(Transaction.objects.order_by('transaction_date', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get(reverse('transaction-list')).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('mask-list'), {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIn('page_size=100', response.data['next'])
+
+    def test_invalid_page_size(self):
+        response = self.client.get(reverse('mask-list'), {'page_size': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('transaction-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        def cursor(key):
+            return base64.urlsafe_b64encode(json.dumps({'k': key, 'r': 0}).encode()).decode()
+
+        for url, params, key in (
+            (reverse('mask-list'), {}, ['abc']),
+            (reverse('mask-list'), {}, [None]),
+            (reverse('mask-list'), {'sort_by': 'unit_price'}, ['abc', 1]),
+            (reverse('transaction-list'), {}, ['abc', 1]),
+            (reverse('transaction-list'), {}, [None, None]),
+            (reverse('transaction-list'), {}, [{}, []]),
+        ):
+            with self.subTest(url=url, key=key):
+                response = self.client.get(url, {**params, 'cursor': cursor(key)})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_empty_table(self):
+        Transaction.objects.all().delete()
+        response = self.client.get(reverse('transaction-list'))
+        self.assertEqual(response.data, {'next': None, 'previous': None, 'results': []})
+
+
+@override_settings(API_STREAM_CHUNK_SIZE=4)
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create(name="Alice", cash_balance=1000)
+        pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        mask = Mask.objects.create(pharmacy=pharmacy, name="Mask", price=Decimal("5.00"))
+        start = timezone.make_aware(datetime(2021, 1, 1))
+        for i in range(9):
+            Transaction.objects.create(
+                user=user, pharmacy=pharmacy, mask=mask,
+                transaction_date=start - timedelta(hours=i // 2), transaction_amount=Decimal("5.50"),
+            )
+
+    def stream(self, url):
+        response = self.client.get(url, {'stream': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_streams_every_row_as_paginated_serializer_would(self):
+        rows = self.stream(reverse('transaction-list'))
+
+        expected = []
+        response = self.client.get(reverse('transaction-list'), {'page_size': 4})
+        while True:
+            expected.extend(json.loads(response.content)['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(rows, expected)
+        self.assertEqual(len(rows), 9)
+
+    def test_reads_in_keyset_batches(self):
+        response = self.client.get(reverse('transaction-list'), {'stream': 1})
+        with self.assertNumQueries(3):  # 4 + 4 + 1 rows
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(json.loads(content)), 9)
+
+    def test_empty_table(self):
+        Transaction.objects.all().delete()
+        self.assertEqual(self.stream(reverse('transaction-list')), [])
+
+    def test_other_list_endpoints(self):
+        self.assertEqual([m['name'] for m in self.stream(reverse('mask-list'))], ["Mask"])
+        self.assertEqual(len(self.stream(reverse('user-list'))), 1)
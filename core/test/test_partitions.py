@@ -0,0 +1,153 @@
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core import partitions
+from core.models import User, Pharmacy, Mask, Transaction
+
+
+class PartitionPlanTests(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(partitions.add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(partitions.months_between(date(2024, 11, 20), date(2025, 1, 1)),
+                         [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)])
+
+    def test_partition_names(self):
+        self.assertEqual(partitions.partition_name(date(2024, 3, 1)), 'p202403')
+        self.assertEqual(partitions.partition_month('p202403'), date(2024, 3, 1))
+        self.assertIsNone(partitions.partition_month(partitions.FUTURE))
+
+    def test_creates_months_ahead(self):
+        create, expire = partitions.plan(['p202405', 'p202406', 'pfuture'], date(2024, 6, 15), ahead=2)
+        self.assertEqual(create, [date(2024, 7, 1), date(2024, 8, 1)])
+        self.assertEqual(expire, [])
+
+    def test_nothing_to_do_when_current(self):
+        self.assertEqual(partitions.plan(['p202406', 'p202407', 'pfuture'], date(2024, 6, 1), ahead=1), ([], []))
+
+    def test_fills_months_missed_by_late_maintenance(self):
+        create, _ = partitions.plan(['p202401', 'pfuture'], date(2024, 4, 2), ahead=0)
+        self.assertEqual(create, [date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1)])
+
+    def test_expires_months_outside_retention(self):
+        existing = ['p202401', 'p202402', 'p202403', 'p202404', 'pfuture']
+        _, expire = partitions.plan(existing, date(2024, 4, 30), ahead=0, retain=2)
+        self.assertEqual(expire, [date(2024, 1, 1), date(2024, 2, 1)])
+
+    def test_enable_sql(self):
+        statements = partitions.enable_sql('core_transaction', ['fk_user'], [date(2024, 1, 1), date(2024, 2, 1)])
+        self.assertEqual(statements, [
+            "ALTER TABLE core_transaction DROP FOREIGN KEY fk_user",
+            "ALTER TABLE core_transaction DROP PRIMARY KEY, ADD PRIMARY KEY (id, transaction_date)",
+            "ALTER TABLE core_transaction PARTITION BY RANGE COLUMNS(transaction_date) ("
+            "PARTITION p202401 VALUES LESS THAN ('2024-02-01 00:00:00'), "
+            "PARTITION p202402 VALUES LESS THAN ('2024-03-01 00:00:00'), "
+            "PARTITION pfuture VALUES LESS THAN (MAXVALUE))",
+        ])
+
+    def test_disable_sql(self):
+        statements = partitions.disable_sql('core_transaction', ["ALTER TABLE core_transaction ADD CONSTRAINT fk_user"])
+        self.assertEqual(statements, [
+            "ALTER TABLE core_transaction REMOVE PARTITIONING",
+            "ALTER TABLE core_transaction DROP PRIMARY KEY, ADD PRIMARY KEY (id)",
+            "ALTER TABLE core_transaction ADD CONSTRAINT fk_user",
+        ])
+
+    def test_create_splits_future_partition(self):
+        self.assertEqual(partitions.create_sql('t', []), [])
+        self.assertEqual(partitions.create_sql('t', [date(2024, 12, 1)]), [
+            "ALTER TABLE t REORGANIZE PARTITION pfuture INTO ("
+            "PARTITION p202412 VALUES LESS THAN ('2025-01-01 00:00:00'), "
+            "PARTITION pfuture VALUES LESS THAN (MAXVALUE))",
+        ])
+
+    def test_expire_sql(self):
+        months = [date(2024, 1, 1), date(2024, 2, 1)]
+        self.assertEqual(partitions.expire_sql('t', months), ["ALTER TABLE t DROP PARTITION p202401, p202402"])
+        archived = partitions.expire_sql('t', months[:1], archive=True)
+        self.assertEqual(archived, [
+            "CREATE TABLE t_p202401 LIKE t",
+            "ALTER TABLE t_p202401 REMOVE PARTITIONING",
+            "ALTER TABLE t EXCHANGE PARTITION p202401 WITH TABLE t_p202401",
+            "ALTER TABLE t DROP PARTITION p202401",
+        ])
+
+
+class PartitionCommandTests(TestCase):
+    def test_rejects_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_transactions', ahead=-1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('partition_transactions', retain=0, stdout=StringIO())
+
+    def test_rejects_enable_with_disable(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_transactions', '--enable', '--disable', stdout=StringIO())
+
+    def test_knows_unapplied_migrations(self):
+        self.assertEqual(partitions.unapplied_migrations(), [])
+
+    @skipIf(connection.vendor != 'mysql', "MySQL only")
+    def test_enable_needs_every_core_migration_applied(self):
+        with mock.patch('core.partitions.unapplied_migrations', return_value=['0016_transaction_note']):
+            with self.assertRaisesMessage(CommandError, '0016_transaction_note'):
+                call_command('partition_transactions', '--enable', '--dry-run', stdout=StringIO())
+
+    @skipIf(connection.vendor != 'mysql', "MySQL only")
+    def test_migrate_refuses_a_partitioned_table(self):
+        plan = [(mock.Mock(app_label='core'), False)]
+        with mock.patch('core.partitions.existing_partitions', return_value=['p202401', 'pfuture']):
+            with self.assertRaisesMessage(CommandError, '--disable'):
+                partitions.refuse_partitioned_migrate(sender=None, plan=plan)
+        partitions.refuse_partitioned_migrate(sender=None, plan=plan)  # not partitioned
+
+    @skipIf(connection.vendor == 'mysql', "only databases without partitioning")
+    def test_single_table_elsewhere(self):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('partition_transactions', '--enable', stdout=out)
+        self.assertIn('single table', out.getvalue())
+        self.assertEqual(len(queries), 0)
+
+
+class DateRangePruningTests(TestCase):
+    """The date-range endpoints compare the bare partitioning column, which is what lets MySQL prune."""
+
+    def setUp(self):
+        user = User.objects.create(name="Alice", cash_balance=100)
+        pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        mask = Mask.objects.create(pharmacy=pharmacy, name="Mask", price=Decimal("5.00"))
+        Transaction.objects.create(
+            user=user, pharmacy=pharmacy, mask=mask, transaction_amount=Decimal("5.00"),
+            transaction_date=timezone.make_aware(datetime(2021, 1, 2, 10)),
+        )
+
+    def assertPrunable(self, name):
+        params = {'start_date': '2021-01-01', 'end_date': '2021-01-05'}
+        table = Transaction._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse(name), params).status_code, 200)
+        reads = [query['sql'] for query in queries if f'FROM "{table}"' in query['sql'] or f'FROM `{table}`' in query['sql']]
+        self.assertTrue(reads)
+        for sql in reads:
+            where = sql.split('WHERE', 1)[1]
+            self.assertRegex(where, r'["`]transaction_date["`] (BETWEEN|>=|<=|<)')
+            self.assertNotRegex(where, r'\w+\([^)]*transaction_date')
+
+    @override_settings(SALES_ROLLUP_ENABLED=False)
+    def test_transactions_summary(self):
+        self.assertPrunable('transactions-summary')
+
+    @override_settings(SALES_ROLLUP_ENABLED=False)
+    def test_top_users(self):
+        self.assertPrunable('top-users-by-transaction')
+
+    def test_rollup_partial_days(self):
+        self.assertPrunable('top-users-by-transaction')
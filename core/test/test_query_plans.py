@@ -0,0 +1,187 @@
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.models import User, Pharmacy, PharmacyOpeningHour, Mask, Transaction
+from core.schedule import MINUTES_PER_DAY
+
+
+def plan_problems(sql):
+    """
+    EXPLAIN ``sql`` and return its full table scans as ('scan', table) and
+    its sorts that no index provides as ('sort', table or None).
+    """
+    problems = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql)
+            columns = [column[0].lower() for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                if row['type'] == 'ALL':
+                    problems.append(('scan', row['table']))
+                if 'Using filesort' in (row['extra'] or ''):
+                    problems.append(('sort', row['table']))
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                # 'SCAN t USING [COVERING] INDEX i' walks an index in order
+                scan = re.match(r'SCAN (\S+)$', detail)
+                if scan:
+                    problems.append(('scan', scan.group(1)))
+                if 'USE TEMP B-TREE' in detail:
+                    problems.append(('sort', None))
+    return problems
+
+
+class OpeningHourQueryPlanTests(TestCase):
+    def setUp(self):
+        pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        for day in ('Mon', 'Tue', 'Wed', 'Thur', 'Fri'):
+            PharmacyOpeningHour.objects.create(
+                pharmacy=pharmacy, day_of_week=day, open_time=time(9, 0), close_time=time(18, 0)
+            )
+
+    def test_minutes_are_stored(self):
+        hour = PharmacyOpeningHour.objects.get(day_of_week='Thur')
+        self.assertEqual((hour.start_minute, hour.end_minute), (3 * MINUTES_PER_DAY + 540, 3 * MINUTES_PER_DAY + 1080))
+
+    def test_open_at_query_uses_minutes_index(self):
+        minute = MINUTES_PER_DAY + 600  # Tue 10:00
+        queryset = Pharmacy.objects.filter(
+            opening_hours__start_minute__range=(minute - MINUTES_PER_DAY, minute),
+            opening_hours__end_minute__gte=minute,
+        ).distinct()
+        self.assertIn('opening_hour_minutes_idx', queryset.explain())
+
+    def test_open_at_query_with_week_wrap_uses_minutes_index(self):
+        minute = 60  # Mon 01:00, also reachable from Sunday night
+        queryset = PharmacyOpeningHour.objects.filter(
+            Q(start_minute__range=(minute - MINUTES_PER_DAY, minute), end_minute__gte=minute)
+            | Q(start_minute__range=(minute + 6 * MINUTES_PER_DAY, minute + 7 * MINUTES_PER_DAY),
+                end_minute__gte=minute + 7 * MINUTES_PER_DAY)
+        ).values('pharmacy_id')
+        self.assertIn('opening_hour_minutes_idx', queryset.explain())
+
+
+class TransactionPaginationQueryPlanTests(TestCase):
+    def test_keyset_page_uses_date_id_index(self):
+        queryset = Transaction.objects.filter(
+            Q(transaction_date__gt='2021-01-01T00:00:00+00:00')
+            | Q(transaction_date='2021-01-01T00:00:00+00:00', id__gt=10)
+        ).order_by('transaction_date', 'id')[:101]
+        self.assertIn('transaction_date_id_idx', queryset.explain())
+
+
+class MaskCountQueryPlanTests(TestCase):
+    def test_single_query_uses_pharmacy_price_index(self):
+        queryset = Pharmacy.objects.with_mask_count(Decimal('5'), Decimal('10')).filter(mask_count__lt=2)
+        plan = queryset.explain()
+        self.assertIn('mask_pharmacy_price_idx', plan)
+        self.assertNotIn('IN (SELECT', str(queryset.query))
+        self.assertIn('LEFT OUTER JOIN', str(queryset.query))
+        self.assertIn('HAVING', str(queryset.query))
+
+
+class EndpointQueryPlanTests(TestCase):
+    """
+    Runs each endpoint and EXPLAINs every query it made, failing on full
+    table scans and on sorts no index provides unless the endpoint is
+    expected to need them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name="Alice", cash_balance=1000)
+        cls.pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        masks = [
+            Mask.objects.create(pharmacy=cls.pharmacy, name=f"Mask {i} (blue) ({i + 1} per pack)", price=Decimal(i + 1))
+            for i in range(5)
+        ]
+        PharmacyOpeningHour.objects.create(
+            pharmacy=cls.pharmacy, day_of_week='Mon', open_time=time(9, 0), close_time=time(18, 0)
+        )
+        start = timezone.make_aware(datetime(2021, 1, 1))
+        for i in range(5):
+            Transaction.objects.create(
+                user=cls.user, pharmacy=cls.pharmacy, mask=masks[i],
+                transaction_date=start + timedelta(days=i), transaction_amount=Decimal(i + 1),
+            )
+
+    def assertIndexedPlan(self, url, params=None, allow_scan=(), allow_sort=False):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+
+        selects = [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, f"{url} made no queries")
+        for sql in selects:
+            problems = [
+                problem for problem in plan_problems(sql)
+                if not (problem[0] == 'scan' and problem[1] in allow_scan)
+                and not (problem[0] == 'sort' and allow_sort)
+            ]
+            self.assertEqual(problems, [], f"{url}: {sql}")
+        return response
+
+    def test_harness_flags_scans_and_sorts(self):
+        sql, params = User.objects.order_by('name').query.sql_with_params()
+        problems = plan_problems(sql % params if params else sql)
+        self.assertIn(('scan', 'core_user'), problems)
+        self.assertEqual([kind for kind, _ in problems].count('sort'), 1)
+
+    def test_pharmacy_masks_sorted_by_name_and_price(self):
+        url = reverse('pharmacy-masks', args=[self.pharmacy.id])
+        for sort_by in ('name', '-name', 'price', '-price', 'unit_price', '-unit_price'):
+            with self.subTest(sort_by):
+                self.assertIndexedPlan(url, {'sort_by': sort_by})
+
+    def test_mask_facets(self):
+        # Counts group the rows each facet's index range returns
+        url = reverse('mask-list')
+        self.assertIndexedPlan(url, {'facets': 'pack_size', 'pack_size': '1,2'}, allow_sort=True)
+        self.assertIndexedPlan(url, {'facets': 'color', 'color': 'blue', 'brand': 'Mask 1'}, allow_sort=True)
+        self.assertIndexedPlan(url, {'color': 'blue', 'pack_size': '3'}, allow_sort=True)
+
+    def test_masks_sorted_by_unit_price(self):
+        response = self.assertIndexedPlan(reverse('mask-list'), {'sort_by': 'unit_price', 'page_size': 1}, allow_scan={'core_mask'})
+        self.assertIndexedPlan(response.data['next'])
+
+    def test_transactions_summary(self):
+        self.assertIndexedPlan(reverse('transactions-summary'), {'start_date': '2021-01-01', 'end_date': '2021-01-03'})
+
+    def test_top_users(self):
+        # Ranking by a per-user sum has to group and sort the matching rows
+        self.assertIndexedPlan(
+            reverse('top-users-by-transaction'), {'start_date': '2021-01-01', 'end_date': '2021-01-03'},
+            allow_sort=True,
+        )
+
+    def test_mask_count_filter(self):
+        # Every pharmacy is a candidate (zero counts included); masks are probed by index
+        self.assertIndexedPlan(
+            reverse('pharmacies-mask-count-filter'),
+            {'min_price': '2', 'max_price': '4', 'compare': 'lt', 'count': '2'},
+            allow_scan={'core_pharmacy'},
+        )
+
+    @override_settings(OPEN_HOURS_INDEX_ENABLED=False)
+    def test_pharmacies_open_range_scan(self):
+        # DISTINCT over the joined opening hours
+        self.assertIndexedPlan(reverse('pharmacies-open'), {'day': 'Mon', 'time': '10:00'}, allow_sort=True)
+
+    def test_list_pages_after_a_cursor(self):
+        for name, table in (('user-list', 'core_user'), ('pharmacy-list', 'core_pharmacy'),
+                            ('pharmacy-opening-hour-list', 'core_pharmacyopeninghour'),
+                            ('mask-list', 'core_mask'), ('transaction-list', 'core_transaction')):
+            with self.subTest(name):
+                # The first page reads the table in primary key order up to the LIMIT
+                response = self.assertIndexedPlan(reverse(name), {'page_size': 1}, allow_scan={table})
+                if response.data['next']:
+                    self.assertIndexedPlan(response.data['next'])
@@ -0,0 +1,115 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from core.models import User, Transaction, Pharmacy, Mask, DailySales
+from core.rollups import (raw_sales_summary, raw_top_user_totals, rebuild_daily_sales, record_sales_bulk,
+                          sales_summary, split_range, top_user_totals)
+
+
+def rollup_rows():
+    return sorted(DailySales.objects.values_list(
+        'date', 'user_id', 'pharmacy_id', 'transaction_count', 'transaction_amount'
+    ))
+
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.users = [User.objects.create(name=f"User {i}", cash_balance=1000) for i in range(6)]
+        self.pharmacies = [Pharmacy.objects.create(name=f"Pharmacy {i}", cash_balance=1000) for i in range(3)]
+        masks = [Mask.objects.create(pharmacy=pharmacy, name="Mask", price=Decimal("5.00")) for pharmacy in self.pharmacies]
+        self.start = timezone.make_aware(datetime(2021, 1, 1))
+        for _ in range(200):
+            index = rng.randrange(3)
+            Transaction.objects.create(
+                user=rng.choice(self.users), pharmacy=self.pharmacies[index], mask=masks[index],
+                transaction_amount=Decimal(rng.randrange(1, 5000)) / 100,
+                transaction_date=self.start + timedelta(minutes=rng.randrange(20 * 24 * 60)),
+            )
+        # Exactly on midnight, the inclusive end of a parse_date_param range
+        Transaction.objects.create(
+            user=self.users[0], pharmacy=self.pharmacies[0], mask=masks[0],
+            transaction_amount=Decimal("9.99"), transaction_date=self.start + timedelta(days=5),
+        )
+
+    def ranges(self):
+        yield self.start + timedelta(days=1), self.start + timedelta(days=5)  # whole days
+        yield self.start + timedelta(hours=30, minutes=7), self.start + timedelta(days=12, hours=3)
+        yield self.start + timedelta(hours=5), self.start + timedelta(hours=20)  # within one day
+        yield self.start - timedelta(days=3), self.start + timedelta(days=30)
+        yield self.start + timedelta(days=6), self.start + timedelta(days=2)  # reversed
+
+    def test_split_range(self):
+        first_day, last_day, _ = split_range(self.start + timedelta(hours=1), self.start + timedelta(days=3))
+        self.assertEqual((first_day.day, last_day.day), (2, 3))
+        first_day, last_day, _ = split_range(self.start, self.start + timedelta(days=1))
+        self.assertEqual((first_day.day, last_day.day), (1, 1))
+        self.assertEqual(split_range(self.start, self.start + timedelta(hours=23))[:2], (None, None))
+
+    def test_summary_matches_raw(self):
+        for start, end in self.ranges():
+            with self.subTest(start=start, end=end):
+                self.assertEqual(sales_summary(start, end), raw_sales_summary(start, end))
+
+    def test_top_users_match_raw(self):
+        for start, end in self.ranges():
+            for limit in (1, 3, 10):
+                with self.subTest(start=start, end=end, limit=limit):
+                    self.assertEqual(top_user_totals(start, end, limit), raw_top_user_totals(start, end, limit))
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        transaction = Transaction.objects.order_by('id').first()
+        transaction.transaction_amount += 1
+        transaction.transaction_date += timedelta(days=2)
+        transaction.save()
+        Transaction.objects.order_by('-id').first().delete()
+
+        incremental = rollup_rows()
+        rebuild_daily_sales(batch_size=7)
+        self.assertEqual(rollup_rows(), incremental)
+        self.assertEqual(sum(row[3] for row in incremental), Transaction.objects.count())
+
+    def test_bulk_recording_matches_rebuild(self):
+        # New transactions on days that already have rows and on new days
+        masks = list(Mask.objects.order_by('pharmacy_id'))
+        created = Transaction.objects.bulk_create([
+            Transaction(user=user, pharmacy=mask.pharmacy, mask=mask, transaction_amount=Decimal("1.25"),
+                        transaction_date=self.start + timedelta(days=day, hours=12))
+            for user in self.users for mask in masks for day in (3, 40)
+        ])
+        record_sales_bulk(created, batch_size=5)
+
+        incremental = rollup_rows()
+        rebuild_daily_sales()
+        self.assertEqual(rollup_rows(), incremental)
+
+
+class PurchaseRollupTests(APITestCase):
+    def test_purchase_updates_rollup(self):
+        user = User.objects.create(name="Buyer", cash_balance=Decimal("100.00"))
+        pharmacy = Pharmacy.objects.create(name="Pharmacy", cash_balance=Decimal("0.00"))
+        mask = Mask.objects.create(pharmacy=pharmacy, name="Mask", price=Decimal("2.50"))
+
+        response = self.client.post(reverse('purchase'), {
+            'user_id': user.id,
+            'purchases': [{'pharmacy_id': pharmacy.id, 'mask_id': mask.id, 'quantity': 2}] * 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        rollup = DailySales.objects.get(user=user, pharmacy=pharmacy, date=timezone.localdate())
+        self.assertEqual((rollup.transaction_count, rollup.transaction_amount), (2, Decimal("10.00")))
+
+    def test_failed_purchase_leaves_rollup_unchanged(self):
+        user = User.objects.create(name="Buyer", cash_balance=Decimal("1.00"))
+        pharmacy = Pharmacy.objects.create(name="Pharmacy", cash_balance=Decimal("0.00"))
+        mask = Mask.objects.create(pharmacy=pharmacy, name="Mask", price=Decimal("2.50"))
+
+        response = self.client.post(reverse('purchase'), {
+            'user_id': user.id, 'purchases': [{'pharmacy_id': pharmacy.id, 'mask_id': mask.id, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DailySales.objects.exists())
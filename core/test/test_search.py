@@ -0,0 +1,199 @@
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from core import fulltext
+from core.models import Mask, Pharmacy
+from core.search import (SearchIndex, get_search_backend, mask_search_index, pharmacy_search_index,
+                         tokenize, trigrams)
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize("True Barrier (green) (3 per pack)"), ['true', 'barrier', 'green', '3', 'per', 'pack'])
+        self.assertEqual(tokenize("ÄRZTE-Maske"), ['ärzte', 'maske'])
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('mask'), {'mas', 'ask'})
+        self.assertEqual(trigrams('ab'), set())
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        names = [
+            "True Barrier (green) (3 per pack)",
+            "True Barrier (blue) (10 per pack)",
+            "MaskT (black) (10 per pack)",
+            "Second Smile (black) (6 per pack)",
+            "MaskT",
+            "True Barrier (green) (3 per pack)",
+        ]
+        self.masks = [Mask.objects.create(pharmacy=self.pharmacy, name=name, price=Decimal("5.00")) for name in names]
+        self.index = SearchIndex(Mask)
+
+    def ids(self, query, limit=10):
+        return [object_id for object_id, _ in self.index.search(query, limit)]
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.ids("barrier green"), [self.masks[0].id, self.masks[5].id])
+        self.assertEqual(self.ids("barrier smile"), [])
+
+    def test_exact_beats_prefix_beats_infix(self):
+        index = SearchIndex(Mask)
+        pharmacy = Pharmacy.objects.create(name="Other", cash_balance=0)
+        exact, prefix, infix = (
+            Mask.objects.create(pharmacy=pharmacy, name=name, price=1)
+            for name in ("Black Tie", "Blackout Tie", "Jetblack Tie")
+        )
+        hits = [(object_id, score) for object_id, score in index.search("black", 10)
+                if object_id in (exact.id, prefix.id, infix.id)]
+        self.assertEqual([object_id for object_id, _ in hits], [exact.id, prefix.id, infix.id])
+
+    def test_whole_name_boost(self):
+        # "MaskT" alone ranks above longer names containing the same token
+        self.assertEqual(self.ids("maskt")[0], self.masks[4].id)
+
+    def test_infix_needs_three_characters(self):
+        self.assertEqual(self.ids("kt"), [])
+        self.assertEqual(set(self.ids("skt")), {self.masks[2].id, self.masks[4].id})
+
+    def test_ties_are_ordered_by_id_and_limited(self):
+        hits = self.index.search("true barrier green", 1)
+        self.assertEqual([object_id for object_id, _ in hits], [self.masks[0].id])
+        self.assertEqual(self.ids("per pack"), sorted(self.ids("per pack"), key=lambda object_id: (
+            -dict(self.index.search("per pack", 10))[object_id], object_id)))
+
+    def test_add_and_remove(self):
+        self.index.search("mask", 1)  # build
+        self.index.add(self.masks[3].id, "Cotton Kiss (blue) (3 per pack)")
+        self.assertEqual(self.ids("cotton"), [self.masks[3].id])
+        self.assertEqual(self.ids("smile"), [])
+        self.index.remove(self.masks[3].id)
+        self.assertEqual(self.ids("cotton"), [])
+        self.assertNotIn('cotton', self.index.vocabulary)
+        self.assertNotIn('cot', self.index.trigram_postings)
+        self.assertEqual(len(self.index), len(self.masks) - 1)
+
+    def test_signals_keep_global_indexes_current(self):
+        mask_search_index.invalidate()
+        pharmacy_search_index.invalidate()
+        self.assertEqual(len(mask_search_index.search("barrier", 10)), 3)
+        mask = Mask.objects.create(pharmacy=self.pharmacy, name="Barrier Plus", price=1)
+        self.assertEqual(mask_search_index.search("barrier plus", 10)[0][0], mask.id)
+        mask.name = "Shield"
+        mask.save()
+        self.assertEqual([object_id for object_id, _ in mask_search_index.search("shield", 10)], [mask.id])
+        self.assertEqual(len(mask_search_index.search("barrier", 10)), 3)
+        self.pharmacy.delete()
+        self.assertEqual(mask_search_index.search("barrier", 10), [])
+        self.assertEqual(pharmacy_search_index.search("pharmacy", 10), [])
+
+    def test_scores_without_holding_the_lock(self):
+        self.index.search("mask", 1)  # build
+        score = self.index._score
+        acquired = []
+
+        def score_and_try_the_lock(*args):
+            # A search or an update from another thread can run meanwhile
+            def try_the_lock():
+                acquired.append(self.index._lock.acquire(timeout=1))
+                if acquired[-1]:
+                    self.index._lock.release()
+
+            thread = threading.Thread(target=try_the_lock)
+            thread.start()
+            thread.join()
+            return score(*args)
+
+        with mock.patch.object(self.index, '_score', side_effect=score_and_try_the_lock):
+            self.assertEqual(self.ids("barrier green"), [self.masks[0].id, self.masks[5].id])
+        self.assertEqual(acquired, [True])
+
+    def test_names_removed_while_scoring_are_skipped(self):
+        self.index.search("mask", 1)  # build
+        score = self.index._score
+
+        def remove_then_score(*args):
+            self.index.remove(self.masks[0].id)
+            self.index.remove(self.masks[5].id)
+            return score(*args)
+
+        with mock.patch.object(self.index, '_score', side_effect=remove_then_score):
+            self.assertEqual(self.ids("barrier green"), [])
+
+    @override_settings(SEARCH_INDEX_MAX_AGE=0)
+    def test_rebuilt_when_stale(self):
+        self.index.search("mask", 1)
+        Mask.objects.filter(id=self.masks[3].id).update(name="Cotton Kiss")  # no signal
+        time.sleep(0.001)
+        self.assertEqual(self.ids("cotton"), [self.masks[3].id])
+
+
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        self.masks = [
+            Mask.objects.create(pharmacy=self.pharmacy, name=name, price=Decimal("5.00"))
+            for name in ("True Barrier (green) (3 per pack)", "Second Smile (black) (6 per pack)", "True Barrier")
+        ]
+        self.backend = get_search_backend('database')
+
+    def ids(self, query):
+        return [object_id for object_id, _ in self.backend.search(Mask, query, 10)]
+
+    def test_every_term_is_a_required_prefix(self):
+        self.assertEqual(set(self.ids("barr tru")), {self.masks[0].id, self.masks[2].id})
+        self.assertEqual(self.ids("barrier smile"), [])
+        self.assertEqual(self.ids("(("), [])
+
+    def test_ranked_by_relevance(self):
+        hits = self.backend.search(Mask, "true barrier", 10)
+        self.assertEqual(hits[0][0], self.masks[2].id)  # the shorter name
+        self.assertGreater(hits[0][1], hits[1][1])
+
+    def test_kept_in_sync_with_the_table(self):
+        mask = self.masks[1]
+        mask.name = "Cotton Kiss"
+        mask.save()
+        self.assertEqual(self.ids("cotton"), [mask.id])
+        self.assertEqual(self.ids("smile"), [])
+        Mask.objects.filter(id=mask.id).update(name="Masquerade")  # no Django signals
+        self.assertEqual(self.ids("masquerade"), [mask.id])
+        mask.delete()
+        self.assertEqual(self.ids("masquerade"), [])
+
+    @skipIf(connection.vendor != 'sqlite', "FTS5 triggers are SQLite only")
+    def test_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {fulltext.fts_table(Mask)}_insert")
+        mask = Mask.objects.create(pharmacy=self.pharmacy, name="Masquerade", price=1)
+        self.assertEqual(self.ids("masquerade"), [])
+        fulltext.restore(sender=None, using=connection.alias)
+        self.assertEqual(self.ids("masquerade"), [mask.id])
+
+
+class SearchBackendTests(TestCase):
+    def test_like_backend_is_a_substring_scan(self):
+        pharmacy = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
+        first, second = (Mask.objects.create(pharmacy=pharmacy, name=name, price=1) for name in ("Mask A", "B mask"))
+        self.assertEqual(get_search_backend('like').search(Mask, "mask", 10), [(first.id, 1.0), (second.id, 1.0)])
+
+    @override_settings(SEARCH_BACKEND='elastic')
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_search_backend()
+
+
+class BenchmarkSearchTests(TestCase):
+    def test_reports_every_backend_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_search', masks=200, repeat=2, output='/dev/null', stdout=out)
+        for name in ('memory', 'database', 'like'):
+            self.assertIn(f"{name} 'true barrier'", out.getvalue())
+        self.assertFalse(Mask.objects.exists())
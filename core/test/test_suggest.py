@@ -0,0 +1,170 @@
+from datetime import datetime
+from decimal import Decimal
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import User, Pharmacy, Mask, Transaction
+from core.suggest import CompletionTable, suggest_index
+
+
+class CompletionTableTests(SimpleTestCase):
+    def setUp(self):
+        self.table = CompletionTable([
+            ("True Barrier (green) (3 per pack)", 5),
+            ("True Barrier (blue) (3 per pack)", 9),
+            ("Second Smile (black) (6 per pack)", 9),
+            ("Masquerade (blue) (10 per pack)", 0),
+        ], max_results=3)
+
+    def names(self, prefix, limit=10):
+        return [name for name, _ in self.table.complete(prefix, limit)]
+
+    def test_prefix_of_the_name(self):
+        self.assertEqual(self.names("true bar"), ["True Barrier (blue) (3 per pack)", "True Barrier (green) (3 per pack)"])
+
+    def test_prefix_of_a_word_suffix(self):
+        self.assertEqual(self.names("blue 3"), ["True Barrier (blue) (3 per pack)"])
+        self.assertEqual(self.names("smile bl"), ["Second Smile (black) (6 per pack)"])
+
+    def test_ranked_by_popularity_then_name(self):
+        self.assertEqual(self.names("pack"), [
+            "Second Smile (black) (6 per pack)",
+            "True Barrier (blue) (3 per pack)",
+            "True Barrier (green) (3 per pack)",
+            "Masquerade (blue) (10 per pack)",
+        ])
+
+    def test_add_and_discard_in_place(self):
+        self.table.add("Trueform (red) (2 per pack)")
+        self.assertEqual(self.names("true"), [
+            "True Barrier (blue) (3 per pack)", "True Barrier (green) (3 per pack)", "Trueform (red) (2 per pack)",
+        ])
+        self.table.discard("True Barrier (blue) (3 per pack)")
+        self.assertEqual(self.names("barrier"), ["True Barrier (green) (3 per pack)"])
+        self.table.add("True Barrier (blue) (3 per pack)")  # back, with its popularity
+        self.assertEqual(self.names("barrier")[0], "True Barrier (blue) (3 per pack)")
+
+    def test_name_stays_until_its_last_object_goes(self):
+        table = CompletionTable([("N95", 3)], max_results=3, counts={"N95": 2})
+        table.discard("N95")
+        self.assertEqual(table.complete("n9", 3), [("N95", 3)])
+        table.discard("N95")
+        self.assertEqual(table.complete("n9", 3), [])
+
+    def test_in_place_changes_keep_precomputed_prefixes_right(self):
+        entries = [(f"Carepoint {number}", number % 7) for number in range(1, 3001)]
+        table = CompletionTable(entries, max_results=3)
+        table.add("Carepoint 0")
+        table.discard("Carepoint 6")
+        table.discard("Carepoint 13")
+        live = [entry for entry in entries if entry[0] not in ("Carepoint 6", "Carepoint 13")] + [("Carepoint 0", 0)]
+        for prefix in ('c', 'carepoint', 'carepoint 1', 'carepoint 0'):
+            expected = sorted((entry for entry in live if entry[0].lower().startswith(prefix)), key=lambda e: (-e[1], e[0]))
+            self.assertEqual(table.complete(prefix, 3), expected[:3])
+
+    def test_changes_leave_the_lists_being_read_untouched(self):
+        keys, owners = self.table.keyed
+        removed = self.table.removed
+        before = (list(keys), list(owners), set(removed))
+        self.table.add("Trueform (red) (2 per pack)")
+        self.table.discard("Masquerade (blue) (10 per pack)")
+        # A request that read the previous state keeps a consistent view of it
+        self.assertEqual((keys, owners, removed), before)
+        self.assertEqual(len(self.table.keyed[0]), len(self.table.keyed[1]))
+        self.assertEqual(self.names("trueform"), ["Trueform (red) (2 per pack)"])
+
+    def test_broad_prefixes_are_precomputed(self):
+        entries = [(f"Carepoint {number}", number % 7) for number in range(1, 3001)]
+        table = CompletionTable(entries, max_results=3)
+        self.assertIn('carepoint', table.precomputed)
+        self.assertIn('carepoint 1', table.precomputed)
+        self.assertNotIn('carepoint 12', table.precomputed)
+        for prefix in ('c', 'carepoint', 'carepoint 1', 'carepoint 12'):
+            expected = sorted((entry for entry in entries if entry[0].lower().startswith(prefix)), key=lambda e: (-e[1], e[0]))
+            self.assertEqual(table.complete(prefix, 3), expected[:3])
+        # Word suffixes: "1" completes the numbers starting with 1
+        expected = sorted((entry for entry in entries if entry[0].split()[1].startswith('1')), key=lambda e: (-e[1], e[0]))
+        self.assertEqual(table.complete('1', 3), expected[:3])
+        self.assertEqual(self.names("x"), [])
+
+
+class SuggestViewTests(APITestCase):
+    def setUp(self):
+        suggest_index.invalidate()
+        user = User.objects.create(name="Alice", cash_balance=100)
+        self.carepoint = Pharmacy.objects.create(name="Carepoint", cash_balance=0)
+        self.cofactor = Pharmacy.objects.create(name="Cofactor Pharmacy", cash_balance=0)
+        popular = Mask.objects.create(pharmacy=self.carepoint, name="Cotton Kiss (green) (3 per pack)", price=Decimal("5"))
+        Mask.objects.create(pharmacy=self.cofactor, name="Cotton Kiss (green) (3 per pack)", price=Decimal("6"))
+        Mask.objects.create(pharmacy=self.cofactor, name="Cotton Kiss (black) (6 per pack)", price=Decimal("7"))
+        for _ in range(2):
+            Transaction.objects.create(
+                user=user, pharmacy=self.carepoint, mask=popular, transaction_amount=Decimal("5"),
+                transaction_date=timezone.make_aware(datetime(2021, 1, 1)),
+            )
+        self.url = reverse('search-suggest')
+
+    def test_ranks_masks_and_pharmacies_by_sales(self):
+        response = self.client.get(self.url, {'query': 'c'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'name': "Carepoint", 'category': 'pharmacies', 'sales': 2},
+            {'name': "Cotton Kiss (green) (3 per pack)", 'category': 'masks', 'sales': 2},
+            {'name': "Cofactor Pharmacy", 'category': 'pharmacies', 'sales': 0},
+            {'name': "Cotton Kiss (black) (6 per pack)", 'category': 'masks', 'sales': 0},
+        ])
+
+    def test_category_and_limit(self):
+        response = self.client.get(self.url, {'query': 'cotton', 'category': 'masks', 'limit': 1})
+        self.assertEqual([item['name'] for item in response.data], ["Cotton Kiss (green) (3 per pack)"])
+        response = self.client.get(self.url, {'query': 'pharm', 'category': 'pharmacies'})
+        self.assertEqual([item['name'] for item in response.data], ["Cofactor Pharmacy"])
+
+    @override_settings(SUGGEST_MAX_LIMIT=2)
+    def test_limit_is_capped(self):
+        suggest_index.invalidate()
+        response = self.client.get(self.url, {'query': 'c', 'limit': 100})
+        self.assertEqual(len(response.data), 2)
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'query': 'co', 'category': 'users'}, {'query': 'co', 'limit': 0}, {'query': 'co', 'limit': 'x'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_names_are_picked_up(self):
+        self.client.get(self.url, {'query': 'c'})
+        tables = suggest_index._tables
+        self.carepoint.cash_balance = 10
+        self.carepoint.save()
+        self.carepoint.name = "Wellcare"
+        self.carepoint.save()
+        Mask.objects.create(pharmacy=self.cofactor, name="Wellness Shield", price=Decimal("3"))
+        # Updated in place: no rebuild
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'query': 'well'})
+        self.assertIs(suggest_index._tables, tables)
+        self.assertEqual([item['name'] for item in response.data], ["Wellcare", "Wellness Shield"])
+        self.assertEqual(self.client.get(self.url, {'query': 'carep'}).data, [])
+
+    def test_deleted_names_are_dropped(self):
+        self.client.get(self.url, {'query': 'c'})
+        Mask.objects.filter(name="Cotton Kiss (green) (3 per pack)", pharmacy=self.cofactor).delete()
+        # Still sold by Carepoint
+        names = [item['name'] for item in self.client.get(self.url, {'query': 'cotton'}).data]
+        self.assertEqual(names, ["Cotton Kiss (green) (3 per pack)", "Cotton Kiss (black) (6 per pack)"])
+        self.cofactor.delete()
+        with self.assertNumQueries(0):
+            names = [item['name'] for item in self.client.get(self.url, {'query': 'c'}).data]
+        self.assertEqual(names, ["Carepoint", "Cotton Kiss (green) (3 per pack)"])
+
+    @override_settings(SUGGEST_INDEX_MAX_AGE=0)
+    def test_stale_index_is_served_while_refreshing(self):
+        self.client.get(self.url, {'query': 'c'})
+        tables = suggest_index._tables
+        suggest_index._refreshing = True  # a refresh is already running
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'query': 'c'})
+        self.assertEqual(len(response.data), 4)
+        self.assertIs(suggest_index._tables, tables)
+        suggest_index._refreshing = False
@@ -1,13 +1,23 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import DataError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
 from decimal import Decimal
 from django.utils import timezone
 from datetime import datetime, time, timedelta
-from core.models import User, Transaction, Pharmacy, PharmacyOpeningHour, Mask
+from core.models import User, Transaction, Pharmacy, PharmacyOpeningHour, Mask, DailySales, PurchaseOrder
+from core.purchases import adjust_balances as real_adjust_balances, debit_user, process_orders
+from core.open_hours import open_hours_index
+from core.search import mask_search_index, pharmacy_search_index
 
 class PharmacyOpenAtTimeViewTests(APITestCase):
     def setUp(self):
+        open_hours_index.invalidate()
         self.pharmacy1 = Pharmacy.objects.create(name="Pharmacy One", cash_balance=1000)
         self.pharmacy2 = Pharmacy.objects.create(name="Pharmacy Two", cash_balance=1500)
 
@@ -52,6 +62,78 @@ class PharmacyOpenAtTimeViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    @override_settings(OPEN_HOURS_INDEX_ENABLED=True, OPEN_HOURS_IDS_PER_QUERY=1)
+    def test_open_pharmacies_are_read_in_chunks(self):
+        url = reverse('pharmacies-open')
+        self.client.get(url, {'day': 'Tue', 'time': '15:00:00'})  # builds the index
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'day': 'Tue', 'time': '15:00:00', 'fields': 'id,name'})
+        self.assertEqual(response.data, [
+            {'id': self.pharmacy1.id, 'name': "Pharmacy One"}, {'id': self.pharmacy2.id, 'name': "Pharmacy Two"},
+        ])
+        self.assertEqual(len(queries), 2)
+
+    def test_full_day_name(self):
+        url = reverse('pharmacies-open')
+        response = self.client.get(url, {'day': 'Tuesday', 'time': '15:00'})
+        self.assertEqual(len(response.data), 2)
+
+    def test_invalid_day(self):
+        url = reverse('pharmacies-open')
+        response = self.client.get(url, {'day': 'Someday', 'time': '15:00'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_closing_time_is_inclusive(self):
+        url = reverse('pharmacies-open')
+        response = self.client.get(url, {'day': 'Tue', 'time': '18:00'})
+        ids = [ph['id'] for ph in response.data]
+        self.assertIn(self.pharmacy1.id, ids)
+
+    def test_overnight_hours(self):
+        night_owl = Pharmacy.objects.create(name="Night Owl", cash_balance=100)
+        PharmacyOpeningHour.objects.create(
+            pharmacy=night_owl, day_of_week="Fri", open_time=time(20, 0), close_time=time(2, 0)
+        )
+        url = reverse('pharmacies-open')
+
+        for day, time_str, expected in [
+            ('Fri', '23:30', True),
+            ('Sat', '01:59', True),
+            ('Sat', '02:01', False),
+            ('Fri', '19:59', False),
+        ]:
+            response = self.client.get(url, {'day': day, 'time': time_str})
+            ids = [ph['id'] for ph in response.data]
+            self.assertEqual(night_owl.id in ids, expected, f"{day} {time_str}")
+
+    def test_sunday_night_wraps_to_monday(self):
+        night_owl = Pharmacy.objects.create(name="Night Owl", cash_balance=100)
+        PharmacyOpeningHour.objects.create(
+            pharmacy=night_owl, day_of_week="Sun", open_time=time(20, 0), close_time=time(2, 0)
+        )
+        response = self.client.get(reverse('pharmacies-open'), {'day': 'Mon', 'time': '01:00'})
+        self.assertEqual([ph['id'] for ph in response.data], [night_owl.id])
+
+    def test_index_follows_opening_hour_changes(self):
+        url = reverse('pharmacies-open')
+        self.client.get(url, {'day': 'Wed', 'time': '10:00'})  # builds the index
+
+        PharmacyOpeningHour.objects.create(
+            pharmacy=self.pharmacy1, day_of_week="Wed", open_time=time(9, 0), close_time=time(11, 0)
+        )
+        response = self.client.get(url, {'day': 'Wed', 'time': '10:00'})
+        self.assertEqual([ph['id'] for ph in response.data], [self.pharmacy1.id])
+
+        PharmacyOpeningHour.objects.filter(day_of_week="Wed").delete()
+        response = self.client.get(url, {'day': 'Wed', 'time': '10:00'})
+        self.assertEqual(response.data, [])
+
+
+@override_settings(OPEN_HOURS_INDEX_ENABLED=False)
+class PharmacyOpenAtTimeRangeScanViewTests(PharmacyOpenAtTimeViewTests):
+    """Same cases, answered by the start/end minute range scan instead of the in-process index."""
+
+
 
 class PharmacyMaskListViewTests(APITestCase):
     def setUp(self):
@@ -128,6 +210,31 @@ class PharmaciesMaskCountFilterViewTests(APITestCase):
         self.assertIn(self.pharmacy2.id, ids)
         self.assertIn(self.pharmacy3.id, ids)
 
+    def test_lt_includes_pharmacies_without_masks_in_range(self):
+        empty = Pharmacy.objects.create(name="Pharma D", cash_balance=100)
+        url = reverse('pharmacies-mask-count-filter')
+        response = self.client.get(url, {'min_price': '20', 'max_price': '30', 'compare': 'lt', 'count': '1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {p['id']: p['mask_count'] for p in response.data}
+        self.assertEqual(counts, {self.pharmacy1.id: 0, self.pharmacy3.id: 0, empty.id: 0})
+
+    def test_mask_count_returned(self):
+        url = reverse('pharmacies-mask-count-filter')
+        response = self.client.get(url, {'min_price': '5', 'max_price': '10', 'compare': 'gte', 'count': '2'})
+        counts = {p['id']: p['mask_count'] for p in response.data}
+        self.assertEqual(counts, {self.pharmacy1.id: 3, self.pharmacy3.id: 2})
+
+    def test_price_bounds_are_exact(self):
+        Mask.objects.create(pharmacy=self.pharmacy3, name="Odd Mask", price=Decimal("0.30"))
+        url = reverse('pharmacies-mask-count-filter')
+        response = self.client.get(url, {'min_price': '0.3', 'max_price': '0.30', 'compare': 'gte', 'count': '1'})
+        self.assertEqual([(p['id'], p['mask_count']) for p in response.data], [(self.pharmacy3.id, 1)])
+
+    def test_non_finite_price_rejected(self):
+        url = reverse('pharmacies-mask-count-filter')
+        response = self.client.get(url, {'min_price': 'NaN'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_invalid_min_price(self):
         url = reverse('pharmacies-mask-count-filter')
         response = self.client.get(url, {'min_price': 'invalid', 'max_price': '30', 'compare': 'gt', 'count': '3'})
@@ -155,6 +262,13 @@ class PharmaciesMaskCountFilterViewTests(APITestCase):
         ids = [p['id'] for p in response.data]
         self.assertEqual(set(ids), {self.pharmacy1.id, self.pharmacy2.id, self.pharmacy3.id})
 
+class BenchmarkMaskFilterTests(APITestCase):
+    def test_reports_each_case_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_mask_filter', pharmacies=5, masks=40, repeat=1, output='/dev/null', stdout=out)
+        self.assertIn('10-30 gt 3', out.getvalue())
+        self.assertFalse(Mask.objects.exists())
+
 class TopUsersByTransactionAmountViewTests(APITestCase):
     def setUp(self):
         self.user1 = User.objects.create(name="User One", cash_balance=1000)
@@ -345,6 +459,8 @@ class TotalMaskSoldViewTest(APITestCase):
 
 class SearchViewTests(APITestCase):
     def setUp(self):
+        mask_search_index.invalidate()
+        pharmacy_search_index.invalidate()
         self.pharmacy1 = Pharmacy.objects.create(name="Pharmacy1", cash_balance=1000)
         self.pharmacy2 = Pharmacy.objects.create(name="Pharmacy2", cash_balance=2000)
         self.mask1 = Mask.objects.create(pharmacy=self.pharmacy1, name="Test Mask", price=Decimal("50.00"))
@@ -389,6 +505,18 @@ class SearchViewTests(APITestCase):
         self.assertEqual(len(response.data['masks']), 1)
         self.assertEqual(response.data['masks'][0]['name'], 'Partial Mask')
 
+    def test_results_are_ranked_by_relevance(self):
+        response = self.client.get(self.url, {'query': 'test mask', 'category': 'masks'})
+        self.assertEqual([mask['name'] for mask in response.data['masks']], ['Test Mask', 'test mask2'])
+        scores = [mask['relevance'] for mask in response.data['masks']]
+        self.assertGreater(scores[0], scores[1])
+
+    def test_search_limit(self):
+        response = self.client.get(self.url, {'query': 'mask', 'category': 'masks', 'limit': 2})
+        self.assertEqual(len(response.data['masks']), 2)
+        response = self.client.get(self.url, {'query': 'mask', 'limit': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class PurchaseViewTests(APITestCase):
 
     def setUp(self):
@@ -472,4 +600,325 @@ class PurchaseViewTests(APITestCase):
         }
         response = self.client.post(self.purchase_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('insufficient funds', str(response.data).lower())
\ No newline at end of file
+        self.assertIn('insufficient funds', str(response.data).lower())
+
+    def test_rejects_non_positive_quantity(self):
+        data = {'user_id': self.user.id, 'purchases': [{'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': -2}]}
+        response = self.client.post(self.purchase_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cash_balance, 1000)
+
+    def test_rejects_quantity_beyond_limits(self):
+        item = {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id}
+        expensive = Mask.objects.create(name='Gold N95', price=Decimal('99999999.99'), pharmacy=self.pharmacy)
+        for purchases in (
+            [{**item, 'quantity': 1001}],
+            [{**item, 'mask_id': expensive.id, 'quantity': 2}],
+        ):
+            with self.subTest(purchases):
+                response = self.client.post(self.purchase_url, {'user_id': self.user.id, 'purchases': purchases}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_rejects_fractional_quantity_and_invalid_user_id(self):
+        item = {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 1}
+        for data in (
+            {'user_id': self.user.id, 'purchases': [{**item, 'quantity': 1.7}]},
+            {'user_id': self.user.id, 'purchases': [{**item, 'quantity': '1.7'}]},
+            {'user_id': self.user.id, 'purchases': [{**item, 'mask_id': True}]},
+            {'user_id': 'abc', 'purchases': [item]},
+            {'user_id': 1.5, 'purchases': [item]},
+        ):
+            with self.subTest(data):
+                response = self.client.post(self.purchase_url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+        response = self.client.post(self.purchase_url, {'user_id': self.user.id, 'purchases': [{**item, 'quantity': 2.0}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_mask_of_another_pharmacy_changes_nothing(self):
+        other = Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0)
+        data = {'user_id': self.user.id, 'purchases': [
+            {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 1},
+            {'pharmacy_id': other.id, 'mask_id': self.mask.id, 'quantity': 1},
+        ]}
+        response = self.client.post(self.purchase_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+        self.pharmacy.refresh_from_db()
+        self.assertEqual(self.pharmacy.cash_balance, 500)
+
+    def test_cart_across_pharmacies(self):
+        other = Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0)
+        cheap = Mask.objects.create(name='Cloth', price=Decimal('2.50'), pharmacy=other)
+        data = {'user_id': self.user.id, 'purchases': [
+            {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 1},
+            {'pharmacy_id': other.id, 'mask_id': cheap.id, 'quantity': 4},
+            {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 2},
+        ]}
+        response = self.client.post(self.purchase_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['transaction_amount'] for row in response.data], ['100.00', '10.00', '200.00'])
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('id', flat=True)), sorted(row['id'] for row in response.data)
+        )
+        for obj, balance in ((self.user, Decimal('690')), (self.pharmacy, Decimal('800')), (other, Decimal('10'))):
+            obj.refresh_from_db()
+            self.assertEqual(obj.cash_balance, balance)
+        # bulk_create sends no signals; the rollup is still updated
+        self.assertEqual(
+            sorted(DailySales.objects.values_list('pharmacy_id', 'transaction_count', 'transaction_amount')),
+            sorted([(self.pharmacy.id, 2, Decimal('300')), (other.id, 1, Decimal('10'))]),
+        )
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        masks = [Mask.objects.create(name=f'Mask {i}', price=1, pharmacy=self.pharmacy) for i in range(20)]
+
+        def purchase(masks):
+            data = {'user_id': self.user.id, 'purchases': [
+                {'pharmacy_id': self.pharmacy.id, 'mask_id': mask.id, 'quantity': 1} for mask in masks
+            ]}
+            return self.client.post(self.purchase_url, data, format='json')
+
+        # The day's first purchase also creates its DailySales row
+        self.assertEqual(purchase(masks[:1]).status_code, status.HTTP_201_CREATED)
+        # savepoint, user lock, masks, user and pharmacy updates, insert,
+        # rollup update, savepoint release
+        with self.assertNumQueries(8):
+            self.assertEqual(purchase(masks[:1]).status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(8):
+            self.assertEqual(purchase(masks).status_code, status.HTTP_201_CREATED)
+
+class PurchaseBatchViewTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name='Alice', cash_balance=100)
+        self.bob = User.objects.create(name='Bob', cash_balance=10)
+        self.pharmacy = Pharmacy.objects.create(name='Test Pharmacy', cash_balance=0)
+        self.other = Pharmacy.objects.create(name='Other Pharmacy', cash_balance=0)
+        self.mask = Mask.objects.create(name='N95', price=Decimal('20.00'), pharmacy=self.pharmacy)
+        self.cloth = Mask.objects.create(name='Cloth', price=Decimal('2.00'), pharmacy=self.other)
+        self.url = reverse('purchase-batch')
+
+    def order(self, user, *lines):
+        return {'user_id': user.id, 'purchases': [
+            {'pharmacy_id': mask.pharmacy_id, 'mask_id': mask.id, 'quantity': quantity} for mask, quantity in lines
+        ]}
+
+    def test_each_order_is_settled_on_its_own(self):
+        orders = [
+            self.order(self.alice, (self.mask, 2), (self.cloth, 5)),  # 50.00
+            self.order(self.bob, (self.mask, 1)),                     # insufficient funds
+            {'user_id': self.bob.id, 'purchases': [{'pharmacy_id': self.other.id, 'mask_id': self.mask.id, 'quantity': 1}]},
+            {'user_id': 999, 'purchases': [{'pharmacy_id': self.other.id, 'mask_id': self.cloth.id, 'quantity': 1}]},
+            {'purchases': []},
+            self.order(self.bob, (self.cloth, 5)),                    # 10.00
+            self.order(self.alice, (self.mask, 2)),                   # 40.00
+            self.order(self.alice, (self.mask, 1)),                   # 10.00 left: insufficient funds
+        ]
+        with self.settings(PURCHASE_BATCH_GROUP_SIZE=3):
+            response = self.client.post(self.url, {'orders': orders}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (3, 5))
+
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], list(range(len(orders))))
+        self.assertEqual([result['status'] for result in results], [
+            'accepted', 'rejected', 'rejected', 'rejected', 'rejected', 'accepted', 'accepted', 'rejected',
+        ])
+        self.assertIn('Insufficient funds', results[1]['error'])
+        self.assertIn('not found in pharmacy', results[2]['error'])
+        self.assertEqual(results[3]['error'], 'User not found.')
+        self.assertEqual(results[0]['total'], '50.00')
+
+        transactions = dict(Transaction.objects.values_list('id', 'transaction_amount'))
+        self.assertEqual([transactions[pk] for pk in results[0]['transaction_ids']], [Decimal('40.00'), Decimal('10.00')])
+        self.assertEqual(len(transactions), 4)
+        for obj, balance in ((self.alice, 10), (self.bob, 0), (self.pharmacy, 80), (self.other, 20)):
+            obj.refresh_from_db()
+            self.assertEqual(obj.cash_balance, balance)
+        self.assertEqual(DailySales.objects.get(user=self.alice, pharmacy=self.pharmacy).transaction_count, 2)
+
+    def test_rejects_malformed_batches(self):
+        for data in ({}, {'orders': []}, {'orders': {'user_id': 1}}):
+            with self.subTest(data):
+                response = self.client.post(self.url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(PURCHASE_BATCH_MAX_ORDERS=1):
+            orders = [self.order(self.alice, (self.cloth, 1))] * 2
+            response = self.client.post(self.url, {'orders': orders}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, '--database'):
+            call_command('benchmark_purchase_batch', orders=20, output='/dev/null', stdout=out)
+        someone = User.objects.create(name='Benchmark User 0', cash_balance=10)
+        call_command('benchmark_purchase_batch', orders=20, output='/dev/null',
+                     database=connection.settings_dict['NAME'], stdout=out)
+        self.assertIn('purchase/batch/', out.getvalue())
+        # Only the rows the benchmark created are deleted
+        self.assertEqual(list(User.objects.filter(name__startswith='Benchmark User ')), [someone])
+        someone.delete()
+        self.assertFalse(User.objects.filter(name__startswith='Benchmark User ').exists())
+        self.assertEqual(Transaction.objects.count(), 0)
+
+
+@override_settings(PURCHASE_CONCURRENCY='optimistic')
+class OptimisticPurchaseTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Test User', cash_balance=100)
+        self.pharmacy = Pharmacy.objects.create(name='Test Pharmacy', cash_balance=0)
+        self.mask = Mask.objects.create(name='N95', price=Decimal('30.00'), pharmacy=self.pharmacy)
+
+    def purchase(self, quantity):
+        data = {'user_id': self.user.id, 'purchases': [
+            {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': quantity},
+        ]}
+        return self.client.post(reverse('purchase'), data, format='json')
+
+    def test_purchase_bumps_versions(self):
+        response = self.purchase(3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]['transaction_amount'], '90.00')
+        for obj, balance in ((self.user, 10), (self.pharmacy, 90)):
+            obj.refresh_from_db()
+            self.assertEqual((obj.cash_balance, obj.version), (balance, 1))
+        self.assertEqual(DailySales.objects.get(user=self.user).transaction_count, 1)
+
+        response = self.purchase(1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Insufficient funds', str(response.data))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_debit_requires_current_version_and_funds(self):
+        self.assertFalse(debit_user(self.user.id, 1, Decimal('10.00')))
+        self.assertFalse(debit_user(self.user.id, 0, Decimal('100.01')))
+        self.assertTrue(debit_user(self.user.id, 0, Decimal('100.00')))
+        self.assertFalse(debit_user(self.user.id, 0, Decimal('0.00')))
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.cash_balance, self.user.version), (0, 1))
+
+
+class BenchmarkPurchaseConcurrencyTests(APITransactionTestCase):
+    """Committed data: the benchmark's threads read it on their own connections."""
+
+    @override_settings(PURCHASE_OPTIMISTIC_RETRIES=50)
+    def test_benchmark_command(self):
+        out, err = StringIO(), StringIO()
+        call_command('benchmark_purchase_concurrency', threads=4, orders=40, users=2, output='/dev/null',
+                     database=connection.settings_dict['NAME'], stdout=out, stderr=err)
+        # The test database is neither WAL nor IMMEDIATE
+        self.assertIn("'transaction_mode': 'IMMEDIATE'", err.getvalue())
+        # The command fails if a balance went negative or money was lost
+        self.assertIn('No balance went negative', out.getvalue())
+        # SQLite has no row locks: only the optimistic mode settles every order
+        optimistic = next(line for line in out.getvalue().splitlines() if line.startswith('optimistic'))
+        self.assertIn('failed 0 ', optimistic)
+        self.assertFalse(User.objects.filter(name__startswith='Benchmark User ').exists())
+        self.assertEqual(Transaction.objects.count(), 0)
+
+class AsyncPurchaseTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name='Alice', cash_balance=100)
+        self.bob = User.objects.create(name='Bob', cash_balance=10)
+        self.pharmacy = Pharmacy.objects.create(name='Test Pharmacy', cash_balance=0)
+        self.mask = Mask.objects.create(name='N95', price=Decimal('20.00'), pharmacy=self.pharmacy)
+
+    def enqueue(self, user, quantity):
+        data = {'user_id': user.id, 'purchases': [
+            {'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': quantity},
+        ]}
+        return self.client.post(reverse('purchase'), data, format='json', HTTP_PREFER='respond-async')
+
+    def test_enqueue_returns_202_without_applying(self):
+        response = self.enqueue(self.alice, 2)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], PurchaseOrder.PENDING)
+        self.assertEqual(response['Preference-Applied'], 'respond-async')
+        self.assertTrue(response['Location'].endswith(reverse('purchase-order', args=[response.data['id']])))
+        self.assertFalse(Transaction.objects.exists())
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.cash_balance, 100)
+
+    def test_worker_settles_orders_once(self):
+        first = self.enqueue(self.alice, 3).data['id']   # 60.00
+        second = self.enqueue(self.alice, 3).data['id']  # 40.00 left: insufficient funds
+        third = self.enqueue(self.bob, 1).data['id']    # insufficient funds
+        self.assertEqual(process_orders(), 3)
+        self.assertEqual(process_orders(), 0)
+
+        statuses = dict(PurchaseOrder.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[first], statuses[second], statuses[third]],
+                         [PurchaseOrder.ACCEPTED, PurchaseOrder.REJECTED, PurchaseOrder.REJECTED])
+        response = self.client.get(reverse('purchase-order', args=[first]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], '60.00')
+        self.assertEqual(response.data['transaction_ids'], list(Transaction.objects.values_list('id', flat=True)))
+        self.assertIsNotNone(response.data['processed_at'])
+        self.assertIn('Insufficient funds', self.client.get(reverse('purchase-order', args=[second])).data['error'])
+
+        for obj, balance in ((self.alice, 40), (self.bob, 10), (self.pharmacy, 60)):
+            obj.refresh_from_db()
+            self.assertEqual(obj.cash_balance, balance)
+        self.assertEqual(DailySales.objects.get(user=self.alice).transaction_count, 1)
+
+    def test_invalid_orders_are_not_queued(self):
+        data = {'user_id': 999, 'purchases': [{'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 1}]}
+        response = self.client.post(reverse('purchase'), data, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        data = {'user_id': self.alice.id, 'purchases': [{'pharmacy_id': self.pharmacy.id, 'mask_id': 999, 'quantity': 1}]}
+        response = self.client.post(reverse('purchase'), data, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        data = {'user_id': 'abc', 'purchases': [{'pharmacy_id': self.pharmacy.id, 'mask_id': self.mask.id, 'quantity': 1}]}
+        response = self.client.post(reverse('purchase'), data, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PurchaseOrder.objects.exists())
+        response = self.client.get(reverse('purchase-order', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_failing_order_does_not_block_the_queue(self):
+        poison_pharmacy = Pharmacy.objects.create(name='Full Pharmacy', cash_balance=Decimal('99999999.00'))
+        poison_mask = Mask.objects.create(name='N95', price=Decimal('5.00'), pharmacy=poison_pharmacy)
+        first = self.enqueue(self.alice, 1).data['id']
+        data = {'user_id': self.alice.id, 'purchases': [
+            {'pharmacy_id': poison_pharmacy.id, 'mask_id': poison_mask.id, 'quantity': 1},
+        ]}
+        poison = self.client.post(reverse('purchase'), data, format='json', HTTP_PREFER='respond-async').data['id']
+        last = self.enqueue(self.alice, 1).data['id']
+
+        def adjust_balances(model, changes):
+            # MySQL strict mode refuses a balance beyond max_digits
+            if model is Pharmacy and poison_pharmacy.id in changes:
+                raise DataError("Out of range value for column 'cash_balance'")
+            real_adjust_balances(model, changes)
+
+        with mock.patch('core.purchases.adjust_balances', side_effect=adjust_balances):
+            call_command('process_purchase_orders', once=True, stdout=StringIO())
+
+        statuses = dict(PurchaseOrder.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[first], statuses[poison], statuses[last]],
+                         [PurchaseOrder.ACCEPTED, PurchaseOrder.REJECTED, PurchaseOrder.ACCEPTED])
+        self.assertEqual(PurchaseOrder.objects.get(id=poison).error, "The order could not be saved.")
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.cash_balance, 60)
+
+    def test_worker_command(self):
+        for _ in range(3):
+            self.enqueue(self.alice, 1)
+        out = StringIO()
+        call_command('process_purchase_orders', once=True, batch_size=2, stdout=out)
+        self.assertIn('Settled 3 orders', out.getvalue())
+        self.assertFalse(PurchaseOrder.objects.filter(status=PurchaseOrder.PENDING).exists())
+        self.assertEqual(Transaction.objects.count(), 3)
+
+
+@override_settings(SEARCH_BACKEND='database')
+class SearchViewDatabaseBackendTests(SearchViewTests):
+    """Same cases, answered by the database full-text index (FTS5 on SQLite)."""
+
+    def test_results_are_ranked_by_relevance(self):
+        response = self.client.get(self.url, {'query': 'test mask', 'category': 'masks'})
+        self.assertEqual([mask['name'] for mask in response.data['masks']], ['Test Mask', 'test mask2'])
+        self.assertIn('relevance', response.data['masks'][0])
@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (UserListView, TopUsersByTransactionAmountView, PharmacyListView, PharmacyOpenAtTimeView, 
                     PharmacyMaskListView, PharmaciesMaskCountFilterView, PharmacyOpeningHourListView, MaskListView, 
-                    TransactionListView, TotalMaskSoldView, SearchView, PurchaseView)
+                    TransactionListView, TotalMaskSoldView, SearchView, SuggestView, PurchaseView,
+                    PurchaseOrderView, PurchaseBatchView)
 
 urlpatterns = [
     path('users/', UserListView.as_view(), name='user-list'),
@@ -15,5 +16,8 @@ urlpatterns = [
     path('transactions/', TransactionListView.as_view(), name='transaction-list'),
     path('transactions/summary/', TotalMaskSoldView.as_view(), name='transactions-summary'),
     path('search/', SearchView.as_view(), name='search'),
+    path('search/suggest/', SuggestView.as_view(), name='search-suggest'),
     path('purchase/', PurchaseView.as_view(), name='purchase'),
+    path('purchase/batch/', PurchaseBatchView.as_view(), name='purchase-batch'),
+    path('purchase/<int:order_id>/', PurchaseOrderView.as_view(), name='purchase-order'),
 ]
@@ -1,6 +1,8 @@
 # your_app/utils.py
 
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db import connection
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
@@ -9,3 +11,43 @@ def parse_date_param(date_str: str, param_name: str):
         return timezone.make_aware(datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=1)) # timedelta for inclusive
     except (TypeError, ValueError):
         raise ValidationError(f"{param_name} must be provided in YYYY-MM-DD format.")
+
+def parse_decimal_param(value: str, param_name: str):
+    """Parse a price parameter exactly, rejecting NaN and infinities."""
+    try:
+        number = Decimal(value)
+    except (TypeError, InvalidOperation):
+        raise ValidationError(f"{param_name} must be a valid number.")
+    if not number.is_finite():
+        raise ValidationError(f"{param_name} must be a valid number.")
+    return number
+
+
+def add_by_id(model, fields, changes, batch_size=300):
+    """
+    Add ``changes`` {pk: (delta per field)} to ``fields`` of the model's
+    rows, in UPDATE statements of ``batch_size`` rows. Rows are updated
+    (and locked) in ascending primary key order. Raw SQL: compiling the
+    equivalent Case/When expressions costs more than running them.
+    """
+    if not changes:
+        return
+    ops = connection.ops
+    table = ops.quote_name(model._meta.db_table)
+    pk = ops.quote_name(model._meta.pk.column)
+    columns = [ops.quote_name(model._meta.get_field(name).column) for name in fields]
+    ids = sorted(changes)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            whens = ' '.join(["WHEN %s THEN %s"] * len(batch))
+            assignments = ', '.join(f"{column} = {column} + CASE {pk} {whens} END" for column in columns)
+            params = [
+                value for index in range(len(columns))
+                for object_id in batch for value in (object_id, changes[object_id][index])
+            ]
+            order = f" ORDER BY {pk}" if connection.vendor == 'mysql' else ''
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} WHERE {pk} IN ({', '.join(['%s'] * len(batch))}){order}",
+                params + batch,
+            )
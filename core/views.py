@@ -3,21 +3,60 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from django.utils.dateparse import parse_time
-from django.utils import timezone
-from .utils import parse_date_param
+from django.conf import settings
+from .utils import parse_date_param, parse_decimal_param
+from .analytics import top_users_engine
+from .open_hours import open_hours_index
+from .purchases import enqueue_order, parse_items, place_order, place_orders
+from .search import search_rows
+from .suggest import suggest_index
+from .rollups import raw_sales_summary, raw_top_user_totals, sales_summary, top_user_totals
+from .pagination import KeysetPagination, MaskUnitPricePagination, TransactionPagination
+from .facets import FACETS, MaskFacetMixin
+from .fast_serializers import FastReadMixin
+from .fieldsets import SparseFieldsetMixin
+from .streaming import StreamingListMixin
+from .schedule import MINUTES_PER_DAY, MINUTES_PER_WEEK, day_of_week_index, minute_of_week
 from datetime import datetime
-from django.db.models import Count, Sum, Q
-from django.db import transaction as db_transaction
-from rest_framework.exceptions import ValidationError
-from .models import User, Pharmacy, PharmacyOpeningHour, Mask, Transaction
-from .serializers import UserSerializer, PharmacySerializer, PharmacyOpeningHourSerializer, MaskSerializer, TransactionSerializer, PurchaseRequestSerializer
+from django.db.models import Case, Q, When
+from rest_framework.exceptions import NotFound, ValidationError
+from django.urls import reverse
+from .models import User, Pharmacy, PharmacyOpeningHour, Mask, Transaction, PurchaseOrder
+from .serializers import UserSerializer, PharmacySerializer, PharmacyMaskCountSerializer, PharmacyOpeningHourSerializer, MaskSerializer, TransactionSerializer, PurchaseRequestSerializer, PurchaseOrderSerializer, PurchaseBatchRequestSerializer, PurchaseBatchResponseSerializer, SuggestionSerializer
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    description='Comma-separated fields to return, e.g. id,name,price (default: all)'
+)
+STREAM_PARAMETER = OpenApiParameter(
+    name='stream',
+    type=OpenApiTypes.BOOL,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    description='Set to 1 to stream every row as a single JSON array instead of one page'
+)
+FACET_PARAMETERS = [
+    OpenApiParameter(name='brand', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False, description='Comma-separated brands to keep'),
+    OpenApiParameter(name='color', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False, description='Comma-separated colors to keep'),
+    OpenApiParameter(name='pack_size', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False, description='Comma-separated pack sizes to keep, e.g. 3,10'),
+    OpenApiParameter(
+        name='facets', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+        description=f"Comma-separated facets to count ({', '.join(FACETS)}); adds a facets object to the response",
+    ),
+]
+
+
 # --- User Views ---
-class UserListView(ListAPIView):
+@extend_schema(parameters=[FIELDS_PARAMETER, STREAM_PARAMETER])
+class UserListView(FastReadMixin, SparseFieldsetMixin, StreamingListMixin, ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
 
 @extend_schema(
     parameters=[
@@ -41,11 +80,12 @@ class UserListView(ListAPIView):
             location=OpenApiParameter.QUERY,
             required=False,
             description='Number of top users to return (default: 10)'
-        )
+        ),
+        FIELDS_PARAMETER
     ],
     responses=UserSerializer(many=True)
 )
-class TopUsersByTransactionAmountView(ListAPIView):
+class TopUsersByTransactionAmountView(SparseFieldsetMixin, ListAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):
@@ -59,28 +99,31 @@ class TopUsersByTransactionAmountView(ListAPIView):
         except ValueError:
             raise ValidationError("limit must be an integer.")
         
-        queryset = (
-            User.objects.annotate(
-                total_amount=Sum(
-                    'transactions__transaction_amount',
-                    filter=Q(transactions__transaction_date__range=(start_date, end_date))
-                )
-            )
-            .filter(total_amount__isnull=False)
-            .order_by('-total_amount')[:limit]
-        )
+        if getattr(settings, 'ANALYTICS_ENGINE_ENABLED', False):
+            totals = top_users_engine.top_user_totals(start_date, end_date, limit)
+        elif getattr(settings, 'SALES_ROLLUP_ENABLED', True):
+            totals = top_user_totals(start_date, end_date, limit)
+        else:
+            totals = raw_top_user_totals(start_date, end_date, limit)
+        if not totals:
+            return User.objects.none()
 
-        return queryset
+        ranking = Case(*[When(id=user_id, then=position) for position, (user_id, _) in enumerate(totals)])
+        return User.objects.filter(id__in=[user_id for user_id, _ in totals]).order_by(ranking)
 
 
 # ---Pharmacy Views ---
-class PharmacyListView(ListAPIView):
+@extend_schema(parameters=[FIELDS_PARAMETER, STREAM_PARAMETER])
+class PharmacyListView(FastReadMixin, SparseFieldsetMixin, StreamingListMixin, ListAPIView):
     queryset = Pharmacy.objects.all()
     serializer_class = PharmacySerializer
+    pagination_class = KeysetPagination
 
-class PharmacyOpeningHourListView(ListAPIView):
+@extend_schema(parameters=[FIELDS_PARAMETER, STREAM_PARAMETER])
+class PharmacyOpeningHourListView(FastReadMixin, SparseFieldsetMixin, StreamingListMixin, ListAPIView):
     queryset = PharmacyOpeningHour.objects.all()
     serializer_class = PharmacyOpeningHourSerializer
+    pagination_class = KeysetPagination
 
 @extend_schema(
     parameters=[
@@ -89,7 +132,7 @@ class PharmacyOpeningHourListView(ListAPIView):
             type=OpenApiTypes.STR,
             location=OpenApiParameter.QUERY,
             required=False,
-            description="Day of the week (e.g., Monday, Tuesday)"
+            description="Day of the week (e.g., Mon, Monday, Thur)"
         ),
         OpenApiParameter(
             name='time',
@@ -97,31 +140,66 @@ class PharmacyOpeningHourListView(ListAPIView):
             location=OpenApiParameter.QUERY,
             required=False,
             description="Time in HH:MM format to check if the pharmacy is open"
-        )
+        ),
+        FIELDS_PARAMETER
     ],
     responses=PharmacySerializer(many=True)
 )
-class PharmacyOpenAtTimeView(ListAPIView):
+class PharmacyOpenAtTimeView(SparseFieldsetMixin, ListAPIView):
     serializer_class = PharmacySerializer
 
-    def get_queryset(self):
+    def get_minute(self):
+        """Minute of the week asked for with ?day= and ?time=, or None for every pharmacy."""
         day = self.request.query_params.get('day')
         time_str = self.request.query_params.get('time')
+        if not (day and time_str):
+            return None
 
-        if day and time_str:
-            query_time = parse_time(time_str)
-            if not query_time:
-                raise ValidationError("Invalid time format. Expected HH:MM")
+        query_time = parse_time(time_str)
+        if not query_time:
+            raise ValidationError("Invalid time format. Expected HH:MM")
 
-            open_ids = PharmacyOpeningHour.objects.filter(
-                day_of_week=day,
-                open_time__lte=query_time,
-                close_time__gte=query_time
-            ).values_list('pharmacy_id', flat=True)
+        day_index = day_of_week_index(day)
+        if day_index is None:
+            raise ValidationError("Invalid day. Expected a day name such as Mon or Monday")
 
-            return Pharmacy.objects.filter(id__in=open_ids)
+        return minute_of_week(day_index, query_time)
 
-        return Pharmacy.objects.all()
+    def uses_index(self):
+        return self.get_minute() is not None and getattr(settings, 'OPEN_HOURS_INDEX_ENABLED', True)
+
+    def get_queryset(self):
+        minute = self.get_minute()
+        if minute is None:
+            return Pharmacy.objects.all()
+        if getattr(settings, 'OPEN_HOURS_INDEX_ENABLED', True):
+            # Narrowed to the open ids in list()
+            return Pharmacy.objects.order_by('id')
+
+        # A window lasts at most a day, so its start lies within the day
+        # before the queried minute; the second range catches Sunday
+        # nights that run past the end of the week.
+        return Pharmacy.objects.filter(
+            Q(opening_hours__start_minute__range=(minute - MINUTES_PER_DAY, minute),
+              opening_hours__end_minute__gte=minute)
+            | Q(opening_hours__start_minute__range=(minute + MINUTES_PER_WEEK - MINUTES_PER_DAY, minute + MINUTES_PER_WEEK),
+                opening_hours__end_minute__gte=minute + MINUTES_PER_WEEK)
+        ).distinct()
+
+    def list(self, request, *args, **kwargs):
+        if not self.uses_index():
+            return super().list(request, *args, **kwargs)
+
+        # The index returns sorted ids: read them a bounded chunk at a time
+        ids = open_hours_index.open_at(self.get_minute())
+        per_query = getattr(settings, 'OPEN_HOURS_IDS_PER_QUERY', 500)
+        queryset = self.filter_queryset(self.get_queryset())
+        pharmacies = [
+            pharmacy
+            for start in range(0, len(ids), per_query)
+            for pharmacy in queryset.filter(id__in=ids[start:start + per_query])
+        ]
+        return Response(self.get_serializer(pharmacies, many=True).data)
 
 
 @extend_schema(
@@ -131,18 +209,20 @@ class PharmacyOpenAtTimeView(ListAPIView):
             type=OpenApiTypes.STR,
             location=OpenApiParameter.QUERY,
             required=False,
-            description="Sort by ['name', '-name', 'price', '-price']"
-        )
+            description="Sort by ['name', '-name', 'price', '-price', 'unit_price', '-unit_price']"
+        ),
+        FIELDS_PARAMETER,
+        *FACET_PARAMETERS,
     ],
     responses=MaskSerializer(many=True)
 )
-class PharmacyMaskListView(ListAPIView):
+class PharmacyMaskListView(MaskFacetMixin, SparseFieldsetMixin, ListAPIView):
     serializer_class = MaskSerializer
 
     def get_queryset(self):
         pharmacy_id = self.kwargs['pharmacy_id']
         sort_by = self.request.query_params.get('sort_by')
-        allowed_sort_fields = ['name', '-name', 'price', '-price']
+        allowed_sort_fields = ['name', '-name', 'price', '-price', 'unit_price', '-unit_price']
 
         if sort_by and sort_by not in allowed_sort_fields:
             raise ValidationError(f"Invalid sort field: {sort_by}")
@@ -156,32 +236,24 @@ class PharmacyMaskListView(ListAPIView):
 
 @extend_schema(
     parameters=[
-        OpenApiParameter(name='min_price', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False, description='Minimum mask price'),
-        OpenApiParameter(name='max_price', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False, description='Maximum mask price'),
+        OpenApiParameter(name='min_price', type=OpenApiTypes.DECIMAL, location=OpenApiParameter.QUERY, required=False, description='Minimum mask price'),
+        OpenApiParameter(name='max_price', type=OpenApiTypes.DECIMAL, location=OpenApiParameter.QUERY, required=False, description='Maximum mask price'),
         OpenApiParameter(name='count', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False, description='Threshold mask count'),
         OpenApiParameter(name='compare', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False, description='Comparison operator: gt, lt, gte, lte'),
+        FIELDS_PARAMETER,
     ],
-    responses=PharmacySerializer(many=True)
+    responses=PharmacyMaskCountSerializer(many=True)
 )
-class PharmaciesMaskCountFilterView(ListAPIView):
-    serializer_class = PharmacySerializer
+class PharmaciesMaskCountFilterView(SparseFieldsetMixin, ListAPIView):
+    serializer_class = PharmacyMaskCountSerializer
 
     def get_queryset(self):
         params = self.request.query_params
 
-        try:
-            min_price = float(params.get('min_price', 0))
-        except ValueError:
-            raise ValidationError("min_price must be a valid number.")
-
-        max_price_param = params.get('max_price')
-        if max_price_param is not None:
-            try:
-                max_price = float(max_price_param)
-            except ValueError:
-                raise ValidationError("max_price must be a valid number.")
-        else:
-            max_price = float('inf')
+        min_price = parse_decimal_param(params.get('min_price', '0'), 'min_price')
+        max_price = params.get('max_price')
+        if max_price is not None:
+            max_price = parse_decimal_param(max_price, 'max_price')
 
         try:
             count = int(params.get('count', 0))
@@ -199,34 +271,49 @@ class PharmaciesMaskCountFilterView(ListAPIView):
         if compare and compare not in allowed_comparisons:
             raise ValidationError(f"Invalid compare value: '{compare}'. Must be one of {list(allowed_comparisons.keys())}.")
 
-        price_filter = {'price__gte': min_price}
-        if max_price != float('inf'):
-            price_filter['price__lte'] = max_price
-
-        mask_counts = (
-            Mask.objects
-            .filter(**price_filter)
-            .values('pharmacy_id')
-            .annotate(mask_count=Count('id'))
-        )
-
+        # One LEFT JOIN + GROUP BY query; the comparison becomes a HAVING clause
+        queryset = Pharmacy.objects.with_mask_count(min_price, max_price)
         if compare:
-            condition = {allowed_comparisons[compare]: count}
-            matching_ids = mask_counts.filter(**condition).values_list('pharmacy_id', flat=True)
-            return Pharmacy.objects.filter(id__in=matching_ids)
+            queryset = queryset.filter(**{allowed_comparisons[compare]: count})
 
-        return Pharmacy.objects.all()
+        return queryset
 
 
 # ---Mask Views ---
-class MaskListView(ListAPIView):
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name='sort_by',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description="Sort by ['id', 'unit_price'] (default: id)"
+        ),
+        FIELDS_PARAMETER,
+        STREAM_PARAMETER,
+        *FACET_PARAMETERS,
+    ]
+)
+class MaskListView(MaskFacetMixin, FastReadMixin, SparseFieldsetMixin, StreamingListMixin, ListAPIView):
     queryset = Mask.objects.all()
     serializer_class = MaskSerializer
+    sort_paginations = {'id': KeysetPagination, 'unit_price': MaskUnitPricePagination}
+
+    @property
+    def pagination_class(self):
+        # Schema generation reads this before any request is bound
+        request = getattr(self, 'request', None)
+        sort_by = request.query_params.get('sort_by', 'id') if request is not None else 'id'
+        if sort_by not in self.sort_paginations:
+            raise ValidationError(f"Invalid sort field: {sort_by}")
+        return self.sort_paginations[sort_by]
 
 # ---Transaction Views ---
-class TransactionListView(ListAPIView):
+@extend_schema(parameters=[FIELDS_PARAMETER, STREAM_PARAMETER])
+class TransactionListView(FastReadMixin, SparseFieldsetMixin, StreamingListMixin, ListAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = TransactionPagination
 
 @extend_schema(
     parameters=[
@@ -242,14 +329,10 @@ class TotalMaskSoldView(APIView): #within date
         start_date = parse_date_param(params.get('start_date'), 'start_date')
         end_date = parse_date_param(params.get('end_date'), 'end_date')
 
-        summary = (
-            Transaction.objects
-            .filter(transaction_date__range=(start_date, end_date))
-            .aggregate(
-                total_masks_sold=Count('id'),
-                total_transaction_value=Sum('transaction_amount')
-            )
-        )
+        if getattr(settings, 'SALES_ROLLUP_ENABLED', True):
+            summary = sales_summary(start_date, end_date)
+        else:
+            summary = raw_sales_summary(start_date, end_date)
 
         # If no transactions found, defaults to None, replace with 0
         summary['total_masks_sold'] = summary['total_masks_sold'] or 0
@@ -261,6 +344,7 @@ class TotalMaskSoldView(APIView): #within date
     parameters=[
         OpenApiParameter('query', OpenApiTypes.STR, OpenApiParameter.QUERY, required=True, description="Search query string"),
         OpenApiParameter('category', OpenApiTypes.STR, OpenApiParameter.QUERY, required=False, description="Filter by category: 'masks' or 'pharmacies'"),
+        OpenApiParameter('limit', OpenApiTypes.INT, OpenApiParameter.QUERY, required=False, description="Maximum results per category (default: 100, at most 1000)"),
     ],
     responses=OpenApiTypes.OBJECT
 )
@@ -272,29 +356,66 @@ class SearchView(APIView):
         if not query:
             raise ValidationError("Query parameter is required.")
 
+        max_limit = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+        try:
+            limit = int(request.query_params.get('limit', getattr(settings, 'API_PAGE_SIZE', 100)))
+        except ValueError:
+            raise ValidationError("limit must be an integer.")
+        if limit < 1:
+            raise ValidationError("limit must be a positive integer.")
+        limit = min(limit, max_limit)
+
+        # Ranked by relevance through settings.SEARCH_BACKEND; every word must match
         results = {}
 
         if not category or category == 'masks':
-            masks = Mask.objects.filter(
-                Q(name__icontains=query) | Q(name__istartswith=query)
-            ).annotate(
-                relevance=Count('id')  # Optional: sort logic placeholder
-            ).order_by('-relevance')
-            results['masks'] = MaskSerializer(masks, many=True).data
+            results['masks'] = search_rows(Mask, MaskSerializer(), query, limit)
 
         if not category or category == 'pharmacies':
-            pharmacies = Pharmacy.objects.filter(
-                Q(name__icontains=query) | Q(name__istartswith=query)
-            ).annotate(
-                relevance=Count('id')  # Optional: sort logic placeholder
-            ).order_by('-relevance')
-            results['pharmacies'] = PharmacySerializer(pharmacies, many=True).data
+            results['pharmacies'] = search_rows(Pharmacy, PharmacySerializer(), query, limit)
 
         return Response(results)
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter('query', OpenApiTypes.STR, OpenApiParameter.QUERY, required=True, description="Text typed so far"),
+        OpenApiParameter('category', OpenApiTypes.STR, OpenApiParameter.QUERY, required=False, description="Filter by category: 'masks' or 'pharmacies'"),
+        OpenApiParameter('limit', OpenApiTypes.INT, OpenApiParameter.QUERY, required=False, description="Maximum completions (default: 10, at most 20)"),
+    ],
+    responses=SuggestionSerializer(many=True)
+)
+class SuggestView(APIView):
+    def get(self, request):
+        query = request.query_params.get('query', '').strip()
+        category = request.query_params.get('category')
+
+        if not query:
+            raise ValidationError("Query parameter is required.")
+        if category not in (None, 'masks', 'pharmacies'):
+            raise ValidationError("category must be 'masks' or 'pharmacies'.")
+
+        try:
+            limit = int(request.query_params.get('limit', getattr(settings, 'SUGGEST_LIMIT', 10)))
+        except ValueError:
+            raise ValidationError("limit must be an integer.")
+        if limit < 1:
+            raise ValidationError("limit must be a positive integer.")
+        limit = min(limit, getattr(settings, 'SUGGEST_MAX_LIMIT', 20))
+
+        return Response(suggest_index.suggest(query, limit, category))
+
 @extend_schema(
     request=PurchaseRequestSerializer,
-    responses={201: TransactionSerializer(many=True)},
+    parameters=[
+        OpenApiParameter(
+            name='Prefer',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.HEADER,
+            required=False,
+            description="Send 'respond-async' to queue the order and get 202 with its id instead of waiting for it"
+        ),
+    ],
+    responses={201: TransactionSerializer(many=True), 202: PurchaseOrderSerializer},
     description="Create multiple purchase transactions for a user in one atomic operation."
 )
 class PurchaseView(APIView):
@@ -306,62 +427,54 @@ class PurchaseView(APIView):
         if not user_id or not purchases:
             raise ValidationError("'user_id' and 'purchases' fields are required.")
 
-        try:
-            user = User.objects.select_for_update().get(id=user_id)
-        except User.DoesNotExist:
-            raise ValidationError("User not found.")
-
-        created_transactions = []
-        total_cost = 0
-
-        # Start atomic transaction
-        with db_transaction.atomic():
-            for item in purchases:
-                pharmacy_id = item.get('pharmacy_id')
-                mask_id = item.get('mask_id')
-                quantity = item.get('quantity')
-
-                if not all([pharmacy_id, mask_id, quantity]):
-                    raise ValidationError("Each purchase must include 'pharmacy_id', 'mask_id', and 'quantity'.")
-
-                try:
-                    mask = Mask.objects.get(id=mask_id, pharmacy_id=pharmacy_id)
-                except Mask.DoesNotExist:
-                    raise ValidationError(f"Mask {mask_id} not found in pharmacy {pharmacy_id}.")
-
-                total_price = mask.price * quantity
-                total_cost += total_price
-
-            if user.cash_balance < total_cost:
-                raise ValidationError(f"Insufficient funds. Required: {total_cost}, Available: {user.cash_balance}")
-
-            # Perform transactions
-            for item in purchases:
-                pharmacy_id = item.get('pharmacy_id')
-                mask_id = item.get('mask_id')
-                quantity = item.get('quantity')
-
-                mask = Mask.objects.get(id=mask_id, pharmacy_id=pharmacy_id)
-                pharmacy = mask.pharmacy
-                total_price = mask.price * quantity
-
-                # Transfer funds
-                user.cash_balance -= total_price
-                pharmacy.cash_balance += total_price
-                user.save()
-                pharmacy.save()
-
-                # Create transaction entry
-                transaction = Transaction.objects.create(
-                    user=user,
-                    pharmacy=pharmacy,
-                    mask=mask,
-                    transaction_date=timezone.now(),
-                    transaction_amount=total_price
-                )
-                created_transactions.append(transaction)
+        items = parse_items(purchases)
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            order = enqueue_order(user_id, items)
+            return Response(
+                PurchaseOrderSerializer(order).data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={
+                    'Location': request.build_absolute_uri(reverse('purchase-order', args=[order.id])),
+                    'Preference-Applied': 'respond-async',
+                },
+            )
 
+        transactions = place_order(user_id, items)
         return Response(
-            TransactionSerializer(created_transactions, many=True).data,
+            TransactionSerializer(transactions, many=True).data,
             status=status.HTTP_201_CREATED
         )
+
+
+@extend_schema(responses={200: PurchaseOrderSerializer})
+class PurchaseOrderView(APIView):
+    """Status of an order queued with `Prefer: respond-async`."""
+
+    def get(self, request, order_id):
+        try:
+            order = PurchaseOrder.objects.get(id=order_id)
+        except PurchaseOrder.DoesNotExist:
+            raise NotFound("Purchase order not found.")
+        return Response(PurchaseOrderSerializer(order).data)
+
+
+@extend_schema(
+    request=PurchaseBatchRequestSerializer,
+    responses={200: PurchaseBatchResponseSerializer},
+    description=(
+        "Apply many purchase orders in group commits. Each order is accepted or rejected on its own; "
+        "a rejected order does not affect the others."
+    )
+)
+class PurchaseBatchView(APIView):
+    def post(self, request):
+        orders = request.data.get('orders')
+        if not orders or not isinstance(orders, list):
+            raise ValidationError("'orders' must be a non-empty list.")
+        max_orders = getattr(settings, 'PURCHASE_BATCH_MAX_ORDERS', 10000)
+        if len(orders) > max_orders:
+            raise ValidationError(f"At most {max_orders} orders per batch.")
+
+        results = place_orders(orders)
+        accepted = sum(result['status'] == 'accepted' for result in results)
+        return Response({'accepted': accepted, 'rejected': len(results) - accepted, 'results': results})
@@ -90,6 +90,8 @@ DATABASES = {
         'PORT': os.getenv("MYSQL_PORT"),
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            # Allows `load_initial_data --backend native` to use LOAD DATA LOCAL INFILE
+            'local_infile': 1,
         }
     }
 }
@@ -138,4 +140,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+}
+
+# Page size of the cursor-paginated list endpoints, and the largest page a
+# client may request with ?page_size=.
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Rows fetched per query when a list endpoint streams a full export (?stream=1).
+API_STREAM_CHUNK_SIZE = 2000
+
+# Answer the date-range reports (transactions/summary/, users/top/) from the
+# DailySales rollup, reading raw transactions only for partial days.
+SALES_ROLLUP_ENABLED = True
+
+# Answer users/top/ from an in-memory NumPy snapshot of transactions (needs
+# `pip install numpy`), fully reloaded after this many seconds to pick up
+# updates and deletes made by other processes. New transactions are added
+# on every request, including ones committed late with an id up to
+# ANALYTICS_ENGINE_ID_WINDOW below the newest loaded.
+ANALYTICS_ENGINE_ENABLED = False
+ANALYTICS_ENGINE_MAX_AGE = 300
+ANALYTICS_ENGINE_ID_WINDOW = 10000
+
+# Answer pharmacies/open/ from the in-process opening-hours index. When
+# False the view runs an indexed range scan on the start/end minute columns.
+OPEN_HOURS_INDEX_ENABLED = True
+
+# Seconds before the in-process opening-hours index is rebuilt, to pick up
+# changes written by other processes (local changes invalidate it at once).
+OPEN_HOURS_INDEX_MAX_AGE = 300
+
+# pharmacies/open/ reads the pharmacies the index finds open with one query
+# per this many ids, keeping each statement well under SQLite's limit on
+# bound parameters and small on MySQL.
+OPEN_HOURS_IDS_PER_QUERY = 500
+
+# Engine behind search/: 'memory' (in-process BM25 index), 'database'
+# (MySQL FULLTEXT / SQLite FTS5) or 'like' (unranked icontains scan). The
+# full-text index exists, and is updated on every mask and pharmacy write,
+# whichever engine is chosen.
+SEARCH_BACKEND = 'memory'
+
+# Seconds before the in-process search indexes are rebuilt, to pick up
+# changes written by other processes (local changes are applied at once).
+SEARCH_INDEX_MAX_AGE = 300
+
+# search/suggest/: completions returned by default and at most, and seconds
+# before the completion index is rebuilt in the background to refresh
+# popularity (sales). Names saved or deleted locally are applied at once.
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_INDEX_MAX_AGE = 300
+
+# partition_transactions (MySQL only): months of transaction partitions to
+# create ahead of the current one, and months of transactions to keep
+# (None keeps everything; older partitions are dropped or archived).
+TRANSACTION_PARTITION_MONTHS_AHEAD = 3
+TRANSACTION_RETENTION_MONTHS = None
+
+# purchase/: most masks one line item may buy. Order totals are also capped
+# at what the balance columns hold.
+PURCHASE_MAX_QUANTITY = 1000
+
+# purchase/batch/: most orders accepted per request, and orders applied per
+# database transaction (group commit).
+PURCHASE_BATCH_MAX_ORDERS = 10000
+PURCHASE_BATCH_GROUP_SIZE = 500
+
+# process_purchase_orders: seconds the worker sleeps when the queue of
+# purchases sent with `Prefer: respond-async` is empty. It applies up to
+# PURCHASE_BATCH_GROUP_SIZE orders per database transaction.
+PURCHASE_WORKER_POLL_INTERVAL = 1.0
+
+# How place_order() (purchase/) guards balances against concurrent orders:
+# 'pessimistic' locks the user and pharmacy rows for the whole order,
+# 'optimistic' debits the user with an UPDATE conditional on the version it
+# read and retries on conflict, up to PURCHASE_OPTIMISTIC_RETRIES times with
+# a random backoff of at most PURCHASE_OPTIMISTIC_BACKOFF * 2**retry seconds,
+# capped at PURCHASE_OPTIMISTIC_BACKOFF_MAX. Compare them with
+# `manage.py benchmark_purchase_concurrency`.
+PURCHASE_CONCURRENCY = 'pessimistic'
+PURCHASE_OPTIMISTIC_RETRIES = 8
+PURCHASE_OPTIMISTIC_BACKOFF = 0.002
+PURCHASE_OPTIMISTIC_BACKOFF_MAX = 0.1